@@ -0,0 +1,222 @@
+"""Whole graph analytics on a one time export of the topology
+
+export reads the nodes and relations of a graph into compressed sparse rows, the functions here
+work on that export with array operations instead of walking the nodes. NumPy is used when it is
+installed, otherwise the same arrays are kept in the array module and looped over in Python"""
+import array
+import itertools
+
+import compact
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Topology(object):
+    """The nodes and relations of a graph by position, ids[i] is the id of the node at position i
+
+    sources[j] -> destinations[j] is relation j, offsets and targets are the same relations in
+    compressed sparse rows, the relations from the node at i go to targets[offsets[i]:offsets[i + 1]]"""
+    def __init__(self, ids, sources, destinations):
+        """The ids have to be sorted, sources and destinations are the ids of the ends of each relation"""
+        self.n = len(ids)
+        if numpy is not None:
+            self.ids = numpy.array(ids, dtype=numpy.int64)
+            self.sources = numpy.searchsorted(self.ids, numpy.array(sources, dtype=numpy.int64))
+            self.destinations = numpy.searchsorted(self.ids, numpy.array(destinations, dtype=numpy.int64))
+            order = numpy.argsort(self.sources, kind='stable')
+            self.targets = self.destinations[order]
+            self.offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(self.sources, minlength=self.n))))
+        else:
+            self.ids = array.array('q', ids)
+            position = {id: i for i, id in enumerate(ids)}
+            self.sources = array.array('q', map(position.__getitem__, sources))
+            self.destinations = array.array('q', map(position.__getitem__, destinations))
+            self.offsets = array.array('q', itertools.accumulate(itertools.chain((0,), _counts(self.sources, self.n))))
+            fill = array.array('q', self.offsets)
+            self.targets = array.array('q', bytes(8 * len(self.sources)))
+            for source, destination in zip(self.sources, self.destinations):
+                self.targets[fill[source]] = destination
+                fill[source] += 1
+
+    def __len__(self):
+        return self.n
+
+    def by_id(self, values):
+        """Get {node id: value} from values by position"""
+        if numpy is not None:
+            values = numpy.asarray(values).tolist()
+        return dict(zip(self.ids.tolist(), values))
+
+
+def _counts(positions, n):
+    counts = [0] * n
+    for i in positions:
+        counts[i] += 1
+    return counts
+
+
+def export(graph, by=None):
+    """Read the topology of the graph, only the relations with the label if by is set"""
+    if graph.storage == 'compact':
+        store = graph.store
+        kinds = store.kinds
+        ids = [id for id in range(len(kinds)) if kinds[id] == compact.NODE]
+        code = store.codes.get(by, -1) if by is not None else None
+        relations = [id for id in range(len(kinds)) if kinds[id] == compact.RELATION and
+                     (code is None or store.label_codes[id] == code)]
+        return Topology(ids, [store.sources[id] for id in relations], [store.destinations[id] for id in relations])
+    data = graph.data
+    ids = sorted(id for id, item in data.items() if isinstance(item, graph.Node))
+    if by is None:
+        relations = [item for item in data.values() if isinstance(item, graph.Relation)]
+    else:
+        relations = [data[id] for id in sorted(graph.labels.get(by, ()))]
+    return Topology(ids, [relation.source.id for relation in relations], [relation.destination.id for relation in relations])
+
+
+def degree(topology, direction='out'):
+    """Get {node id: number of relations}, direction is 'out' for the relations from each node,
+    'in' for the relations to it or 'both'"""
+    ends = {'out': (topology.sources,), 'in': (topology.destinations,),
+            'both': (topology.sources, topology.destinations)}[direction]
+    if numpy is not None:
+        return topology.by_id(sum(numpy.bincount(positions, minlength=topology.n) for positions in ends))
+    counts = [0] * topology.n
+    for positions in ends:
+        for i in positions:
+            counts[i] += 1
+    return topology.by_id(counts)
+
+
+def degree_centrality(topology, direction='both'):
+    """Get {node id: share of the other nodes it has relations with}, see degree"""
+    scale = 1 / (topology.n - 1) if topology.n > 1 else 1
+    return {id: count * scale for id, count in degree(topology, direction).items()}
+
+
+def pagerank(topology, damping=0.85, tolerance=1e-6, max_iterations=100):
+    """Get {node id: page rank}, the ranks add up to 1, nodes without relations from them share their
+    rank with every node, stops once the ranks change by less than tolerance per node"""
+    n = topology.n
+    if not n:
+        return {}
+    if numpy is not None:
+        out = numpy.bincount(topology.sources, minlength=n)
+        dangling = out == 0
+        share = numpy.where(dangling, 0, 1 / numpy.maximum(out, 1))
+        rank = numpy.full(n, 1 / n)
+        for _ in range(max_iterations):
+            spread = numpy.bincount(topology.destinations, weights=(rank * share)[topology.sources], minlength=n)
+            new = (1 - damping) / n + damping * (spread + rank[dangling].sum() / n)
+            done = numpy.abs(new - rank).sum() < n * tolerance
+            rank = new
+            if done:
+                break
+        return topology.by_id(rank)
+    out = _counts(topology.sources, n)
+    share = [1 / count if count else 0 for count in out]
+    dangling = [i for i in range(n) if not out[i]]
+    rank = [1 / n] * n
+    for _ in range(max_iterations):
+        spread = [0.0] * n
+        for source, destination in zip(topology.sources, topology.destinations):
+            spread[destination] += rank[source] * share[source]
+        base = (1 - damping) / n + damping * sum(rank[i] for i in dangling) / n
+        new = [base + damping * value for value in spread]
+        done = sum(abs(a - b) for a, b in zip(new, rank)) < n * tolerance
+        rank = new
+        if done:
+            break
+    return topology.by_id(rank)
+
+
+def weakly_connected_components(topology):
+    """Get {node id: the smallest id in its component}, following the relations both ways"""
+    n = topology.n
+    if numpy is not None:
+        labels = numpy.arange(n)
+        sources, destinations = topology.sources, topology.destinations
+        while True:  # Every node takes the smallest label of its neighbors, then of the node its label points to
+            smallest = numpy.minimum(labels[sources], labels[destinations])
+            new = labels.copy()
+            numpy.minimum.at(new, sources, smallest)
+            numpy.minimum.at(new, destinations, smallest)
+            while True:
+                jumped = new[new]
+                if numpy.array_equal(jumped, new):
+                    break
+                new = jumped
+            if numpy.array_equal(new, labels):
+                break
+            labels = new
+        return topology.by_id(topology.ids[labels])
+    parent = list(range(n))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for source, destination in zip(topology.sources, topology.destinations):
+        a, b = root(source), root(destination)
+        if a != b:
+            parent[max(a, b)] = min(a, b)  # The root is the smallest position, so the smallest id
+    return topology.by_id([topology.ids[root(i)] for i in range(n)])
+
+
+def strongly_connected_components(topology):
+    """Get {node id: the smallest id in its component}, the nodes of a component all have paths to each other
+
+    Tarjan's algorithm, without recursion so long paths dont reach the recursion limit"""
+    n = topology.n
+    offsets, targets = topology.offsets, topology.targets
+    if numpy is not None:
+        offsets, targets = offsets.tolist(), targets.tolist()
+    order = [-1] * n  # When each node was first seen
+    low = [0] * n
+    labels = [-1] * n
+    stack = []
+    on_stack = [False] * n
+    counter = 0
+    for start in range(n):
+        if order[start] != -1:
+            continue
+        work = [(start, offsets[start])]
+        order[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack[start] = True
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = node, edge + 1
+                target = targets[edge]
+                if order[target] == -1:
+                    order[target] = low[target] = counter
+                    counter += 1
+                    stack.append(target)
+                    on_stack[target] = True
+                    work.append((target, offsets[target]))
+                elif on_stack[target]:
+                    low[node] = min(low[node], order[target])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                smallest = min(component)  # Positions are in the order of the ids
+                for member in component:
+                    labels[member] = smallest
+    ids = topology.ids.tolist()
+    return dict(zip(ids, (ids[label] for label in labels)))
@@ -0,0 +1,364 @@
+import array
+import bisect
+import collections.abc
+import itertools
+import sys
+
+_missing = object()
+
+UNUSED, NODE, RELATION, REMOVED = range(4)
+
+
+def _filled(value, length):
+    return array.array('q', (value,)) * length
+
+
+class CompactStore(object):
+    """Keeps the topology of a graph in flat arrays indexed by id and the properties in a column per key
+
+    The adjacency is kept in compressed sparse rows (offsets + relation ids + label codes) that are
+    rebuilt once enough relations were added since the last build, relations added in between are
+    kept in small per node lists"""
+    def __init__(self):
+        self.kinds = bytearray()
+        self.sources = array.array('q')
+        self.destinations = array.array('q')
+        self.label_codes = array.array('q')
+        self.labels = []
+        self.codes = {}  # label -> code
+        self.columns = {}
+
+        self._out = self._in = (array.array('q', (0,)), array.array('q'), array.array('q'))
+        self._pending_out = {}  # node id -> relation ids added since the last build
+        self._pending_in = {}
+        self._pending = 0
+        self._built = 0
+
+    def __sizeof__(self):
+        return super().__sizeof__() + (sys.getsizeof(self.kinds) + sys.getsizeof(self.sources) +
+                                       sys.getsizeof(self.destinations) + sys.getsizeof(self.label_codes) +
+                                       sum((sys.getsizeof(column) for column in self.columns.values())) +
+                                       sum((sys.getsizeof(a) for a in itertools.chain(self._out, self._in))) +
+                                       sys.getsizeof(self._pending_out) + sys.getsizeof(self._pending_in))
+
+    def _reserve(self, id):
+        missing = id + 1 - len(self.kinds)
+        if missing > 0:
+            self.kinds.extend(bytes(missing))
+            self.sources.extend(_filled(-1, missing))
+            self.destinations.extend(_filled(-1, missing))
+            self.label_codes.extend(_filled(-1, missing))
+
+    def kind(self, id):
+        try:
+            return self.kinds[id] if id >= 0 else UNUSED
+        except (IndexError, TypeError):
+            return UNUSED
+
+    def code(self, label):
+        """Intern the label"""
+        try:
+            return self.codes[label]
+        except KeyError:
+            self.labels.append(label)
+            return self.codes.setdefault(label, len(self.labels) - 1)
+
+    def add_node(self, id):
+        self._reserve(id)
+        self.kinds[id] = NODE
+
+    def add_relation(self, id, source, label, destination):
+        self._reserve(id)
+        self.kinds[id] = RELATION
+        self.sources[id] = source
+        self.destinations[id] = destination
+        self.label_codes[id] = self.code(label)
+        self._pending_out.setdefault(source, []).append(id)
+        self._pending_in.setdefault(destination, []).append(id)
+        self._pending += 1
+
+    def remove(self, id):
+        """Removed relations are skipped when the adjacency is read and dropped on the next build"""
+        self.kinds[id] = REMOVED
+        for column in self.columns.values():
+            if id < len(column):
+                column[id] = _missing
+
+    # Properties
+    def get(self, id, key, default=_missing):
+        try:
+            value = self.columns[key][id]
+        except (KeyError, IndexError):
+            value = _missing
+        if value is _missing:
+            if default is _missing:
+                raise KeyError(key)
+            return default
+        return value
+
+    def set(self, id, key, value):
+        column = self.columns.setdefault(key, [])
+        if id >= len(column):
+            column.extend(itertools.repeat(_missing, id + 1 - len(column)))
+        column[id] = value
+
+    def delete(self, id, key):
+        self.get(id, key)  # Raises KeyError if missing
+        self.columns[key][id] = _missing
+
+    def has(self, id, key):
+        column = self.columns.get(key, ())
+        return id < len(column) and column[id] is not _missing
+
+    def keys(self, id):
+        return [key for key, column in self.columns.items() if id < len(column) and column[id] is not _missing]
+
+    # Topology
+    def _rows(self, relations, ends):
+        """Compressed rows of the relations grouped by one end, the relations are sorted by label code"""
+        count = len(self.kinds)
+        offsets = _filled(0, count + 1)
+        for id in relations:
+            offsets[ends[id] + 1] += 1
+        for i in range(count):
+            offsets[i + 1] += offsets[i]
+        fill = array.array('q', offsets)
+        edges = _filled(0, len(relations))
+        edge_labels = _filled(0, len(relations))
+        for id in relations:  # Stable, keeps the label order inside each row
+            end = ends[id]
+            edges[fill[end]] = id
+            edge_labels[fill[end]] = self.label_codes[id]
+            fill[end] += 1
+        return offsets, edges, edge_labels
+
+    def build(self):
+        """Rebuild the adjacency from the relation arrays"""
+        kinds = self.kinds
+        relations = array.array('q', sorted((id for id in range(len(kinds)) if kinds[id] == RELATION),
+                                            key=self.label_codes.__getitem__))
+        self._out = self._rows(relations, self.sources)
+        self._in = self._rows(relations, self.destinations)
+        self._pending_out.clear()
+        self._pending_in.clear()
+        self._pending = 0
+        self._built = len(relations)
+
+    def _relations(self, outgoing, id, label):
+        if self._pending > max(64, self._built // 4):
+            self.build()
+        offsets, edges, edge_labels = self._out if outgoing else self._in
+        pending = self._pending_out if outgoing else self._pending_in
+        start, stop = (offsets[id], offsets[id + 1]) if id + 1 < len(offsets) else (0, 0)
+        if label is not _missing:
+            code = self.codes.get(label)
+            if code is None:
+                return []
+            start, stop = (bisect.bisect_left(edge_labels, code, start, stop),
+                           bisect.bisect_right(edge_labels, code, start, stop))
+        kinds = self.kinds
+        result = [edge for edge in edges[start:stop] if kinds[edge] == RELATION]
+        if id in pending:
+            result.extend(edge for edge in pending[id] if kinds[edge] == RELATION and
+                          (label is _missing or self.label_codes[edge] == code))
+        return result
+
+    def out_relations(self, id, label=_missing):
+        """Get the ids of the relations from the node, only the ones with the label if it is set"""
+        return self._relations(True, id, label)
+
+    def in_relations(self, id, label=_missing):
+        """Get the ids of the relations to the node, only the ones with the label if it is set"""
+        return self._relations(False, id, label)
+
+
+class CompactData(collections.abc.Mapping):
+    """graph.data for compact storage, the nodes and relations are views created on access"""
+    def __init__(self, store):
+        self.store = store
+        self.node_class = None
+        self.relation_class = None
+
+    def __sizeof__(self):
+        return super().__sizeof__() + sys.getsizeof(self.store)
+
+    def __getitem__(self, id):
+        kind = self.store.kind(id)
+        if kind == NODE:
+            return self.node_class._view(id)
+        if kind == RELATION:
+            return self.relation_class._view(id)
+        if kind == REMOVED:
+            return None
+        raise KeyError(id)
+
+    def __setitem__(self, id, item):
+        """Items are added to the store when they are created, setting None removes them"""
+        if item is None:
+            self.store.remove(id)
+
+    def __contains__(self, id):
+        return self.store.kind(id) != UNUSED
+
+    def __iter__(self):
+        kinds = self.store.kinds
+        return (id for id in range(len(kinds)) if kinds[id] != UNUSED)
+
+    def __len__(self):
+        return len(self.store.kinds) - self.store.kinds.count(UNUSED)
+
+
+class CompactLabels(collections.abc.Mapping):
+    """Label -> relation ids for compact storage, removed relations are skipped when read"""
+    def __init__(self, store):
+        self.store = store
+        self.ids = {}
+
+    def add(self, label, id):
+        self.ids.setdefault(label, array.array('q')).append(id)
+
+    def discard(self, label, id):
+        pass
+
+    def __getitem__(self, label):
+        kinds = self.store.kinds
+        ids = {id for id in self.ids[label] if kinds[id] == RELATION}
+        if not ids:
+            raise KeyError(label)
+        return ids
+
+    def __iter__(self):
+        return (label for label in list(self.ids) if label in self)
+
+    def __len__(self):
+        return sum((1 for label in self))
+
+
+class CompactNode(collections.abc.MutableMapping):
+    """A view of a node in a CompactStore, the graph class sets _graph"""
+    __slots__ = ('id',)
+
+    def __init__(self, id=None, *args, **kwargs):
+        object.__setattr__(self, 'id', id)
+        self._graph.store.add_node(id)
+
+    @classmethod
+    def _view(cls, id):
+        view = object.__new__(cls)
+        object.__setattr__(view, 'id', id)
+        return view
+
+    @classmethod
+    def _new(cls, id, properties):
+        """Add the node with the properties to the store without the graph checking each one, see Graph.add_nodes"""
+        store = cls._graph.store
+        store.add_node(id)
+        for key, value in properties.items():
+            store.set(id, key, value)
+        return cls._view(id)
+
+    def __hash__(self):
+        return self.id
+
+    def __eq__(self, other):
+        return other is self or (isinstance(other, CompactNode) and other.id == self.id and other._graph is self._graph)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def __getitem__(self, key):
+        return self._graph.store.get(self.id, key)
+
+    def __setitem__(self, key, value):
+        self._graph.store.set(self.id, key, value)
+
+    def __delitem__(self, key):
+        self._graph.store.delete(self.id, key)
+
+    def __contains__(self, key):
+        return self._graph.store.has(self.id, key)
+
+    def __iter__(self):
+        return iter(self._graph.store.keys(self.id))
+
+    def __len__(self):
+        return len(self._graph.store.keys(self.id))
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+    def __getattr__(self, item):
+        return self[item]
+
+    def __delattr__(self, item):
+        del self[item]
+
+    def _relations(self, ids):
+        data = self._graph.data
+        return tuple(data[id] for id in ids)
+
+    @property
+    def sources(self):
+        return self._relations(self._graph.store.in_relations(self.id))
+
+    @property
+    def destinations(self):
+        return self._relations(self._graph.store.out_relations(self.id))
+
+    def get_sources(self, by=None):
+        """Get the relations to this node, only the ones with the label if by is set"""
+        return self._relations(self._graph.store.in_relations(self.id, _missing if by is None else by))
+
+    def get_destinations(self, by=None):
+        """Get the relations from this node, only the ones with the label if by is set"""
+        return self._relations(self._graph.store.out_relations(self.id, _missing if by is None else by))
+
+    def add_source(self, relation):
+        pass  # The store records both ends when the relation is created
+
+    def add_destination(self, relation):
+        pass
+
+    def remove_source(self, relation):
+        pass  # The store skips removed relations
+
+    def remove_destination(self, relation):
+        pass
+
+
+class CompactRelation(CompactNode):
+    __slots__ = ()
+
+    def __init__(self, source=None, label=None, destination=None, id=None, *args, **kwargs):
+        object.__setattr__(self, 'id', id)
+        self._graph.store.add_relation(id, source.id, label, destination.id)
+
+    @classmethod
+    def _new(cls, id, properties, source, label, destination):
+        store = cls._graph.store
+        store.add_relation(id, source.id, label, destination.id)
+        for key, value in properties.items():
+            store.set(id, key, value)
+        return cls._view(id)
+
+    def __repr__(self):
+        return self.label
+
+    def __delattr__(self, item):
+        if item not in ('source', 'destination', 'label'):  # These go when the relation is removed from the store
+            del self[item]
+
+    @property
+    def source(self):
+        return self._graph.data[self._graph.store.sources[self.id]]
+
+    @property
+    def destination(self):
+        return self._graph.data[self._graph.store.destinations[self.id]]
+
+    @property
+    def label(self):
+        return self._graph.store.labels[self._graph.store.label_codes[self.id]]
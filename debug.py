@@ -230,5 +230,46 @@ def time_functions():
         t.append((statistics.mean([timeit.timeit('{i for i in a if isinstance(i, int)}', 'a = {{i if (i%2) else str(i) for i in range({})}}'.format(RANGE_NUMBER), number=ITTER_NUMBER) for i in range(RUN_TIMES)]), 'set'))
         t.append((statistics.mean([timeit.timeit('tuple(i for i in a if isinstance(i, int))', 'a = (i if (i%2) else str(i) for i in range({}))'.format(RANGE_NUMBER), number=ITTER_NUMBER) for i in range(RUN_TIMES)]), 'tuple gen'))
 
+
+def time_node_access():
+    """Traversal and property reads on lite nodes, loaded lazy load nodes and lazy load nodes faulted in from a backend"""
+    import tempfile
+    import timeit
+    import graph_store
+    import storage
+
+    RANGE_NUMBER = 10000
+    ITTER_NUMBER = 10
+
+    def build(**kwargs):
+        graph = graph_store.Graph(**kwargs)
+        nodes = [graph.Node(number=i) for i in range(RANGE_NUMBER)]
+        for i in range(RANGE_NUMBER - 1):
+            graph.Relation(nodes[i], 'NEXT', nodes[i + 1])
+        return graph, nodes
+
+    def traverse(nodes):
+        for node in nodes:
+            _ = node.id, node.number
+            for relation in node.destinations:
+                _ = relation.destination.sources
+
+    print('lite, lazy load, lazy load unloaded -> traverse; range {} run times {}'.format(RANGE_NUMBER, ITTER_NUMBER))
+    graph, nodes = build(lite=True)
+    print('{:<40} {:.4f}'.format('lite', min(timeit.repeat(lambda: traverse(nodes), number=ITTER_NUMBER, repeat=3))))
+    graph, nodes = build()
+    print('{:<40} {:.4f}'.format('lazy load', min(timeit.repeat(lambda: traverse(nodes), number=ITTER_NUMBER, repeat=3))))
+    with tempfile.TemporaryDirectory() as path:
+        graph, nodes = build(backend=storage.PageStore(path))
+
+        def unload_and_traverse():
+            for item in graph.data.values():
+                item._unload()
+            traverse(nodes)
+        print('{:<40} {:.4f}'.format('lazy load unloaded', min(timeit.repeat(unload_and_traverse, number=1, repeat=3)) * ITTER_NUMBER))
+        graph.close()
+
+
 if __name__ == '__main__':
     time_functions()
+    time_node_access()
@@ -0,0 +1,174 @@
+import contextlib
+import csv
+import itertools
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lib'))  # The vendored axon
+try:
+    import axon
+except ImportError:
+    axon = None
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.axon': 'axon'}
+EXPORT_FORMATS = ('jsonl', 'axon')
+MISSING = ('create', 'skip', 'error')
+BUFFER_SIZE = 1 << 20
+
+
+def _format(path, format):
+    if format is None:
+        format = FORMATS.get(os.path.splitext(getattr(path, 'name', path))[1].lower())
+    if format not in FORMATS.values():
+        raise ValueError('Unknown format {!r} of {}, use format="csv", "jsonl" or "axon"'.format(format, path))
+    if format == 'axon' and axon is None:
+        raise ImportError('The axon format needs the axon library in lib/axon')
+    return format
+
+
+def _open(path, mode='r'):
+    """Open the path, a file that is already open is used as it is and left open"""
+    if hasattr(path, 'read' if mode == 'r' else 'write'):
+        return contextlib.nullcontext(path)
+    return open(path, mode, newline='', encoding='utf-8', buffering=BUFFER_SIZE)
+
+
+def read_rows(path, format=None, types=None):
+    """Get the rows of a CSV file with a header, a JSON lines file or an AXON file as dicts, one at a time
+    format is 'csv', 'jsonl' or 'axon', by default it is found from the extension of the path
+    types maps columns to functions that convert their values, such as int for CSV numbers"""
+    format = _format(path, format)
+    with _open(path) as f:
+        if format == 'csv':
+            rows = csv.DictReader(f)
+        elif format == 'jsonl':
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = axon.iload(f)
+        for row in rows:
+            if types:
+                for column, convert in types.items():
+                    if column in row:
+                        row[column] = convert(row[column])
+            yield row
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def import_nodes(graph, path, key='id', keys=None, key_property=None, format=None, types=None, batch_size=10000):
+    """Add a node for each row of the file, the other columns are its properties
+    key is the column with the key of the node in the file, keys maps those keys to the ids of the nodes,
+    it is updated and returned so the relations can be imported with it, see import_edges
+    if key_property is set, the key is also kept as that property of the node
+    the rows are read and added batch_size at a time with Graph.add_nodes, only a batch is in memory"""
+    keys = {} if keys is None else keys
+    for chunk in _chunks(read_rows(path, format, types), batch_size):
+        names = [row.pop(key) for row in chunk]
+        if key_property is not None:
+            for name, row in zip(names, chunk):
+                row[key_property] = name
+        for name, node in zip(names, graph.add_nodes(chunk, batch_size)):
+            keys[name] = node.id
+    return keys
+
+
+def import_edges(graph, path, keys=None, source='source', destination='destination', label='label', missing='create',
+                 key_property=None, format=None, types=None, batch_size=10000):
+    """Add a relation for each row of the file and get how many were added, the other columns are its properties
+    source, destination and label are the columns with the keys of the ends and the label of the relation,
+    the keys are mapped to node ids with keys, see import_nodes
+    missing is what to do with an end that is not in keys: 'create' a node for it, 'skip' the row or raise
+    a KeyError for an 'error', created nodes get key_property as in import_nodes
+    the rows are read and added batch_size at a time with Graph.add_relations, only a batch is in memory"""
+    if missing not in MISSING:
+        raise ValueError('missing must be one of {}, not {!r}'.format(', '.join(MISSING), missing))
+    keys = {} if keys is None else keys
+    added = 0
+    for chunk in _chunks(read_rows(path, format, types), batch_size):
+        ends = [(row.pop(source), row.pop(destination)) for row in chunk]
+        new = [name for name in dict.fromkeys(itertools.chain.from_iterable(ends)) if name not in keys]
+        if new and missing == 'error':
+            raise KeyError('No node with the key {!r}'.format(new[0]))
+        if new and missing == 'create':
+            properties = ({} if key_property is None else {key_property: name} for name in new)
+            for name, node in zip(new, graph.add_nodes(properties, batch_size)):
+                keys[name] = node.id
+        relations = [(keys[start], row.pop(label), keys[end], row) for (start, end), row in zip(ends, chunk)
+                     if start in keys and end in keys]
+        added += len(graph.add_relations(relations, batch_size))
+    return added
+
+
+def _records(graph):
+    """The export record of each node and relation of the graph in order of the ids, unloaded items
+    are read from the backend instead of being loaded"""
+    Relation = graph.Relation
+    for id, item in graph.data.items():  # Ids only grow, so the data is in order
+        if item is None:
+            continue
+        if not getattr(type(item), '_loaded', True):
+            stored = graph.backend.get(id)
+            record = {'id': id, 'kind': stored['kind']}
+            properties = stored['properties']
+            if stored['kind'] == 'relation':
+                record['source'], record['label'], record['destination'] = (stored['source'], stored['label'],
+                                                                            stored['destination'])
+        elif isinstance(item, Relation):
+            record = {'id': id, 'kind': 'relation', 'source': item.source.id, 'label': item.label,
+                      'destination': item.destination.id}
+            properties = item
+        else:
+            record = {'id': id, 'kind': 'node'}
+            properties = item
+        record['properties'] = {key: value for key, value in properties.items() if key != 'id'}
+        yield record
+
+
+def export_graph(graph, path, format='jsonl', batch_size=10000):
+    """Write a record for each node and relation of the graph to the path or open text file and get how many
+    there are, a record is a line of JSON for 'jsonl' or an AXON value for 'axon', see Graph.export
+    records are written in order of the ids, so the ends of a relation always come before it, and
+    batch_size at a time, only a batch is in memory"""
+    if format not in EXPORT_FORMATS:
+        raise ValueError('Unknown format {!r}, use format="jsonl" or "axon"'.format(format))
+    format = _format(path, format)
+    if format == 'jsonl':
+        dumps = json.dumps
+    else:
+        def dumps(record):
+            return axon.dumps([record])
+    written = 0
+    with _open(path, 'w') as f:
+        for chunk in _chunks(_records(graph), batch_size):
+            f.write('\n'.join(map(dumps, chunk)))
+            f.write('\n')
+            written += len(chunk)
+    return written
+
+
+def import_graph(graph, path, format=None, batch_size=10000):
+    """Add the nodes and relations of a file written by export_graph to the graph and get {id in the file: id}
+    of the nodes, they get new ids as the graph may already have items with the ones in the file
+    the records are read and added batch_size at a time with Graph.add_nodes and Graph.add_relations"""
+    ids = {}
+    for chunk in _chunks(read_rows(path, format), batch_size):
+        for kind, records in itertools.groupby(chunk, key=lambda record: record['kind']):
+            records = list(records)
+            if kind == 'node':
+                for record, node in zip(records, graph.add_nodes([record['properties'] for record in records],
+                                                                 batch_size)):
+                    ids[record['id']] = node.id
+            elif kind == 'relation':
+                graph.add_relations([(ids[record['source']], record['label'], ids[record['destination']],
+                                      record['properties']) for record in records], batch_size)
+            else:
+                raise ValueError('Unknown kind of record {!r}'.format(kind))
+    return ids
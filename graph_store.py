@@ -1,26 +1,96 @@
+import base64
+import contextlib
+import gc
+import heapq
 import itertools
+import math
 import sys
+import threading
+import zlib
 
+import compact
+import graph_io
+import indexes
 import nodes
+import planner
+
+_missing = object()
+
+
+def _value_tag(prop, value):
+    """The cache tag of searches for the value of the property, unhashable values use the tag of any value"""
+    try:
+        hash(value)
+    except TypeError:
+        return 'values', prop
+    return 'value', prop, value
+
+
+def _unique(items):
+    """Give each item once, keeps the ids of the items given so far"""
+    seen = set()
+    for item in items:
+        id = item.id
+        if id not in seen:
+            seen.add(id)
+            yield item
+
+
+@contextlib.contextmanager
+def _collector_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Graph(object):
+    index_kinds = {'hash': indexes.HashIndex, 'sorted': indexes.SortedIndex, 'bitmap': indexes.BitmapIndex}
 
     def _node_creator(graph):
-        nodeclass = nodes.LiteNode if graph.lite else nodes.LazyLoadNode
+        nodeclass = compact.CompactNode if graph.storage == 'compact' else nodes.LiteNode if graph.lite else nodes.LazyLoadNode
 
         class NodeClass(nodeclass):
+            _graph = graph
+
             def __init__(self, *args, **kwargs):
                 super().__init__(id=graph._get_new_id(), *args)
                 for prop in kwargs:
                     self[prop] = kwargs[prop]
                 graph._add_node(self)
+
+            def __setitem__(self, key, value):
+                graph._update_property(self, key, value)
+                return super().__setitem__(key, value)
+
+            def __delitem__(self, key):
+                graph._update_property(self, key)
+                return super().__delitem__(key)
+        if issubclass(NodeClass, nodes.LastAccessed):
+            nodes.set_access_clock(NodeClass, graph._clock)
+        if issubclass(NodeClass, nodes.LazyLoader):
+            nodes.unloaded_class(NodeClass)
         return NodeClass
 
     def _relation_creator(graph):
-        relationclass = nodes.LiteRelation if graph.lite else nodes.LazyLoadRelation
+        relationclass = (compact.CompactRelation if graph.storage == 'compact' else
+                         nodes.LiteRelation if graph.lite else nodes.LazyLoadRelation)
 
         class RelationClass(relationclass):
+            _graph = graph
+
             def __init__(self, source, label, destination, *args, **kwargs):
                 super().__init__(source, label, destination, id=graph._get_new_id(), *args)
                 for prop in kwargs:
@@ -29,12 +99,52 @@ class Graph(object):
                 destination.add_source(self)
                 graph._add_relation(self)
 
+            def __setitem__(self, key, value):
+                graph._update_property(self, key, value)
+                return super().__setitem__(key, value)
+
+            def __delitem__(self, key):
+                graph._update_property(self, key)
+                return super().__delitem__(key)
+
+        if issubclass(RelationClass, nodes.LastAccessed):
+            nodes.set_access_clock(RelationClass, graph._clock)
+        if issubclass(RelationClass, nodes.LazyLoader):
+            nodes.unloaded_class(RelationClass)
         return RelationClass
 
     def __init__(self, *args, **kwargs):
+        """storage is 'objects' (the default) to keep every node and relation as an object or
+        'compact' to keep them in flat arrays and get views of them on access, lite only applies to objects
+        backend is where the nodes keep their data so they can be unloaded, such as a storage.PageStore,
+        a graph created with the backend of an earlier one starts with its nodes and relations unloaded
+        max_resident_nodes and max_resident_bytes limit how many loaded nodes and relations are kept
+        in memory, the least recently accessed are unloaded once the graph is over either
+        access_clock is what lazy load nodes stamp _last_accessed with, see nodes.access_clock
+        max_cache_entries and max_cache_bytes limit how many search results the cache keeps, the coldest
+        by cache_policy ('lru', the default, or 'lfu') are dropped once the cache is over either"""
         self.lite = kwargs.pop('lite', False)
         self.cache = kwargs.pop('cache', True)
         self.cache_max_length = kwargs.pop('max_length', float('inf'))
+        self.max_cache_entries = kwargs.pop('max_cache_entries', None)
+        self.max_cache_bytes = kwargs.pop('max_cache_bytes', None)
+        self.cache_policy = kwargs.pop('cache_policy', 'lru')
+        if self.cache_policy not in ('lru', 'lfu'):
+            raise ValueError('Unknown cache policy {}'.format(self.cache_policy))
+        self.storage = kwargs.pop('storage', 'objects')
+        if self.storage not in ('objects', 'compact'):
+            raise ValueError('Unknown storage {}'.format(self.storage))
+        self.backend = kwargs.pop('backend', None)
+        if self.backend is not None and (self.lite or self.storage != 'objects'):
+            raise ValueError('Only lazy load nodes can use a backend')
+        self.max_resident_nodes = kwargs.pop('max_resident_nodes', None)
+        self.max_resident_bytes = kwargs.pop('max_resident_bytes', None)
+        if self.backend is None and (self.max_resident_nodes is not None or self.max_resident_bytes is not None):
+            raise ValueError('Unloading nodes needs a backend to keep them in')
+        self.access_clock = kwargs.pop('access_clock', 'tick')
+        self._clock = nodes.access_clock(self.access_clock)
+        if self._clock is None and (self.max_resident_nodes is not None or self.max_resident_bytes is not None):
+            raise ValueError('Unloading nodes needs an access clock to find the least recently accessed')
 
         super().__init__(*args, **kwargs)
         self._next_id = -1  # Offset by one
@@ -44,7 +154,30 @@ class Graph(object):
         self.Relation = self._relation_creator()
         self.Search = self._search_creator()
         self._cache = {}
-        self.data = {}
+        self._cache_entries = {}  # id(entry) -> (parent, key, entry) of every entry in the cache tree
+        self._cache_tags = {}  # tag -> ids of the entries of the searches that depend on it
+        self._cache_results = set()  # ids of the entries that hold a result
+        self._cache_producers = set()  # ids of the entries with a producer that hasnt finished
+        self._cache_bytes = 0
+        self._cache_clock = itertools.count(1).__next__
+        self._cache_lock = threading.RLock()  # Searches change the cache, it is shared by every thread
+        self.cache_hits = self.cache_misses = self.cache_evictions = 0
+        self.indexes = {}
+        self._resident = {}  # id -> size of the loaded items that can be unloaded
+        self._resident_bytes = 0
+        self._evict_paused = 0  # Nesting of the changes that items cant be unloaded during
+        if self.storage == 'compact':
+            self.store = compact.CompactStore()
+            self.data = compact.CompactData(self.store)
+            self.data.node_class = self.Node
+            self.data.relation_class = self.Relation
+            self.labels = compact.CompactLabels(self.store)
+        else:
+            self.store = None
+            self.data = {}
+            self.labels = indexes.LabelIndex()
+        if self.backend is not None:
+            self._open()
 
     def __sizeof__(self):
         return super().__sizeof__() + (sys.getsizeof(self._next_id) + sys.getsizeof(self.id) +
@@ -57,14 +190,349 @@ class Graph(object):
 
     def _add_node(self, node):
         self.data[object.__getattribute__(node, 'id')] = node
-        self._cache.clear()
+        if self.backend is not None:
+            self.backend.put(object.__getattribute__(node, 'id'), object.__getattribute__(node, '_record')())
+            self._make_resident(node)
+        self._invalidate(node)
         return self
 
     def _add_relation(self, relation):
-        self.data[object.__getattribute__(relation, 'id')] = relation
-        self._cache.clear()
+        id = object.__getattribute__(relation, 'id')
+        self.data[id] = relation
+        self.labels.add(object.__getattribute__(relation, 'label'), id)
+        if self.backend is not None:
+            self.backend.put(id, object.__getattribute__(relation, '_record')())
+            self._make_resident(relation)
+        self._invalidate(relation)
         return self
 
+    def _reserve_ids(self, count):
+        """Take the next count ids at once"""
+        first = self._next_id + 1
+        self._next_id += count
+        if self.store is not None:
+            self.store._reserve(self._next_id)
+        return range(first, self._next_id + 1)
+
+    def _add_batch(self, items, relations=False):
+        """_add_node or _add_relation for many new items, the search cache is invalidated once"""
+        for item in items:
+            id = object.__getattribute__(item, 'id')
+            self.data[id] = item
+            if relations:
+                self.labels.add(object.__getattribute__(item, 'label'), id)
+        for prop, index in self.indexes.items():
+            for item in items:
+                if prop in item:
+                    index.add(object.__getattribute__(item, 'id'), item[prop])
+        if self._cache_tags:
+            self._drop_cached(set(itertools.chain.from_iterable(map(self._item_tags, items))))
+        if self.backend is not None:
+            for item in items:
+                self.backend.put(object.__getattribute__(item, 'id'), object.__getattribute__(item, '_record')())
+            for item in items:
+                self._make_resident(item)
+
+    def add_nodes(self, properties, batch_size=10000):
+        """Add a node for each dict of properties and get the nodes, a lot faster than creating them one by one
+        the ids are taken a batch at a time and the indexes, backend and search cache are updated once
+        per batch of batch_size nodes instead of for every property
+        the cyclic garbage collector is paused while a batch is added as it would walk every new node"""
+        added = []
+        new = self.Node._new
+        for batch in _batches(properties, batch_size):
+            with _collector_paused():
+                items = [new(id, props) for id, props in zip(self._reserve_ids(len(batch)), batch)]
+                self._add_batch(items)
+            added.extend(items)
+        return added
+
+    def add_relations(self, relations, batch_size=10000):
+        """Add a relation for each (source, label, destination) or (source, label, destination, properties)
+        and get the relations, the ends can be nodes or their ids, see add_nodes"""
+        added = []
+        new = self.Relation._new
+        lazy = issubclass(self.Node, nodes.LazyLoader)
+        for batch in _batches(relations, batch_size):
+            with _collector_paused():
+                # Every end is found before anything is added, a batch with a missing end changes nothing
+                batch = [(self._end(relation[0]), relation[1], self._end(relation[2]),
+                          relation[3] if len(relation) > 3 else {}) for relation in batch]
+                items = []
+                ends = {}
+                for id, (source, label, destination, properties) in zip(self._reserve_ids(len(batch)), batch):
+                    item = new(id, properties, source, label, destination)
+                    self.data[id] = item  # Before the ends are loaded, their records can have the relation
+                    items.append(item)
+                    if lazy:
+                        source.add_destination(item, store=False)  # Written once per node below
+                        destination.add_source(item, store=False)
+                        if self.backend is not None:
+                            ends[source.id] = source
+                            ends[destination.id] = destination
+                    else:
+                        source.add_destination(item)
+                        destination.add_source(item)
+                for id, node in ends.items():
+                    if object.__getattribute__(node, '_loaded'):  # Unloaded ends were written when they were unloaded
+                        self.backend.put(id, object.__getattribute__(node, '_record')())
+                self._add_batch(items, relations=True)
+            added.extend(items)
+        return added
+
+    def _update_property(self, item, key, value=_missing):
+        """Keep the index of the property and the search cache current, called before the item is changed"""
+        index = self.indexes.get(key)
+        if index is None and not self._cache_tags:
+            return
+        had = key in item
+        old = item[key] if had else _missing
+        if index is not None:
+            id = object.__getattribute__(item, 'id')
+            if had:
+                index.remove(id, old)
+            if value is not _missing:
+                index.add(id, value)
+        if self._cache_tags:
+            tags = [('values', key)]
+            if had:
+                tags.append(_value_tag(key, old))
+            if value is not _missing:
+                tags.append(_value_tag(key, value))
+            if not had or value is _missing:
+                tags.append(('has', key))
+            self._drop_cached(tags)
+
+    def _item_tags(self, item):
+        """The cache tags of every search the item could be in the results of"""
+        if isinstance(item, self.Relation):
+            label = item.label
+            tags = [('relations',), ('label', label), ('label', None),
+                    ('adjacent', item.source.id), ('adjacent', item.destination.id)]
+        else:
+            tags = [('nodes',), ('adjacent', item.id)]
+        for prop in item:
+            tags.extend((('has', prop), ('values', prop), _value_tag(prop, item[prop])))
+        return tags
+
+    def _invalidate(self, item):
+        """Drop the cached searches that adding or removing the item could change"""
+        if self._cache_tags:
+            self._drop_cached(self._item_tags(item))
+
+    def _drop_cached(self, tags):
+        with self._cache_lock:
+            # An unfinished producer iterates over the items, any write can break it or change what it gives
+            for entry_id in self._cache_producers:
+                if entry_id in self._cache_entries:
+                    self._cache_entries[entry_id][2].pop('producer', None)
+            self._cache_producers.clear()
+            for tag in tags:
+                for entry_id in tuple(self._cache_tags.get(tag, ())):
+                    if entry_id in self._cache_entries:  # Not already dropped with an earlier step
+                        parent, key, entry = self._cache_entries[entry_id]
+                        del parent[key]
+                        self._untag(entry)
+
+    def _untag(self, entry):
+        """Forget the cache entry and the searches that continue from it"""
+        del self._cache_entries[id(entry)]
+        self._cache_producers.discard(id(entry))
+        for tag in entry['tags']:
+            entries = self._cache_tags[tag]
+            entries.discard(id(entry))
+            if not entries:
+                del self._cache_tags[tag]
+        if 'result' in entry:
+            self._cache_results.discard(id(entry))
+            self._cache_bytes -= entry['size']
+        for child in entry.values():
+            if isinstance(child, dict):
+                self._untag(child)
+
+    def _cache_entry(self, parent, key, tags):
+        """Get the cache entry of the search step, adding it to the parent if there is none"""
+        entry = parent.get(key)
+        if entry is None:
+            entry = parent[key] = {'tags': tags}
+            self._cache_entries[id(entry)] = parent, key, entry
+            for tag in tags:
+                self._cache_tags.setdefault(tag, set()).add(id(entry))
+        return entry
+
+    def _cache_hit(self, entry, count=True):
+        """Mark the cached result as used, count is False when a longer search only starts from it"""
+        if count:
+            self.cache_hits += 1
+        entry['hits'] += 1
+        entry['used'] = self._cache_clock()
+
+    def _cache_result(self, entry, result):
+        """Keep the finished result of the search step, unless the entry was dropped while it was made
+        called with the cache lock held"""
+        if 'result' in entry or self._cache_entries.get(id(entry), (None, None, None))[2] is not entry:
+            return
+        entry['result'] = result
+        entry['size'] = sys.getsizeof(result)
+        entry['hits'] = 0
+        entry['used'] = self._cache_clock()
+        self._cache_results.add(id(entry))
+        self._cache_bytes += entry['size']
+        if ((self.max_cache_entries is not None and len(self._cache_results) > self.max_cache_entries) or
+                (self.max_cache_bytes is not None and self._cache_bytes > self.max_cache_bytes)):
+            self.evict_cache(keep=id(entry))
+
+    def evict_cache(self, count=None, keep=None):
+        """Drop the count coldest cached results, least recently used or least frequently used by the
+        cache policy, by default enough to get 10% under the budget"""
+        with self._cache_lock:
+            return self._evict_cache(count, keep)
+
+    def _evict_cache(self, count, keep):
+        if count is None:
+            count = 0
+            if self.max_cache_entries is not None:
+                count = len(self._cache_results) - int(self.max_cache_entries * 0.9)
+            if self.max_cache_bytes is not None and self._cache_bytes > self.max_cache_bytes:
+                average = self._cache_bytes / len(self._cache_results)
+                count = max(count, math.ceil((self._cache_bytes - self.max_cache_bytes * 0.9) / average))
+        if self.cache_policy == 'lfu':
+            coldness = lambda entry: (entry['hits'], entry['used'])
+        else:
+            coldness = lambda entry: entry['used']
+        coldest = heapq.nsmallest(count, (self._cache_entries[id][2] for id in self._cache_results if id != keep),
+                                  key=coldness)
+        for entry in coldest:
+            if self._cache_entries.get(id(entry), (None, None, None))[2] is not entry:
+                continue  # Dropped with an entry evicted before it
+            self._cache_results.discard(id(entry))
+            self._cache_bytes -= entry.pop('size')
+            del entry['result'], entry['hits'], entry['used']
+            self.cache_evictions += 1
+            # Drop the entries that have nothing left in them, the searches that continue from one are kept
+            while (entry is not self._cache and 'result' not in entry and 'producer' not in entry and
+                   not any(isinstance(child, dict) for child in entry.values())):
+                parent, key, _ = self._cache_entries[id(entry)]
+                del parent[key]
+                self._untag(entry)
+                entry = parent
+        return self
+
+    def cache_info(self):
+        """Get the counters and the size of the search cache"""
+        return {'hits': self.cache_hits, 'misses': self.cache_misses, 'evictions': self.cache_evictions,
+                'entries': len(self._cache_results), 'bytes': self._cache_bytes}
+
+    def _forget(self, id):
+        self.data[id] = None  # TODO change how deleted nodes are handled
+        if self.backend is not None:
+            self.backend.delete(id)
+            self._unresident(id)
+
+    def _open(self):
+        """Add the items kept in the backend to the graph, unloaded"""
+        for id, record in self.backend.records():
+            if record['kind'] == 'relation':
+                self.data[id] = self.Relation._stub(id)
+                self.labels.add(record['label'], id)
+            else:
+                self.data[id] = self.Node._stub(id)
+        self._next_id = max(self._next_id, self.backend.meta.get('next_id', -1), max(self.data, default=-1))
+
+    def _make_resident(self, item):
+        """Track the loaded item, unloading the coldest items if the graph is over its budget"""
+        if self.max_resident_nodes is None and self.max_resident_bytes is None:
+            return
+        id = object.__getattribute__(item, 'id')
+        size = sys.getsizeof(item) if self.max_resident_bytes is not None else 0
+        self._resident_bytes += size - self._resident.get(id, 0)
+        self._resident[id] = size
+        if not self._evict_paused and self._over_budget():
+            self.evict(keep=id)
+
+    def _over_budget(self):
+        return ((self.max_resident_nodes is not None and len(self._resident) > self.max_resident_nodes) or
+                (self.max_resident_bytes is not None and self._resident_bytes > self.max_resident_bytes))
+
+    @contextlib.contextmanager
+    def _eviction_paused(self, keep=None):
+        """Keep the items loaded while the block changes them, the graph goes back under its budget after,
+        keeping the item with the id keep. Unloading an item part way through a removal or a load would
+        store the relations it has at that point, which the removal already forgot or the load didnt add yet"""
+        self._evict_paused += 1
+        try:
+            yield
+        finally:
+            self._evict_paused -= 1
+        if not self._evict_paused and self._resident and self._over_budget():
+            self.evict(keep=keep)
+
+    def _unresident(self, id):
+        """Stop tracking an item that was unloaded"""
+        self._resident_bytes -= self._resident.pop(id, 0)
+
+    def evict(self, count=None, keep=None):
+        """Unload the count least recently accessed items
+        by default enough to get 10% under the budget so it doesnt happen on every load"""
+        if count is None:
+            count = 0
+            if self.max_resident_nodes is not None:
+                count = len(self._resident) - int(self.max_resident_nodes * 0.9)
+            if self.max_resident_bytes is not None and self._resident_bytes > self.max_resident_bytes:
+                average = self._resident_bytes / len(self._resident)
+                count = max(count, math.ceil((self._resident_bytes - self.max_resident_bytes * 0.9) / average))
+        coldest = heapq.nsmallest(count, (id for id in self._resident if id != keep),
+                                  key=lambda id: object.__getattribute__(self.data[id], '_last_accessed'))
+        for id in coldest:
+            object.__getattribute__(self.data[id], '_unload')()  # Calls _unresident
+        return self
+
+    def flush(self):
+        """Write everything kept in memory by the backend"""
+        if self.backend is not None:
+            self.backend.meta['next_id'] = self._next_id
+            self.backend.flush()
+        return self
+
+    def close(self):
+        if self.backend is not None:
+            self.flush()
+            self.backend.close()
+
+    def export(self, fd, format='jsonl'):
+        """Write every node and relation to fd, a path or an open text file, one record at a time and get
+        how many were written, format is 'jsonl' or 'axon', graph_io.import_graph reads them back"""
+        return graph_io.export_graph(self, fd, format)
+
+    def _unlabel(self, relation):
+        self.labels.discard(object.__getattribute__(relation, 'label'), object.__getattribute__(relation, 'id'))
+
+    def _unindex(self, item):
+        id = object.__getattribute__(item, 'id')
+        for prop, index in self.indexes.items():
+            if prop in item:
+                index.remove(id, item[prop])
+
+    def create_index(self, prop, kind='hash'):
+        """Index the property so searches on it dont have to look at every item
+        a sorted index also answers range and top k searches, a bitmap index is for properties
+        with few values and combines the searches on them with bitwise operations"""
+        index = self.index_kinds[kind](prop)
+        for item in self.data.values():
+            if item is not None and prop in item:
+                index.add(object.__getattribute__(item, 'id'), item[prop])
+        self.indexes[prop] = index
+        return index
+
+    def drop_index(self, prop):
+        del self.indexes[prop]
+        return self
+
+    def freeze(self, index=()):
+        """Get a read only snapshot of the graph that can be searched from many threads without locks
+        the snapshot has the same indexes as the graph, plus hash indexes on the properties in index"""
+        return FrozenGraph(self, index)
+
     def get_by_id(self, number):
         return self.data[number]
 
@@ -74,7 +542,8 @@ class Graph(object):
     # Some methods as defined by wikipedia [https://en.wikipedia.org/wiki/Graph_%28abstract_data_type%29]
     def adjacent(self, x, y):
         """One way search from x to y"""
-        return any((y is relation.destination for relation in x.destinations))
+        y = y.id
+        return any((relation.destination.id == y for relation in x.destinations))
 
     def adjacent_twoway(self, x, y):
         """Is x connected to y? (x->y or y->x)"""
@@ -88,28 +557,146 @@ class Graph(object):
         """ Get all neighbors that are sources and destinations"""
         return [relation.destination for relation in x.destinations] + [relation.source for relation in x.sources]
 
+    def _hops(self, node, by, direction):
+        """Get (relation, node at the other end) for the relations the direction follows from the node"""
+        if direction in ('out', 'both'):
+            for relation in node.get_destinations(by) if by else node.destinations:
+                yield relation, relation.destination
+        if direction in ('in', 'both'):
+            for relation in node.get_sources(by) if by else node.sources:
+                yield relation, relation.source
+
+    def _node(self, x):
+        return self.get_by_id(x) if isinstance(x, int) else x
+
+    def _end(self, x):
+        """The node of a relation end given as a node or an id, KeyError if it was removed"""
+        node = self._node(x)
+        if node is None:
+            raise KeyError(x)
+        return node
+
+    def _fewest_hops(self, x, y, by, direction, max_depth):
+        """Bidirectional breadth first search, a level of the side with the smaller frontier at a time"""
+        if x.id == y.id:
+            return [x]
+        back = {'out': 'in', 'in': 'out', 'both': 'both'}[direction]
+        forward, backward = {x.id: (None, 0)}, {y.id: (None, 0)}  # id -> (node before it on the path, hops)
+        sides = [[forward, backward, [x], direction], [backward, forward, [y], back]]
+        for depth in itertools.count(1):
+            if max_depth is not None and depth > max_depth:
+                return None
+            side = min(sides, key=lambda side: len(side[2]))
+            seen, other, frontier, way = side
+            hop, meet = [], None
+            for node in frontier:
+                hops = seen[node.id][1] + 1
+                for relation, end in self._hops(node, by, way):
+                    if end.id in seen:
+                        continue
+                    seen[end.id] = node, hops
+                    hop.append(end)
+                    if end.id in other and (meet is None or other[end.id][1] < other[meet.id][1]):
+                        meet = end
+            if meet is not None:
+                path, node = [], meet
+                while node is not None:
+                    path.append(node)
+                    node = forward[node.id][0]
+                path.reverse()
+                node = backward[meet.id][0]
+                while node is not None:
+                    path.append(node)
+                    node = backward[node.id][0]
+                return path
+            if not hop:
+                return None
+            side[2] = hop
+
+    def _lowest_cost(self, x, y, by, direction, weight, heuristic):
+        """Dijkstra, or A* with the heuristic"""
+        count = itertools.count()  # Breaks ties, nodes cant be compared
+        queue = [(heuristic(x, y) if heuristic else 0, 0, next(count), x)]
+        costs = {x.id: 0}
+        before = {x.id: None}
+        while queue:
+            _, cost, _, node = heapq.heappop(queue)
+            if node.id == y.id:
+                path = []
+                while node is not None:
+                    path.append(node)
+                    node = before[node.id]
+                return path[::-1]
+            if cost > costs[node.id]:
+                continue  # Found a cheaper way to it after it was queued
+            for relation, end in self._hops(node, by, direction):
+                step = relation[weight] if weight in relation else 1
+                if step < 0:
+                    raise ValueError('Relation {} has a negative {}'.format(relation.id, weight))
+                if end.id not in costs or cost + step < costs[end.id]:
+                    costs[end.id] = cost + step
+                    before[end.id] = node
+                    heapq.heappush(queue, (cost + step + (heuristic(end, y) if heuristic else 0), cost + step, next(count), end))
+        return None
+
+    def shortest_path(self, x, y, by=None, weight=None, direction='out', heuristic=None):
+        """Get the nodes of the path from x to y with the fewest relations, None if there is no path
+        if weight is set, get the path with the lowest sum of that property of its relations instead,
+        relations without it count as 1, heuristic(node, y) can give a lower bound of the cost from node to y
+        direction is 'out' to follow the relations from the nodes, 'in' the relations to them or 'both'
+        and if by is set, only relations with that label are followed"""
+        if direction not in planner.DIRECTIONS:
+            raise ValueError('direction must be one of {}, not {!r}'.format(', '.join(planner.DIRECTIONS), direction))
+        x, y = self._node(x), self._node(y)
+        if weight is None and heuristic is None:
+            return self._fewest_hops(x, y, by, direction, None)
+        return self._lowest_cost(x, y, by, direction, weight, heuristic)
+
+    def reachable(self, x, y, max_depth=None, by=None, direction='out'):
+        """Is there a path from x to y of at most max_depth relations, the search stops once it is found"""
+        if direction not in planner.DIRECTIONS:
+            raise ValueError('direction must be one of {}, not {!r}'.format(', '.join(planner.DIRECTIONS), direction))
+        return self._fewest_hops(self._node(x), self._node(y), by, direction, max_depth) is not None
+
     def remove_node(self, x):
+        with self._eviction_paused():
+            self._remove_node(x)
+        return self
+
+    def _remove_node(self, x):
+        for relation in itertools.chain(x.sources, x.destinations):
+            self._invalidate(relation)
+        self._invalidate(x)
         for relation in x.sources:
             relation.source.remove_destination(relation)
-            self.data[relation.id] = None
+            self._unlabel(relation)
+            self._unindex(relation)
+            self._forget(relation.id)
             # del relation  # No effect, local scope
         for relation in x.destinations:
             relation.destination.remove_source(relation)
-            self.data[relation.id] = None
+            self._unlabel(relation)
+            self._unindex(relation)
+            self._forget(relation.id)
             # del relation  # No effect, local scope
-        self.data[x.id] = None  # TODO change how deleted nodes are handled. will depend on persistance storage method
-        self._cache.clear()
-        return self
+        self._unindex(x)
+        self._forget(x.id)
 
     def remove_relation(self, relation):
+        with self._eviction_paused():
+            self._remove_relation(relation)
+        return self
+
+    def _remove_relation(self, relation):
+        self._invalidate(relation)
         relation.source.remove_destination(relation)
         relation.destination.remove_source(relation)
+        self._unlabel(relation)
         del relation.source
         del relation.destination
         del relation.label
-        self.data[relation.id] = None  # TODO change how deleted nodes are handled. will depend on persistance storage method
-        self._cache.clear()
-        return self
+        self._unindex(relation)
+        self._forget(relation.id)
 
     def remove(self, item):
         try:
@@ -120,168 +707,415 @@ class Graph(object):
 
     def _search_creator(graph):
         class Search(object):
+            """Records the steps of a search, execute runs them with the plan planner.plan chooses"""
             def __init__(self):
-                self._search = graph.data.values()
+                self._steps = []
+                self._offset = 0
+                self._limit = None
+
+            def _step(self, *step):
+                self._steps.append(step)
+                return self
+
+            def _plan(self):
+                return planner.plan(graph, self._steps)
+
+            def _run(self):
+                """Get an iterator of the items the steps give"""
+                return self._plan().run(graph)
 
             def _get_nodes(self):
                 """Filters out everything but nodes from the search"""
-                self._search = (node for node in self._search if isinstance(node, graph.Node))
-                return self
+                return self._step('_get_nodes')
 
             def _get_relations(self):
                 """Filters out everything but relations from the search"""
-                self._search = (relation for relation in self._search if isinstance(relation, graph.Relation))
-                return self
-
-            def _get_node_iterator(self, node):
-                """Get an iterator of the node if set, otherwise look through all nodes"""
-                return self._get_nodes()._search if not node else (graph.get_by_id(node),) if isinstance(node, int) else (node,)
-
-            def _get_relation_iterator(self, relation):
-                """Get an iterator of the relation if set, otherwise look through all nodes"""
-                return self._get_relations()._search if not relation else (graph.get_by_id(relation),) if isinstance(relation, int) else (relation,)
+                return self._step('_get_relations')
 
             def property(self, prop):
                 """Get all nodes that have the property"""
-                self._search = (item for item in self._search if prop in item)
-                return self
+                return self._step('property', prop)
 
             def value(self, prop, value):
                 """Get all nodes that have the property and that property is equal to the value"""
-                self._search = (item for item in self.property(prop)._search if item[prop] == value)
-                return self
+                return self._step('value', prop, value)
+
+            def range(self, prop, lo, hi):
+                """Get all nodes where the property is between lo and hi, inclusive"""
+                return self._step('range', prop, lo, hi)
+
+            def gt(self, prop, value):
+                """Get all nodes where the property is greater than the value"""
+                return self._step('gt', prop, value)
+
+            def lt(self, prop, value):
+                """Get all nodes where the property is less than the value"""
+                return self._step('lt', prop, value)
+
+            def top_k(self, prop, k):
+                """Get the k nodes with the largest values of the property, largest first"""
+                return self._step('top_k', prop, k)
 
             def relations_to(self, node=None, by=None):
                 """Get all nodes related to this node (source -> node)
                 if no node it set, look through the list of nodes in the search
                 if by is set, only get nodes that are related by that value"""
-                if by:
-                    self._search = (relation.source for _node in self._get_node_iterator(node) for relation in _node.sources if relation.label == by)
-                else:
-                    self._search = (relation.source for _node in self._get_node_iterator(node) for relation in _node.sources)
-                return self
+                return self._step('relations_to', node, by)
 
             def relations_from(self, node=None, by=None):
                 """Get all nodes related to this node (node -> dest)
                 if no node it set, look through the list of nodes in the search
                 if by is set, only get nodes that are related by that value"""
-                if by:
-                    self._search = (relation.destination for _node in self._get_node_iterator(node) for relation in _node.destinations if relation.label == by)
-                else:
-                    self._search = (relation.destination for _node in self._get_node_iterator(node) for relation in _node.destinations)
-                return self
+                return self._step('relations_from', node, by)
 
             def relations(self, node=None, by=None):
-                search1, search2 = itertools.tee(self._search)
-                self._search = search1
-                relations_from = self.relations_from(node, by)._search
-                self._search = search2  # Reset search as calling the relations_from functions sets the search
-                self._search = itertools.chain(relations_from, self.relations_to(node, by)._search)
+                return self._step('relations', node, by)
+
+            def expand(self, depth, node=None, by=None, direction='out', unique=True, max_fanout=None):
+                """Get the nodes up to depth relations away from this node, from the nodes in the search if no node is set
+                direction is 'out' to follow the relations from the nodes, 'in' the relations to them or 'both'
+                if by is set, only follow relations with that label, max_fanout is the most relations followed from a node
+                if unique, each node is given once and the nodes it starts from are not given, the nodes seen are kept
+                so shared neighbors are not walked again, otherwise every walk gives the node it ends at"""
+                if direction not in planner.DIRECTIONS:
+                    raise ValueError('direction must be one of {}, not {!r}'.format(', '.join(planner.DIRECTIONS), direction))
+                return self._step('expand', node, by, depth, direction, unique, max_fanout)
+
+            def union(self, other):
+                """Also get the items of the other search
+                the other search is run on its own, its limit and offset are not used"""
+                return self._step('union', tuple(other._steps))
+
+            def intersect(self, other):
+                """Only keep the items the other search also gets, checked on the ids of its items
+                the other search is run on its own, its limit and offset are not used"""
+                return self._step('intersect', tuple(other._steps))
+
+            def difference(self, other):
+                """Leave out the items the other search gets, checked on the ids of its items
+                the other search is run on its own, its limit and offset are not used"""
+                return self._step('difference', tuple(other._steps))
+
+            def _copy(self):
+                search = type(self)()
+                search._steps = list(self._steps)
+                return search
+
+            def __or__(self, other):
+                """a | b is a new search of the items of a or b, without the limit and offset of a"""
+                return self._copy().union(other)
+
+            def __and__(self, other):
+                """a & b is a new search of the items of both a and b, without the limit and offset of a"""
+                return self._copy().intersect(other)
+
+            def __sub__(self, other):
+                """a - b is a new search of the items of a but not b, without the limit and offset of a"""
+                return self._copy().difference(other)
+
+            def limit(self, n):
+                """Only give the first n items of the result, it applies to the whole search wherever it is in the chain"""
+                self._limit = n
+                return self
+
+            def offset(self, n):
+                """Skip the first n items of the result, it applies to the whole search wherever it is in the chain"""
+                self._offset = n
                 return self
 
+            def _fingerprint(self):
+                steps = [tuple(getattr(arg, 'id', arg) for arg in step) for step in self._steps]  # Nodes by id
+                return zlib.crc32(repr(steps).encode())
+
+            def _cursor(self, offset):
+                return base64.urlsafe_b64encode('{}:{}'.format(offset, self._fingerprint()).encode()).decode()
+
+            def _read_cursor(self, cursor):
+                try:
+                    offset, fingerprint = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+                    offset, fingerprint = int(offset), int(fingerprint)
+                except (ValueError, UnicodeError):
+                    raise ValueError('Not a search cursor {!r}'.format(cursor)) from None
+                if fingerprint != self._fingerprint():
+                    raise ValueError('The cursor is from another search')
+                return offset
+
+            def iter(self):
+                """Get a lazy iterator of the items of the result, each item once, after the offset and up to the limit
+                only the ids of the items given so far are kept"""
+                stop = None if self._limit is None else self._offset + self._limit
+                return itertools.islice(_unique(self._run()), self._offset, stop)
+
+            stream = iter
+
+            def page(self, size, cursor=None):
+                """Get (items, cursor) of the next size items of the result, the first page if cursor is None
+                pass the cursor to get the page after, it is None after the last page
+                the cursor keeps the position in the result, a page after a write can skip or repeat items"""
+                if size < 1:
+                    raise ValueError('size must be positive')
+                offset = self._offset if cursor is None else self._read_cursor(cursor)
+                stop = offset + size
+                if self._limit is not None:
+                    stop = min(stop, self._offset + self._limit)
+                more = self._limit is None or stop < self._offset + self._limit
+                items = list(itertools.islice(_unique(self._run()), offset, stop + 1 if more else stop))
+                more = len(items) > stop - offset
+                return {item.id: item for item in items[:stop - offset]}, self._cursor(stop) if more else None
+
+            def _index_count(self):
+                """The number of items of the result from the index, None if the search is not a single indexed filter"""
+                return planner.exact_count(graph, self._steps)
+
+            def _counted(self):
+                """The items of the result after the offset and up to the limit, without keeping them or caching them"""
+                plan = self._plan()
+                items = plan.run(graph)
+                if not plan.unique():
+                    items = _unique(items)
+                if self._offset or self._limit is not None:
+                    items = itertools.islice(items, self._offset, None if self._limit is None else self._offset + self._limit)
+                return items
+
+            def count(self):
+                """Get how many items execute would give, read from the index when the search is a single
+                indexed filter, otherwise counted without keeping the items"""
+                count = self._index_count()
+                if count is None:
+                    return sum(1 for _ in self._counted())
+                count = max(count - self._offset, 0)
+                return count if self._limit is None else min(count, self._limit)
+
+            def exists(self):
+                """Does the search find anything, stops at the first item"""
+                count = self._index_count()
+                if count is not None:
+                    return count > self._offset and self._limit != 0
+                return next(self._counted(), _missing) is not _missing
+
             def execute(self):
                 """Execute the command"""
-                return {node.id: node for node in self._search}
+                if self._offset or self._limit is not None:
+                    return {node.id: node for node in self.iter()}
+                return {node.id: node for node in self._run()}
+
+            def explain(self):
+                """Get the plan execute would run, a row for each operator with the steps it runs
+                and an estimate of how many items it gives, see planner.plan"""
+                return self._plan().explain()
+
+            def profile(self):
+                """Run the search and get a row for each operator of its plan with the items it took
+                and gave, the seconds spent in it and if it was read from the cache"""
+                rows = self._plan().profile(graph)
+                for row in rows:
+                    row['cache'] = None
+                return rows
 
             @classmethod
             def get_by_propery(cls, prop):
-                items = graph.data.values()
-                return {item.id: item for item in items if prop in item}
+                return cls().property(prop).execute()
 
             @classmethod
             def get_by_value(cls, prop, value):
-                return {item.id: item for item in cls.get_by_propery(prop).values() if item[prop] == value}
+                return cls().value(prop, value).execute()
 
         if graph.cache:
             class SearchCache(Search):
-                class CacheGenerator(object):
-                    def __init__(self, cache, value, generator):
+                """Caches the result of each search in a tree with an entry for every step, a search
+                starts from the longest of its starts that has a cached result"""
+                class CacheProducer(object):
+                    """Runs the generator of a search step once for every search that reads the step, the items
+                    are kept so a search that starts later, or after an earlier one stopped, replays them first"""
+                    def __init__(self, cache, generator):
                         self.cache = cache
-                        self.value = value
                         self.generator = generator
                         self.list = []
                         self.max_length = graph.cache_max_length
+                        self.done = False
+                        self.error = None
+                        self.lock = threading.Lock()
+
+                    def get(self, i):
+                        """Get the item at i, making it if no search got that far yet"""
+                        try:
+                            return self.list[i]
+                        except IndexError:
+                            pass
+                        with self.lock:
+                            if i < len(self.list):  # Made by another thread while this one waited
+                                return self.list[i]
+                            if self.error is not None:
+                                raise self.error
+                            if self.done:
+                                raise StopIteration
+                            try:
+                                item = next(self.generator)
+                            except StopIteration:
+                                self.done = True
+                                self._finish(keep=len(self.list) < self.max_length)
+                                raise
+                            except Exception as e:
+                                self.error = e
+                                self._finish(keep=False)  # The next search starts over
+                                raise
+                            self.list.append(item)
+                            return item
+
+                    def _finish(self, keep):
+                        with graph._cache_lock:
+                            if self.cache.get('producer') is self:  # Not dropped by a write
+                                del self.cache['producer']
+                                graph._cache_producers.discard(id(self.cache))
+                                if keep:
+                                    graph._cache_result(self.cache, self.list)
+
+                class CacheGenerator(object):
+                    """One search reading a CacheProducer"""
+                    def __init__(self, producer):
+                        self.producer = producer
+                        self.i = 0
 
                     def __iter__(self):
                         return self
 
                     def __next__(self):
-                        try:
-                            item = next(self.generator)
-                        except StopIteration as e:
-                            if len(self.list) < self.max_length:
-                                self.cache['result'] = self.list
-                            raise e
-                        else:
-                            self.list.append(item)
-                            return item
+                        item = self.producer.get(self.i)
+                        self.i += 1
+                        return item
 
-                def __init__(self):
-                    super().__init__()
-                    self.cache = graph._cache
-
-                def _getiterator(self, key, gen):
-                    if key in self.cache:
-                        self.cache = self.cache[key]
-                        if 'result' in self.cache:
-                            return self.cache['result']
-                        else:
-                            return self.CacheGenerator(self.cache, key, gen)
-                    else:
-                        self.cache[key] = {}
-                        self.cache = self.cache[key]
-                        return self.CacheGenerator(self.cache, key, gen)
-
-                def _get_nodes(self):
-                    """Filters out everything but nodes from the search"""
-                    key = (self._get_nodes.__name__)
-                    gen = super()._get_nodes()._search
-                    self._search = self._getiterator(key, gen)
-                    return self
-
-                def _get_relations(self):
-                    """Filters out everything but relations from the search"""
-                    key = (self._get_relations.__name__)
-                    gen = super()._get_relations()._search
-                    self._search = self._getiterator(key, gen)
-                    return self
-
-                def property(self, prop):
-                    """Get all nodes that have the property"""
-                    key = (self.property.__name__, prop)
-                    gen = super().property(prop)._search
-                    self._search = self._getiterator(key, gen)
-                    return self
-
-                def value(self, prop, value):
-                    """Get all nodes that have the property and that property is equal to the value"""
-                    key = (self.value.__name__, prop, value)
-                    gen = super().value(prop, value)._search
-                    self._search = self._getiterator(key, gen)
-                    return self
-
-                def relations_to(self, node=None, by=None):
-                    """Get all nodes related to this node (source -> node)
-                    if no node it set, look through the list of nodes in the search
-                    if by is set, only get nodes that are related by that value"""
-                    key = (self.relations_to.__name__, node, by)
-                    gen = super().relations_to(node, by)._search
-                    self._search = self._getiterator(key, gen)
-                    return self
-
-                def relations_from(self, node=None, by=None):
-                    """Get all nodes related to this node (node -> dest)
-                    if no node it set, look through the list of nodes in the search
-                    if by is set, only get nodes that are related by that value"""
-                    key = (self.relations_from.__name__, node, by)
-                    gen = super().relations_from(node, by)._search
-                    self._search = self._getiterator(key, gen)
-                    return self
-
-                def relations(self, node=None, by=None):
-                    key = (self.relations.__name__, node, by)
-                    gen = super().relations(node, by)._search
-                    self._search = self._getiterator(key, gen)
-                    return self
+                def _tags(self, step, depth):
+                    """The tags of what the result of the step depends on, writes that emit one of them drop its entry"""
+                    name = step[0]
+                    if name in ('union', 'intersect', 'difference'):
+                        tags = tuple(tag for i, other in enumerate(step[1]) for tag in self._tags(other, i))
+                        if not step[1] or (depth == 0 and name != 'intersect'):
+                            tags += ('nodes',), ('relations',)  # All items are part of the result
+                        return tuple(dict.fromkeys(tags))  # The searches can share tags, each is untagged once
+                    if name in ('_get_nodes', '_get_relations'):
+                        return ((name[len('_get_'):],),) if depth == 0 else ()  # Later steps only filter
+                    if name == 'expand':
+                        return ('label', step[2]),  # Any relation with the label can be on the way
+                    if name == 'property':
+                        return ('has', step[1]),
+                    if name == 'value':
+                        return _value_tag(step[1], step[2]),
+                    if name in planner.RELATIONS:
+                        node, by = step[1:]
+                        if node is not None:
+                            return ('adjacent', node if isinstance(node, int) else node.id),
+                        return ('label', by),
+                    return ('values', step[1]),
+
+                def _cacheable(self):
+                    try:
+                        hash(tuple(self._steps))
+                    except TypeError:  # Such as a value search for a list
+                        return False
+                    return bool(self._steps)
+
+                def _lookup(self, add):
+                    """Get the entry of the last step, None if add is False and it is not in the cache,
+                    and (depth, entry) of the longest start of the steps that has a cached result"""
+                    entry, cached = graph._cache, None
+                    for depth, step in enumerate(self._steps):
+                        entry = graph._cache_entry(entry, step, self._tags(step, depth)) if add else entry.get(step)
+                        if entry is None:
+                            break
+                        if 'result' in entry and depth + 1 < len(self._steps):
+                            cached = depth + 1, entry
+                    return entry, cached
+
+                def _plan(self, entry=None, cached=None):
+                    if not self._cacheable():
+                        return super()._plan()
+                    if entry is None:
+                        with graph._cache_lock:
+                            entry, cached = self._lookup(add=False)
+                    if entry is not None and 'result' in entry:
+                        return planner.Plan([planner.Cached(entry['result'], self._steps)])
+                    return planner.plan(graph, self._steps, cached and (cached[0], cached[1]['result']))
+
+                def _run(self):
+                    if not self._cacheable():
+                        return super()._run()
+                    with graph._cache_lock:
+                        entry, cached = self._lookup(add=True)
+                        if 'result' in entry:
+                            graph._cache_hit(entry)
+                            return iter(entry['result'])
+                        graph.cache_misses += 1
+                        producer = entry.get('producer')
+                        if producer is None:
+                            plan = self._plan(entry, cached)
+                            if isinstance(plan[0], planner.Cached):
+                                graph._cache_hit(cached[1], count=False)
+                            producer = entry['producer'] = self.CacheProducer(entry, plan.run(graph))
+                            graph._cache_producers.add(id(entry))
+                    return self.CacheGenerator(producer)
+
+                def profile(self):
+                    rows = self._plan().profile(graph)
+                    for row in rows:
+                        row['cache'] = 'hit' if row['operator'] == 'Cached' else 'miss'
+                    return rows
             return SearchCache
         return Search
+
+
+class FrozenGraph(Graph):
+    """A read only snapshot of a graph, see Graph.freeze
+
+    The labels are interned, the relations of each node are kept in tuples and there is no
+    search cache to invalidate or last accessed time to keep"""
+    def _node_creator(graph):
+        class NodeClass(nodes.FrozenNode):
+            _graph = graph
+        return NodeClass
+
+    def _relation_creator(graph):
+        class RelationClass(nodes.FrozenRelation):
+            _graph = graph
+        return RelationClass
+
+    def __init__(self, graph, index=()):
+        super().__init__(cache=False)
+        self.id = graph.id
+        self._next_id = graph._next_id
+
+        relations = []
+        sources = {}
+        destinations = {}
+        for id, item in graph.data.items():
+            if item is None:
+                self.data[id] = None
+            elif isinstance(item, graph.Relation):
+                self.data[id] = None  # Keeps the id order, set once the nodes are frozen
+                relations.append(item)
+            else:
+                self.data[id] = self.Node._freeze(id, item)
+        for relation in relations:
+            id = relation.id
+            label = relation.label
+            label = sys.intern(label) if type(label) is str else label
+            source = self.data[relation.source.id]
+            destination = self.data[relation.destination.id]
+            self.data[id] = frozen = self.Relation._freeze(id, relation, source, label, destination)
+            destinations.setdefault(source.id, []).append(frozen)
+            sources.setdefault(destination.id, []).append(frozen)
+            self.labels.add(label, id)
+        for id, node in self.data.items():
+            if isinstance(node, self.Node):
+                node._set_relations(sources.get(id, ()), destinations.get(id, ()))
+
+        kinds = {kind: name for name, kind in self.index_kinds.items()}
+        for prop, graph_index in graph.indexes.items():
+            Graph.create_index(self, prop, kinds[type(graph_index)])
+        for prop in index:
+            if prop not in self.indexes:
+                Graph.create_index(self, prop)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Frozen graphs cant be changed')
+
+    create_index = drop_index = remove_node = remove_relation = remove = add_nodes = add_relations = _read_only
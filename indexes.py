@@ -0,0 +1,273 @@
+import bisect
+import itertools
+import sys
+
+_missing = object()
+_inf = float('inf')
+
+
+class HashIndex(object):
+    """Maps the values of a property to the ids of the items that have that value"""
+    def __init__(self, prop):
+        self.prop = prop
+        self.values = {}
+        self.unhashable = {}  # id -> value, for values such as lists that cant be dict keys
+
+    def __len__(self):
+        return sum((len(ids) for ids in self.values.values())) + len(self.unhashable)
+
+    def __sizeof__(self):
+        return super().__sizeof__() + (sys.getsizeof(self.values) + sys.getsizeof(self.unhashable) +
+                                       sum((sys.getsizeof(ids) for ids in self.values.values())))
+
+    def add(self, id, value):
+        try:
+            self.values.setdefault(value, set()).add(id)
+        except TypeError:  # Unhashable
+            self.unhashable[id] = value
+
+    def remove(self, id, value):
+        try:
+            ids = self.values[value]
+        except TypeError:
+            self.unhashable.pop(id, None)
+        except KeyError:
+            pass
+        else:
+            ids.discard(id)
+            if not ids:
+                del self.values[value]
+
+    def get(self, value):
+        """Get the ids of the items where the property is equal to the value"""
+        try:
+            return tuple(self.values.get(value, ()))
+        except TypeError:
+            return tuple(id for id, item_value in self.unhashable.items() if item_value == value)
+
+    def ids(self):
+        """Get the ids of every item that has the property"""
+        return tuple(itertools.chain(itertools.chain.from_iterable(self.values.values()), self.unhashable))
+
+    def count(self, value):
+        try:
+            return len(self.values.get(value, ()))
+        except TypeError:
+            return len(self.get(value))
+
+
+class LabelIndex(dict):
+    """Maps the label of each relation to the ids of the relations with that label"""
+    def add(self, label, id):
+        self.setdefault(label, set()).add(id)
+
+    def discard(self, label, id):
+        ids = self[label]
+        ids.discard(id)
+        if not ids:
+            del self[label]
+
+
+def in_range(value, lo=None, hi=None, include_lo=True, include_hi=True):
+    """Is the value between lo and hi, values that cant be compared are never in range"""
+    try:
+        if lo is not None and (value < lo if include_lo else not lo < value):
+            return False
+        if hi is not None and (hi < value if include_hi else not value < hi):
+            return False
+    except TypeError:
+        return False
+    return True
+
+
+class SortedIndex(object):
+    """Keeps (value, id) pairs sorted so ranges of values can be found with bisect"""
+    def __init__(self, prop):
+        self.prop = prop
+        self.entries = []
+        self.unordered = {}  # id -> value, for values that cant be compared to the sorted ones
+
+    def __len__(self):
+        return len(self.entries) + len(self.unordered)
+
+    def __sizeof__(self):
+        return super().__sizeof__() + (sys.getsizeof(self.entries) + sys.getsizeof(self.unordered) +
+                                       sum((sys.getsizeof(entry) for entry in self.entries)))
+
+    def add(self, id, value):
+        try:
+            bisect.insort(self.entries, (value, id))
+        except TypeError:
+            self.unordered[id] = value
+
+    def remove(self, id, value):
+        if self.unordered.pop(id, _missing) is not _missing:
+            return
+        i = bisect.bisect_left(self.entries, (value, id))
+        if i < len(self.entries) and self.entries[i][1] == id:
+            del self.entries[i]
+
+    def _bounds(self, lo, hi, include_lo, include_hi):
+        try:
+            start = 0 if lo is None else (bisect.bisect_left(self.entries, (lo,)) if include_lo else
+                                          bisect.bisect_right(self.entries, (lo, _inf)))
+            stop = len(self.entries) if hi is None else (bisect.bisect_right(self.entries, (hi, _inf)) if include_hi else
+                                                         bisect.bisect_left(self.entries, (hi,)))
+        except TypeError:  # The bounds cant be compared to the sorted values
+            return 0, 0
+        return start, max(start, stop)
+
+    def range(self, lo=None, hi=None, include_lo=True, include_hi=True):
+        """Get the ids of the items where the property is between lo and hi, in order of the value"""
+        start, stop = self._bounds(lo, hi, include_lo, include_hi)
+        return tuple(itertools.chain((id for value, id in self.entries[start:stop]),
+                                     (id for id, value in self.unordered.items() if
+                                      in_range(value, lo, hi, include_lo, include_hi))))
+
+    def count_range(self, lo=None, hi=None, include_lo=True, include_hi=True):
+        start, stop = self._bounds(lo, hi, include_lo, include_hi)
+        return stop - start + sum((1 for value in self.unordered.values() if in_range(value, lo, hi, include_lo, include_hi)))
+
+    def top_k(self, k):
+        """Get the ids of the k items with the largest values, largest first"""
+        return tuple(id for value, id in reversed(self.entries[max(len(self.entries) - k, 0):]))
+
+    def get(self, value):
+        """Get the ids of the items where the property is equal to the value"""
+        return tuple(itertools.chain((id for item_value, id in self.entries[slice(*self._bounds(value, value, True, True))]
+                                      if item_value == value),
+                                     (id for id, item_value in self.unordered.items() if item_value == value)))
+
+    def ids(self):
+        """Get the ids of every item that has the property"""
+        return tuple(itertools.chain((id for value, id in self.entries), self.unordered))
+
+    def count(self, value):
+        return len(self.get(value))
+
+
+# Bitmaps are {chunk number: int} with bit i of chunk n set for id n * CHUNK + i, missing chunks are empty
+CHUNK_BITS = 12
+CHUNK = 1 << CHUNK_BITS
+_byte_bits = tuple(tuple(i for i in range(8) if byte >> i & 1) for byte in range(256))
+_popcount = getattr(int, 'bit_count', None) or (lambda bits: bin(bits).count('1'))
+
+
+def bitmap_from(ids):
+    bitmap = {}
+    for id in ids:
+        bitmap[id >> CHUNK_BITS] = bitmap.get(id >> CHUNK_BITS, 0) | 1 << (id & CHUNK - 1)
+    return bitmap
+
+
+def bitmap_and(a, b):
+    if len(b) < len(a):
+        a, b = b, a
+    result = {}
+    for number, bits in a.items():
+        bits &= b.get(number, 0)
+        if bits:
+            result[number] = bits
+    return result
+
+
+def bitmap_or(a, b):
+    result = dict(a)
+    for number, bits in b.items():
+        result[number] = result.get(number, 0) | bits
+    return result
+
+
+def bitmap_andnot(a, b):
+    result = {}
+    for number, bits in a.items():
+        bits &= ~b.get(number, 0)
+        if bits:
+            result[number] = bits
+    return result
+
+
+def bitmap_count(bitmap):
+    return sum(map(_popcount, bitmap.values()))
+
+
+def bitmap_ids(bitmap):
+    """Get the ids of the bitmap in order"""
+    for number in sorted(bitmap):
+        start = number << CHUNK_BITS
+        bits = bitmap[number]
+        for i, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, 'little')):
+            if byte:
+                base = start + i * 8
+                for bit in _byte_bits[byte]:
+                    yield base + bit
+
+
+class BitmapIndex(object):
+    """Maps the values of a property to bitmaps of the ids of the items that have that value
+
+    Meant for properties with few values such as booleans, the ids are dense so a bitmap takes a
+    bit per id where a set takes tens of bytes, and searches on several of them are combined with
+    bitwise and/or on the chunks instead of item by item"""
+    def __init__(self, prop):
+        self.prop = prop
+        self.values = {}  # value -> bitmap
+        self.unhashable = {}  # id -> value, for values such as lists that cant be dict keys
+
+    def __len__(self):
+        return sum((bitmap_count(bitmap) for bitmap in self.values.values())) + len(self.unhashable)
+
+    def __sizeof__(self):
+        return super().__sizeof__() + (sys.getsizeof(self.values) + sys.getsizeof(self.unhashable) +
+                                       sum((sys.getsizeof(bitmap) + sum(map(sys.getsizeof, bitmap.values()))
+                                            for bitmap in self.values.values())))
+
+    def add(self, id, value):
+        try:
+            bitmap = self.values.setdefault(value, {})
+        except TypeError:  # Unhashable
+            self.unhashable[id] = value
+        else:
+            number = id >> CHUNK_BITS
+            bitmap[number] = bitmap.get(number, 0) | 1 << (id & CHUNK - 1)
+
+    def remove(self, id, value):
+        try:
+            bitmap = self.values[value]
+        except TypeError:
+            self.unhashable.pop(id, None)
+        except KeyError:
+            pass
+        else:
+            number = id >> CHUNK_BITS
+            bits = bitmap.get(number, 0) & ~(1 << (id & CHUNK - 1))
+            if bits:
+                bitmap[number] = bits
+            else:
+                bitmap.pop(number, None)
+                if not bitmap:
+                    del self.values[value]
+
+    def bitmap(self, value=_missing):
+        """Get the bitmap of the items where the property is equal to the value, of every item
+        that has the property if no value is given, it must not be changed"""
+        if value is _missing:
+            result = bitmap_from(self.unhashable)
+            for bitmap in self.values.values():
+                result = bitmap_or(result, bitmap)
+            return result
+        try:
+            return self.values.get(value, {})
+        except TypeError:
+            return bitmap_from(id for id, item_value in self.unhashable.items() if item_value == value)
+
+    def get(self, value):
+        """Get the ids of the items where the property is equal to the value"""
+        return tuple(bitmap_ids(self.bitmap(value)))
+
+    def ids(self):
+        """Get the ids of every item that has the property"""
+        return tuple(bitmap_ids(self.bitmap()))
+
+    def count(self, value):
+        return bitmap_count(self.bitmap(value))
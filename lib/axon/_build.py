@@ -0,0 +1,49 @@
+# coding: utf-8
+
+# The MIT License (MIT)
+#
+# Copyright (c) <2011-2015> <Shibzukhov Zaur, szport at gmail dot com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Optional build of the portable modules as extensions for the current
+# platform (needs Cython and a C compiler):
+#
+#     cd lib && python -m axon._build
+#
+# The extensions are written next to the .py files and are imported instead
+# of them. Remove the built files to go back to the portable modules.
+
+import os
+
+__all__ = ['build']
+
+modules = ['_objects.py', '_loader.py', '_dumper.py']
+
+def build():
+    try:
+        from Cython.Build.Cythonize import main as cythonize
+    except ImportError:
+        raise SystemExit('Cython is required to build the axon extensions')
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    cythonize(['-i', '-3'] + [os.path.join(root, name) for name in modules])
+
+if __name__ == '__main__':
+    build()
@@ -1,7 +1,827 @@
-def __bootstrap__():
-    global __bootstrap__, __loader__, __file__
-    import sys, pkg_resources, imp
-    __file__ = pkg_resources.resource_filename(__name__, '_dumper.cp35-win32.pyd')
-    __loader__ = None; del __bootstrap__, __loader__
-    imp.load_dynamic(__name__,__file__)
-__bootstrap__()
+# coding: utf-8
+
+# The MIT License (MIT)
+#
+# Copyright (c) <2011-2015> <Shibzukhov Zaur, szport at gmail dot com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Portable implementation of the dumper. It replaces the bootstrap stub of
+# the win32 extension. Simple values are dispatched on their exact type
+# through a dict of dump functions built once per dumper.
+
+import re
+
+import axon.types as types
+from axon.types import builtins
+import axon.errors as errors
+
+from axon.odict import OrderedDict as axon_odict
+from axon._objects import Node, Attribute, KeyVal
+from axon._objects import attribute, keyval
+from axon._objects import c_as_unicode, reserved_name_dict
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+try:
+    import cdecimal as _decimal
+except ImportError:
+    import decimal as _decimal
+
+try:
+    from base64 import encodebytes
+except ImportError:
+    from base64 import encodestring as encodebytes
+
+unicode_type = types.unicode_type
+str_type = types.str_type
+int_type = types.int_type
+long_type = types.long_type
+decimal_type = types.decimal_type
+bool_type = types.bool_type
+float_type = types.float_type
+bytes_type = types.bytes_type
+bytearray_type = types.bytearray_type
+none_type = types.none_type
+date_type = types.date_type
+time_type = types.time_type
+datetime_type = types.datetime_type
+
+simple_types = {
+    unicode_type, str_type, int_type, long_type, float_type, decimal_type,
+    bool_type, none_type, bytes_type, bytearray_type,
+    date_type, time_type, datetime_type,
+}
+
+default_decimal_context = _decimal.getcontext()
+_decimal2str = default_decimal_context.to_eng_string
+
+#
+# Reducers of the objects into nodes
+#
+def node_reduce(o):
+    return o
+
+def attribute_reduce(o):
+    return attribute(o.name, o.val)
+
+_c_type_reducers = {
+    Node: node_reduce,
+    Attribute: attribute_reduce
+}
+
+c_reduce_dict = _c_type_reducers.copy()
+
+def reset_reduce():
+    c_reduce_dict.clear()
+    c_reduce_dict.update(_c_type_reducers)
+
+def reduce(type_, reduce_func = None):
+    if reduce_func is None:
+        def _factory(factory_func):
+            c_reduce_dict[type_] = factory_func
+            return factory_func
+        return _factory
+    else:
+        c_reduce_dict[type_] = reduce_func
+
+reduce_dict = c_reduce_dict
+
+def dump_default(v):
+    return c_as_unicode(str(v))
+
+c_simple_dumpers = {}
+
+#
+# Dumping of the simple values
+#
+class SimpleDumper(object):
+
+    def __call__(self, o):
+        _dumper = self.mapping().get(type(o), None)
+        if _dumper is None:
+            return '???'
+        return _dumper(o)
+
+    def mapping(self):
+        mapping = dict(c_simple_dumpers)
+        mapping.update({
+            unicode_type: self.dump_unicode,
+            str_type: self.dump_str,
+            int_type: self.dump_int,
+            long_type: self.dump_int,
+            float_type: self.dump_float,
+            decimal_type: self.dump_decimal,
+            none_type: self.dump_none,
+            bytes_type: self.dump_bytes,
+            bytearray_type: self.dump_bytes,
+            date_type: self.dump_date,
+            time_type: self.dump_time,
+            datetime_type: self.dump_datetime,
+            bool_type: self.dump_bool,
+        })
+        return mapping
+
+    def dump_int(self, o):
+        return int_type.__repr__(o)
+
+    def dump_float(self, o):
+        if o - o == 0:
+            return float_type.__repr__(o)
+
+        if o != o:
+            return '?'
+
+        if o < 0:
+            return '-∞'
+        else:
+            return '∞'
+
+    def dump_decimal(self, d):
+        if d.is_finite():
+            val = _decimal2str(d)
+
+        elif d.is_nan():
+            val = '?'
+
+        elif d.is_signed():
+            val = '-∞'
+        else:
+            val = '∞'
+
+        return val + 'D'
+
+    def dump_bytes(self, o):
+        text = encodebytes(o).decode('ascii')
+        if o and len(o) % 57 == 0:
+            # The last line is full and has no padding, so the loader would
+            # read the next line as its continuation: mark the end explicitly
+            text = text[:-1] + '=\n'
+        return '|' + text
+
+    def dump_str(self, o):
+        return self.dump_unicode(c_as_unicode(o))
+
+    def dump_unicode(self, line):
+        if '"' in line:
+            line = line.replace('"', '\\"')
+        return '"' + line + '"'
+
+    def dump_bool(self, o):
+        return 'true' if o else 'false'
+
+    def dump_date(self, o):
+        return "%d-%02d-%02d" % (o.year, o.month, o.day)
+
+    def _dump_tzinfo(self, o):
+        offset = o.utcoffset(None)
+        seconds = offset.seconds + offset.days * 86400 # 24 * 60 * 60
+
+        if seconds < 0:
+            seconds = -seconds
+            sign = '-'
+        else:
+            sign = '+'
+
+        minutes, seconds = builtins.divmod(seconds, 60)
+        hours, minutes = builtins.divmod(minutes, 60)
+
+        if minutes:
+            return '%s%02d:%02d' % (sign, hours, minutes)
+        else:
+            return '%s%02d' % (sign, hours)
+
+    def dump_time(self, o):
+        if o.microsecond:
+            t = "%02d:%02d:%02d.%06d" % (o.hour, o.minute, o.second, o.microsecond)
+        elif o.second:
+            t = "%02d:%02d:%02d" % (o.hour, o.minute, o.second)
+        else:
+            t = "%02d:%02d" % (o.hour, o.minute)
+
+        tzinfo = o.tzinfo
+        if tzinfo is not None:
+            t += self._dump_tzinfo(tzinfo)
+
+        return t
+
+    def dump_datetime(self, o):
+        if o.microsecond:
+            t = "%d-%02d-%02dT%02d:%02d:%02d.%06d" % (o.year, o.month, o.day, o.hour, o.minute, o.second, o.microsecond)
+        elif o.second:
+            t = "%d-%02d-%02dT%02d:%02d:%02d" % (o.year, o.month, o.day, o.hour, o.minute, o.second)
+        else:
+            t = "%d-%02d-%02dT%02d:%02d" % (o.year, o.month, o.day, o.hour, o.minute)
+
+        tzinfo = o.tzinfo
+        if tzinfo is not None:
+            t += self._dump_tzinfo(tzinfo)
+
+        return t
+
+    def dump_none(self, o):
+        return 'null'
+
+_simple_dumper = SimpleDumper()
+
+class SimpleDumpers(object):
+
+    def __init__(self):
+        self.mapping = c_simple_dumpers.copy()
+
+    def add(self, tp, ptr):
+        self.mapping[tp] = ptr
+
+    def update(self, o):
+        if type(o) is dict:
+            self.mapping.update(o)
+        elif type(o) is SimpleDumpers:
+            self.mapping.update(o.mapping)
+
+def dump_as_str(tp, dump_func=None):
+    '''
+    Dump values of the type `tp` as text returned by `dump_func`
+    (default is `str`).
+    '''
+    if dump_func is None:
+        dump_func = dump_default
+    c_simple_dumpers[tp] = dump_func
+
+#
+# Dumping of the names and keys
+#
+_simple_name_match = re.compile(r'(?!\d)\w+(?:\.\w*)?\Z').match
+_simple_key_match = re.compile(r'(?!\d)\w+\Z').match
+
+def _dump_name(name):
+    if not name:
+        raise ValueError('Empty name')
+
+    if _simple_name_match(name) and name not in reserved_name_dict:
+        return name
+
+    if '`' in name:
+        name = name.replace('`', '\\`')
+    return '`' + name + '`'
+
+def _dump_key(key):
+    if _simple_key_match(key) and key not in reserved_name_dict:
+        return key
+
+    if '"' in key:
+        key = key.replace('"', '\\"')
+    return '"' + key + '"'
+
+_simple_types = {
+    types.unicode_type, types.str_type, types.int_type, types.long_type,
+    types.float_type, types.decimal_type, types.bool_type, types.none_type,
+    types.date_type, types.time_type, types.datetime_type}
+
+
+class Dumper(object):
+    '''
+    Dumper class.
+    '''
+    #
+    def __init__(self, fd, pretty=0, braces=0, sorted=1, hsize=0, crossref=0):
+        self.crossref = 1 if crossref else 0
+        self.crossref_set = None
+        self.crossref_set2 = None
+        self.crossref_dict = None
+        self.collected = 0
+
+        self.pretty = 0
+        if pretty:
+            self.pretty = 1
+            if braces:
+                self.pretty = 2
+        if self.pretty and hsize <= 0:
+            self.hsize = 65000
+        else:
+            self.hsize = hsize
+
+        self.sorted = sorted
+
+        self.c_type_reducers = c_reduce_dict
+
+        self.fd = fd
+        self.write = fd.write
+
+        self.sdumper = _simple_dumper
+        self.simple_dumpers = self.sdumper.mapping()
+    #
+    def is_simple_type(self, o):
+        return type(o) in _simple_types or \
+               (self.crossref and id(o) in self.crossref_set2)
+    #
+    def is_all_simple_list(self, l, n):
+        for i in range(n):
+            if not self.is_simple_type(l[i]):
+                return 0
+        return 1
+    #
+    def dump_label(self, o):
+        o_id = id(o)
+        if o_id in self.crossref_set2:
+            self.write('*')
+            self.write(self.crossref_dict[o_id])
+            return 1
+        elif o_id in self.crossref_set:
+            self.write('&')
+            self.write(self.crossref_dict[o_id])
+            self.write(' ')
+            self.crossref_set2.add(o_id)
+            self.crossref_set.remove(o_id)
+            return 2
+        else:
+            return -1
+    #
+    def reduce_value(self, o):
+        otype = type(o)
+        reducer = self.c_type_reducers.get(otype, None)
+        if reducer is None:
+            errors.error_no_reducer(otype)
+
+        ob = reducer(o)
+        obtype = type(ob)
+        if obtype in _reduced_types or obtype is axon_odict:
+            return ob
+        errors.error_reducer_wrong_type(obtype)
+    #
+    def dump_value(self, o):
+        if self.crossref:
+            if self.dump_label(o) == 1:
+                return
+
+        otype = type(o)
+        _dumper = self.simple_dumpers.get(otype, None)
+        if _dumper is not None:
+            self.write(_dumper(o))
+            return
+
+        if otype not in _complex_types:
+            o = self.reduce_value(o)
+            otype = type(o)
+
+        if otype is list:
+            self.dump_list(o)
+        elif otype is dict:
+            self.dump_dict(o)
+        elif otype is tuple:
+            self.dump_tuple(o)
+        elif otype is axon_odict:
+            self.dump_odict(o)
+        elif otype is Node:
+            self.dump_node(o)
+        elif otype is Attribute:
+            self.dump_attribute(o)
+        elif otype is KeyVal:
+            self.dump_keyval(o)
+    #
+    def pretty_dump_value(self, o, offset, use_offset):
+        new_offset = offset + '  '
+
+        if self.dump_simple_value(o):
+            return
+
+        otype = type(o)
+        if otype not in _complex_types:
+            o = self.reduce_value(o)
+            otype = type(o)
+
+        if otype is list:
+            self.pretty_dump_list(o, new_offset, use_offset)
+        elif otype is dict:
+            self.pretty_dump_dict(o, new_offset, use_offset)
+        elif otype is tuple:
+            self.pretty_dump_tuple(o, new_offset, use_offset)
+        elif otype is axon_odict:
+            self.pretty_dump_odict(o, new_offset, use_offset)
+        elif otype is Node:
+            self.pretty_dump_node(o, new_offset, 1)
+        elif otype is Attribute:
+            self.pretty_dump_attribute(o, offset, 1)
+        elif otype is KeyVal:
+            self.pretty_dump_keyval(o, offset, 1)
+    #
+    def dump_simple_value(self, o):
+        if self.crossref:
+            if self.dump_label(o) == 1:
+                return 1
+
+        _dumper = self.simple_dumpers.get(type(o), None)
+        if _dumper is None:
+            return 0
+
+        self.write(_dumper(o))
+        return 1
+    #
+    def dump_attribute(self, attr):
+        self.write(_dump_name(attr.name))
+        self.write(':')
+        self.dump_value(attr.val)
+
+    def pretty_dump_attribute(self, attr, offset, use_offset):
+        self.write(_dump_name(attr.name))
+        self.write(': ')
+        self.pretty_dump_value(attr.val, offset, 1)
+    #
+    def dump_keyval(self, attr):
+        self.write(_dump_key(attr.key))
+        self.write(':')
+        self.dump_value(attr.val)
+
+    def pretty_dump_keyval(self, attr, offset, use_offset):
+        self.write(_dump_key(attr.key))
+        self.write(': ')
+        self.pretty_dump_value(attr.val, offset, 1)
+    #
+    def dump_dict_values(self, d):
+        items = d.items()
+        if self.sorted:
+            items = sorted(items)
+
+        self.dump_mapping_values(items, _dump_key)
+    #
+    def dump_mapping_values(self, items, dump_key):
+        write = self.write
+        dump_value = self.dump_value
+        i = 0
+        for k, v in items:
+            if i > 0:
+                write(' ')
+            write(dump_key(c_as_unicode(k)))
+            write(':')
+            dump_value(v)
+            i += 1
+    #
+    def dump_list_sequence(self, l):
+        write = self.write
+        dump_value = self.dump_value
+        i = 0
+        for v in l:
+            if i > 0:
+                write(' ')
+            dump_value(v)
+            i += 1
+    #
+    def dump_node(self, o):
+        self.write(_dump_name(o.__tag__))
+        self.write('{')
+        attrs = o.__attrs__
+        vals = o.__vals__
+        if attrs:
+            self.dump_mapping_values(attrs.items(), _dump_name)
+        if vals:
+            if attrs:
+                self.write(' ')
+            self.dump_list_sequence(vals)
+        self.write('}')
+    #
+    def dump_list(self, l):
+        self.write('[')
+        self.dump_list_sequence(l)
+        self.write(']')
+    #
+    def dump_dict(self, d):
+        self.write('{')
+        self.dump_dict_values(d)
+        self.write('}')
+    #
+    def dump_odict(self, d):
+        self.write('[')
+        if d:
+            self.dump_mapping_values(d.items(), _dump_key)
+        else:
+            self.write(':')
+        self.write(']')
+    #
+    def dump_tuple(self, d):
+        self.write('(')
+        self.dump_list_sequence(d)
+        self.write(')')
+    #
+    def pretty_dump_node(self, o, w, use_offset):
+        self.write(_dump_name(o.__tag__))
+
+        attrs = o.__attrs__
+        vals = o.__vals__
+        n, m = 0, 0
+        if attrs is not None:
+            m = len(attrs)
+        if vals is not None:
+            n = len(vals)
+
+        if n == 0 and m == 0:
+            if self.pretty == 2:
+                self.write(' {}')
+            return
+
+        if m == 0 and n == 1 and self.is_simple_type(vals[0]):
+            # Single simple value is kept inline in both forms
+            self.write(' {')
+            self.dump_simple_value(vals[0])
+            self.write('}')
+            return
+
+        if self.pretty == 1:
+            self.write('\n')
+            self.write(w)
+        elif self.pretty == 2:
+            self.write(' {')
+            if m == 0 and n <= self.hsize and self.is_all_simple_list(vals, n):
+                use_offset = 0
+            if use_offset:
+                self.write('\n')
+                self.write(w)
+
+        if attrs:
+            self.pretty_dump_node_attrs(attrs, w, use_offset)
+        if vals:
+            if attrs:
+                self.write('\n')
+                self.write(w)
+            self.pretty_dump_node_sequence(vals, w, use_offset)
+
+        if self.pretty == 2:
+            self.write('}')
+    #
+    def pretty_dump_node_sequence(self, l, w, use_offset):
+        n = len(l)
+        if n == 0:
+            return
+        elif n == 1:
+            v = l[0]
+            if self.is_simple_type(v):
+                self.dump_simple_value(v)
+            else:
+                self.pretty_dump_value(v, w, 0)
+            return
+        elif n <= self.hsize and self.is_all_simple_list(l, n):
+            for i in range(n):
+                if i > 0:
+                    self.write(' ')
+                self.dump_simple_value(l[i])
+            return
+
+        j = 0
+        flag = 0
+        for i in range(n):
+
+            v = l[i]
+
+            use_offset = 0
+            if i > 0:
+                if not flag or j >= self.hsize:
+                    use_offset = 1
+                    j = 0
+
+                flag = self.is_simple_type(v)
+                if not flag:
+                    use_offset = 1
+            else:
+                flag = self.is_simple_type(v)
+
+            if use_offset:
+                self.write('\n')
+                self.write(w)
+            elif j > 0:
+                self.write(' ')
+
+            self.pretty_dump_value(v, w, 0)
+
+            j += 1
+    #
+    def pretty_dump_node_attrs(self, attrs, w, use_offset):
+        n = len(attrs)
+        if n == 0:
+            return
+        elif n == 1:
+            for name, val in attrs.items():
+                if self.is_simple_type(val):
+                    self.write(_dump_name(c_as_unicode(name)))
+                    self.write(': ')
+                    self.dump_simple_value(val)
+                    return
+
+        j = 0
+        for name, val in attrs.items():
+            if j > 0:
+                self.write('\n')
+                self.write(w)
+
+            self.write(_dump_name(c_as_unicode(name)))
+            self.write(': ')
+            self.pretty_dump_value(val, w, 1)
+
+            j += 1
+    #
+    def pretty_dump_list(self, l, w, use_offset):
+        self.write('[')
+        self.pretty_dump_list_sequence(l, w, use_offset)
+        self.write(']')
+    #
+    def pretty_dump_list_sequence(self, l, w, use_offset):
+        n = len(l)
+        if n == 0:
+            return
+        elif n == 1:
+            v = l[0]
+            if self.is_simple_type(v):
+                self.dump_simple_value(v)
+            else:
+                self.pretty_dump_value(v, w, 0)
+            return
+
+        if n <= self.hsize and self.is_all_simple_list(l, n):
+            for i in range(n):
+                if i > 0:
+                    self.write(' ')
+                self.dump_simple_value(l[i])
+            return
+
+        j = 0
+        flag = 0
+        for i in range(n):
+
+            v = l[i]
+
+            if i > 0:
+                if not flag or j >= self.hsize:
+                    use_offset = 1
+                    j = 0
+
+                flag = self.is_simple_type(v)
+                if not flag:
+                    use_offset = 1
+            else:
+                flag = self.is_simple_type(v)
+
+            if use_offset:
+                self.write('\n')
+                self.write(w)
+            else:
+                self.write(' ')
+
+            self.pretty_dump_value(v, w, 0)
+
+            j += 1
+    #
+    def pretty_dump_dict(self, d, w, use_offset):
+        self.write('{')
+        self.pretty_dump_dict_values(d, w, use_offset, self.sorted)
+        self.write('}')
+    #
+    def pretty_dump_odict(self, d, w, use_offset):
+        self.write('[')
+        if d:
+            self.pretty_dump_dict_values(d, w, use_offset, 0)
+        else:
+            self.write(':')
+        self.write(']')
+    #
+    def pretty_dump_dict_values(self, d, w, use_offset, sorted_items):
+        n = len(d)
+        if n == 0:
+            return
+        elif n == 1:
+            for key, val in d.items():
+                if self.is_simple_type(val):
+                    self.write(_dump_key(c_as_unicode(key)))
+                    self.write(': ')
+                    self.dump_simple_value(val)
+                    return
+
+        items = d.items()
+        if sorted_items:
+            items = sorted(items)
+
+        i = 0
+        for k, v in items:
+
+            if i > 0:
+                use_offset = 1
+
+            if use_offset:
+                self.write('\n')
+                self.write(w)
+            elif n > 1:
+                self.write(' ')
+
+            self.write(_dump_key(c_as_unicode(k)))
+            self.write(': ')
+            self.pretty_dump_value(v, w, 1)
+
+            i += 1
+    #
+    def pretty_dump_tuple(self, l, w, use_offset):
+        self.write('(')
+        self.pretty_dump_list_sequence(l, w, use_offset)
+        self.write(')')
+    #
+    def dump(self, seq):
+        '''
+        Main dumping method.
+
+        :param seq:
+            Sequence of values or mapping. Items of the mapping are
+            dumped as `key: value` pairs.
+        '''
+        is_mapping = isinstance(seq, MutableMapping)
+
+        if self.crossref:
+            self.collect(seq.values() if is_mapping else seq)
+            self.apply_crossref()
+
+        if is_mapping:
+            iterseq = (keyval(k, v) for k, v in seq.items())
+        else:
+            iterseq = iter(seq)
+
+        i = 0
+        for v in iterseq:
+            if i > 0:
+                self.write('\n')
+            if self.pretty:
+                self.pretty_dump_value(v, '', 0)
+            else:
+                self.dump_value(v)
+            i += 1
+    #
+    def apply_crossref(self):
+        crossref_dict = {}
+        i = 0
+        for o_ref, count in self.crossref_dict.items():
+            if count > 1:
+                i += 1
+                crossref_dict[o_ref] = str(i)
+
+        self.crossref_set = set(crossref_dict)
+        self.crossref_dict = crossref_dict
+        self.crossref_set2 = set()
+    #
+    def collect_value(self, o):
+
+        otype = type(o)
+        if otype in simple_types:
+            return
+
+        ref_o = id(o)
+        count = self.crossref_dict.get(ref_o, 0)
+        self.crossref_dict[ref_o] = count + 1
+        if count:
+            return
+
+        if otype not in _complex_types:
+            o = self.reduce_value(o)
+            otype = type(o)
+            self.collect_objects.append(o)
+
+        if otype is list or otype is tuple or otype is set:
+            self.collect_list(o)
+        elif otype is dict or otype is axon_odict:
+            self.collect_list(o.values())
+        elif otype is Node:
+            self.collect_node(o)
+        elif otype is Attribute or otype is KeyVal:
+            self.collect_value(o.val)
+    #
+    def collect_list(self, lst):
+        for v in lst:
+            self.collect_value(v)
+    #
+    def collect_node(self, ob):
+        if ob.__attrs__:
+            self.collect_list(ob.__attrs__.values())
+        if ob.__vals__:
+            self.collect_list(ob.__vals__)
+    #
+    def collect(self, values):
+        self.crossref_dict = {}
+        # Keeps the reduced objects alive while their ids are counted
+        self.collect_objects = []
+        for v in values:
+            self.collect_value(v)
+        self.collected = 1
+
+_complex_types = {list, dict, tuple, axon_odict, Node, Attribute, KeyVal}
+_reduced_types = {Node, Attribute, KeyVal, dict, list, tuple}
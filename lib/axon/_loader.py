@@ -1,7 +1,951 @@
-def __bootstrap__():
-    global __bootstrap__, __loader__, __file__
-    import sys, pkg_resources, imp
-    __file__ = pkg_resources.resource_filename(__name__, '_loader.cp35-win32.pyd')
-    __loader__ = None; del __bootstrap__, __loader__
-    imp.load_dynamic(__name__,__file__)
-__bootstrap__()
+# coding: utf-8
+
+# The MIT License (MIT)
+#
+# Copyright (c) <2011-2015> <Shibzukhov Zaur, szport at gmail dot com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Portable implementation of the loader. It replaces the bootstrap stub of
+# the win32 extension. The loader reads the input line by line like the
+# compiled one, but scans tokens with precompiled regular expressions and
+# str methods instead of stepping over single characters.
+
+import sys
+import re
+
+import axon.errors as errors
+
+from axon.odict import OrderedDict as axon_odict
+from axon._objects import SafeBuilder, StrictBuilder, MixedBuilder, SimpleBuilder
+from axon._objects import KeyVal, Attribute
+from axon._objects import c_new_keyval, c_new_attribute, c_undefined
+from axon._objects import c_constants, reserved_name_dict, name_cache
+
+_builder_dict = {
+    'safe': SafeBuilder(),
+    'strict': StrictBuilder(),
+    'mixed': MixedBuilder()
+}
+
+def register_builder(mode, builder):
+    _builder_dict[mode] = builder
+
+def get_builder(mode):
+    return _builder_dict.get(mode, None)
+
+#
+# Token scanners
+#
+_not_space_search = re.compile('[^\x00- ]').search
+_number_match = re.compile(r'-?[0-9]+(\.[0-9]*)?([eE][-+]?[0-9]*)?').match
+_date_match = re.compile(r'([0-9]{1,4})-([0-9]{1,2})-([0-9]{1,2})').match
+_time_match = re.compile(r'([0-9]{1,2}):([0-9]{1,2})(?::([0-9]{1,2})(?:\.([0-9]{1,6}))?)?').match
+_tzinfo_match = re.compile(r'([-+]?)([0-9]{1,2})(?::([0-9]{1,2}))?').match
+_name_match = re.compile(r'\w+(?:\.\w*)?').match
+_key_match = re.compile(r'\w+').match
+_base64_match = re.compile(r'[0-9a-zA-Z+/]*').match
+
+# Length of the lines of MIME base64 text written by the dumper
+MIME_LINE_SIZE = 76
+_string_search = {
+    '"': re.compile(r'["\\\n\r]').search,
+    '`': re.compile(r'[`\\\n\r]').search,
+    "'": re.compile(r"['\\\n\r]").search,
+}
+
+# Fast path for the plain scalars (strings without escapes or line breaks,
+# ints and floats): runs of them inside of lists and dicts are matched by one
+# regex and anything else falls back to get_value
+_plain_string = r'"([^"\\\n\r]*)"'
+_plain_number = r'(-?[0-9]+)(?![.eE0-9])|(-?[0-9]+(?:\.[0-9]*)?(?:[eE][-+]?[0-9]+)?)'
+_list_run_match = re.compile(
+    r'(?:[ \t]*(?:"[^"\\\n\r]*"(?=[ \t]*[^\s:#])|-?[0-9][0-9.]*(?:[eE][-+]?[0-9]*)?)(?=[ \t\r\n\]]))+'
+    ).match
+_list_item_findall = re.compile(_plain_string + r'|(\S+)').findall
+_dict_item_match = re.compile(
+    r'[ \t]*(?:([A-Za-z_]\w*)|' + _plain_string + r')[ \t]*:[ \t]*(?:' +
+    _plain_string + '|' + _plain_number + r')(?=[ \t\r\n}])'
+    ).match
+_line_item_match = re.compile(
+    r'(?:' + _plain_string + '|' + _plain_number + r')(?=[ \t]*[\r\n]*\Z)'
+    ).match
+
+def plain_number(text):
+    # Raises ValueError for the malformed numbers, which are left to get_value
+    if '.' in text or 'e' in text or 'E' in text:
+        return float(text)
+    return int(text)
+
+def current_char(self):
+    line = self.line
+    pos = self.pos
+    if pos < len(line):
+        return line[pos]
+    return '\0'
+
+def next_char(self):
+    self.pos += 1
+    return current_char(self)
+
+def skip_char(self):
+    self.pos += 1
+
+def get_chunk(self, pos0):
+    return self.line[pos0:self.pos]
+
+def is_digit(ch):
+    return '0' <= ch <= '9'
+
+def is_name_start(ch):
+    return ch.isalpha() or ch == '_'
+
+#
+# Loader
+#
+class Loader(object):
+
+    '''
+    Loader from line oriented unicode text inputs.
+
+    Values are built by the builder which corresponds to `mode`:
+
+        * `safe` - nodes are built as :py:class:`Node` instances
+        * `strict` - nodes are built by the registered factories
+        * `mixed` - nodes are built by the registered factories when
+          the factory is registered and as :py:class:`Node` otherwise
+    '''
+    #
+    def __init__(self, fd, mode='safe', errto=None, json=False):
+        '''
+        .. py:function:: Loader(fd, mode="safe", errto=None, json=False)
+
+            :param fd:
+                File-like object with `readline` method.
+
+            :param mode:
+                Mode of building complex values (`safe`, `strict`, `mixed`).
+
+            :param errto:
+                Name of file for reporting errors
+        '''
+        self.fd = fd
+        self.readline = fd.readline
+
+        self.bc = 0
+        self.bs = 0
+        self.bq = 0
+        self.ba = 0
+
+        self.labeled_objects = {}
+
+        if json:
+            self.json = 1
+        else:
+            self.json = 0
+
+        self.builder = get_builder(mode)
+        if self.builder is None:
+            raise ValueError("Invalid mode: %s" % mode)
+
+        self.sbuilder = SimpleBuilder()
+
+        self.c_constants = c_constants.copy()
+
+        if errto is None:
+            self.errto = sys.stderr
+        else:
+            self.errto = open(errto, 'wt')
+
+        self.line = ''
+        self.pos = 0
+        self.col = 0
+        self.eof = 0
+        self.is_nl = 0
+        self.idn = 0
+
+        self.lnum = 0
+
+        self.before08 = 0
+
+        self.next_line()
+    #
+    def _check_pairs(self):
+        if self.bc > 0:
+            errors.error(self, 'Missed closing }')
+        elif self.bc < 0:
+            errors.error(self, 'Extra closing }')
+
+        if self.bs > 0:
+            errors.error(self, 'Missed closing ]')
+        elif self.bs < 0:
+            errors.error(self, 'Extra closing ]')
+
+        if self.bq > 0:
+            errors.error(self, 'Missed closing )')
+        elif self.bq < 0:
+            errors.error(self, 'Extra closing )')
+
+        if self.ba > 0:
+            errors.error(self, 'Missed closing >')
+        elif self.ba < 0:
+            errors.error(self, 'Extra closing >')
+    #
+    def _finish(self):
+        self.fd.close()
+        self._check_pairs()
+        if self.errto is not sys.stderr:
+            self.errto.close()
+    #
+    def load(self):
+        '''
+        Load all values.
+        '''
+        sequence = []
+        is_odict = 0
+
+        ch = self.skip_spaces()
+        while 1:
+            if ch == '#':
+                self.skip_comments()
+            if self.eof:
+                self._finish()
+                break
+
+            val = self.try_get_line_value()
+            if val is c_undefined:
+                val = self.get_value(0, 2)
+            if not sequence:
+                if type(val) is KeyVal:
+                    is_odict = 1
+            elif is_odict and not type(val) is KeyVal:
+                errors.error(self, "Expected key:val pair")
+            elif not is_odict and type(val) is KeyVal:
+                errors.error(self, "Unexpected key:val pair")
+            sequence.append(val)
+
+            ch = self.skip_spaces()
+
+        if is_odict:
+            return axon_odict(sequence)
+        else:
+            return sequence
+    #
+    def iload(self):
+        '''
+        Iterative get value
+        '''
+        ch = self.skip_spaces()
+        while 1:
+            if ch == '#':
+                self.skip_comments()
+            if self.eof:
+                self._finish()
+                break
+
+            val = self.try_get_line_value()
+            if val is c_undefined:
+                val = self.get_value(0, 2)
+            yield val
+
+            ch = self.skip_spaces()
+    #
+    def __iter__(self):
+        '''
+        Return iterator for iterative loading of values.
+        '''
+        return self.iload()
+    #
+    def next_line(self):
+
+        line = self.readline()
+
+        if line == '':
+            self.eof = 1
+            self.line = ''
+            self.pos = 0
+            self.col = 0
+        else:
+            if line[-1] != '\n':
+                line += '\n'
+            self.eof = 0
+            self.lnum += 1
+
+            self.line = line
+            self.pos = 0
+            self.col = 0
+    #
+    def try_get_line_value(self):
+        # Plain scalar which takes the rest of the line
+        m = _line_item_match(self.line, self.pos)
+        if m is None:
+            return c_undefined
+
+        text, inum, fnum = m.groups()
+        self.pos = m.end()
+        if inum is not None:
+            return int(inum)
+        elif fnum is not None:
+            return float(fnum)
+
+        ch = self.skip_spaces()
+        if ch == ':':
+            skip_char(self)
+            self.skip_spaces()
+            return c_new_keyval(text, self.get_value(0))
+        return text
+    #
+    def skip_spaces(self):
+        if self.eof:
+            return '\0'
+        self.is_nl = 0
+
+        line = self.line
+        pos = self.pos
+        while 1:
+            m = _not_space_search(line, pos)
+            if m is None:
+                # The rest of the line is blank
+                self.next_line()
+                self.is_nl = 1
+                if self.eof:
+                    return '\0'
+                line = self.line
+                pos = 0
+            else:
+                end = m.start()
+                if end != pos:
+                    self.col += (end - pos) + 7 * line.count('\t', pos, end)
+                self.pos = end
+                return line[end]
+    #
+    def skip_whitespace(self):
+        ch = current_char(self)
+        while ch == ' ' or ch == '\t':
+            if ch == '\t':
+                self.col += 8
+            else:
+                self.col += 1
+            ch = next_char(self)
+    #
+    def get_date(self, pos0):
+        m = _date_match(self.line, pos0)
+        if m is None:
+            return None
+        self.pos = m.end()
+        if is_digit(current_char(self)):
+            return None
+        return m.groups()
+    #
+    def get_time(self, pos0):
+        m = _time_match(self.line, pos0)
+        if m is None:
+            return None
+        self.pos = m.end()
+        if is_digit(current_char(self)):
+            return None
+        h, mi, s, ms = m.groups()
+        return (int(h), int(mi), int(s) if s else 0, int(ms) if ms else 0)
+    #
+    def get_tzinfo(self):
+        ch = current_char(self)
+        if not (ch == '-' or ch == '+' or is_digit(ch)):
+            return None
+
+        m = _tzinfo_match(self.line, self.pos)
+        if m is None:
+            errors.error_invalid_time(self)
+        self.pos = m.end()
+        if is_digit(current_char(self)):
+            errors.error_invalid_time(self)
+
+        sign, h, mi = m.groups()
+        minutes = int(h) * 60 + (int(mi) if mi else 0)
+
+        if minutes > 1440:
+            errors.error_invalid_time(self)
+
+        if sign == '-':
+            minutes = -minutes
+
+        return self.sbuilder.create_tzinfo(minutes)
+    #
+    def get_number(self):
+        line = self.line
+        pos0 = self.pos
+
+        m = _number_match(line, pos0)
+        end = m.end()
+        ch = line[end]
+        frac, exp = m.groups()
+
+        if frac is None and exp is None:
+            if ch == '-':
+                ymd = self.get_date(pos0)
+                if ymd is None:
+                    errors.error_invalid_datetime(self)
+
+                if current_char(self) == 'T':
+                    skip_char(self)
+                    hms = self.get_time(self.pos)
+                    if hms is None:
+                        errors.error_invalid_datetime(self)
+
+                    tzinfo = self.get_tzinfo()
+
+                    return self.sbuilder.create_datetime(
+                                int(ymd[0]), int(ymd[1]), int(ymd[2]),
+                                hms[0], hms[1], hms[2], hms[3], tzinfo)
+                else:
+                    return self.sbuilder.create_date(
+                                int(ymd[0]), int(ymd[1]), int(ymd[2]))
+            elif ch == ':':
+                hms = self.get_time(pos0)
+                if hms is None:
+                    errors.error_invalid_time(self)
+
+                tzinfo = self.get_tzinfo()
+
+                return self.sbuilder.create_time(hms[0], hms[1], hms[2], hms[3], tzinfo)
+
+        self.pos = end
+        if exp is not None and not is_digit(exp[-1]):
+            errors.error_getnumber(self)
+
+        text = line[pos0:end]
+
+        if ch == 'd' or ch == 'D' or ch == '$':
+            self.pos = end + 1
+            return self.sbuilder.create_decimal(text)
+
+        if frac is None and exp is None:
+            return self.sbuilder.create_int(text)
+        else:
+            return self.sbuilder.create_float(text)
+    #
+    def get_name(self):
+        m = _name_match(self.line, self.pos)
+        self.pos = m.end()
+        name = m.group()
+        return name_cache.setdefault(name, name)
+    #
+    def get_key(self):
+        m = _key_match(self.line, self.pos)
+        self.pos = m.end()
+        return m.group()
+    #
+    def try_get_name(self):
+        ch = current_char(self)
+        if is_name_start(ch):
+            return self.get_name()
+        elif ch == "`":
+            return self.get_string(ch)
+        else:
+            return None
+    #
+    def try_get_key(self):
+        ch = current_char(self)
+        if is_name_start(ch):
+            return self.get_key()
+        elif ch == '"':
+            return self.get_string(ch)
+        else:
+            return None
+    #
+    def try_get_label(self):
+        m = _key_match(self.line, self.pos)
+        if m is None:
+            errors.error_unexpected_value(self, ' after &')
+        self.pos = m.end()
+        return m.group()
+    #
+    def get_string(self, endch):
+        search = _string_search[endch]
+        line = self.line
+        pos = self.pos + 1
+        text = ''
+        while 1:
+            m = search(line, pos)
+            if m is None:
+                # Only possible on the last line without line end
+                self.pos = len(line)
+                errors.error_unexpected_end_string(self)
+            end = m.start()
+            ch = line[end]
+            if ch == endch:
+                self.pos = end + 1
+                if text:
+                    return text + line[pos:end]
+                return line[pos:end]
+            elif ch == '\\':
+                text += line[pos:end]
+                ch = line[end+1] if end + 1 < len(line) else '\0'
+                if ch == endch:
+                    text += endch
+                    pos = end + 2
+                elif ch == '\n' or ch == '\r':
+                    # Line continuation
+                    self.next_line()
+                    if self.eof:
+                        errors.error_unexpected_end_string(self)
+                    line = self.line
+                    pos = 0
+                else:
+                    text += '\\'
+                    pos = end + 1
+            else:
+                text += line[pos:end] + '\n'
+                self.next_line()
+                if self.eof:
+                    errors.error_unexpected_end_string(self)
+                line = self.line
+                pos = 0
+    #
+    def get_base64(self):
+        skip_char(self)
+        chunks = []
+        while 1:
+            m = _base64_match(self.line, self.pos)
+            chunk = m.group()
+            chunks.append(chunk)
+            self.pos = m.end()
+            ch = current_char(self)
+            if ch == '=':
+                skip_char(self)
+                if current_char(self) == '=':
+                    skip_char(self)
+                chunks.append('=' * (self.pos - m.end()))
+                break
+            elif (ch == '\n' or ch == '\r') and len(chunk) == MIME_LINE_SIZE:
+                # The text may be continued on the next line
+                ch = self.skip_spaces()
+                if self.eof or _base64_match(ch).end() == 0:
+                    break
+            elif ch <= ' ' or ch in ']})>':
+                # Unpadded text ends with its last short line
+                break
+            else:
+                errors.error(self, 'Invalid character %r in MIME Base64 string' % ch)
+        return self.sbuilder.create_binary(''.join(chunks))
+    #
+    def skip_comment(self):
+        self.next_line()
+    #
+    def skip_comments(self):
+        while 1:
+            self.skip_comment()
+
+            ch = self.skip_spaces()
+            self.is_nl = 1
+            if self.eof:
+                break
+
+            if ch != '#':
+                break
+    #
+    def get_negative_constant(self):
+        ch = current_char(self)
+        if ch == '∞':
+            ch = next_char(self)
+            if ch == 'd' or ch == 'D' or ch == '$':
+                skip_char(self)
+                return self.sbuilder.create_decimal_ninf()
+            else:
+                return self.sbuilder.create_ninf()
+        else:
+            errors.error_invalid_value_with_prefix(self, '-')
+    #
+    def get_value(self, idn, flag=0):
+        ch = current_char(self)
+        if ch == '#':
+            self.skip_comments()
+            ch = current_char(self)
+
+        if '0' <= ch <= '9':
+            return self.get_number()
+
+        if ch == '"':
+            val = self.get_string(ch)
+            if flag == 2:
+                ch = self.skip_spaces()
+                if ch == ':':
+                    skip_char(self)
+                    self.skip_spaces()
+                    val = c_new_keyval(val, self.get_value(0))
+            return val
+
+        if ch == '-':
+            if is_digit(self.line[self.pos+1]):
+                val = self.get_number()
+            else:
+                skip_char(self)
+                val = self.get_negative_constant()
+        elif ch == '{':
+            self.bc += 1
+            skip_char(self)
+            val = self.get_dict_value()
+        elif ch == '[':
+            self.bs += 1
+            skip_char(self)
+            val = self.get_list_value()
+        elif ch == '(':
+            self.bq += 1
+            skip_char(self)
+            val = self.get_tuple_value()
+        elif ch == '<':
+            self.ba += 1
+            skip_char(self)
+            val = self.get_odict_value()
+        elif ch == '|':
+            val = self.get_base64()
+        elif ch == '∞':
+            ch = next_char(self)
+            if ch == 'D' or ch == 'd' or ch == '$':
+                skip_char(self)
+                val = self.sbuilder.create_decimal_inf()
+            else:
+                val = self.sbuilder.create_inf()
+        elif ch == '?':
+            ch = next_char(self)
+            if ch == 'D' or ch == 'd' or ch == '$':
+                skip_char(self)
+                val = self.sbuilder.create_decimal_nan()
+            else:
+                val = self.sbuilder.create_nan()
+        elif ch == '*':
+            skip_char(self)
+            label = self.try_get_label()
+            val = self.labeled_objects.get(label, c_undefined)
+            if val is c_undefined:
+                errors.error(self, "Undefined label %r" % label)
+        elif ch == '&':
+            skip_char(self)
+            label = self.try_get_label()
+
+            self.skip_spaces()
+            if self.eof:
+                errors.error_unexpected_end(self)
+
+            val = self.get_value(idn, flag)
+            self.labeled_objects[label] = val
+        elif ch == '$':
+            skip_char(self)
+            if not is_name_start(current_char(self)):
+                errors.error_expected_name(self)
+            name = self.get_name()
+            val = self.c_constants.get(name, c_undefined)
+            if val is c_undefined:
+                errors.error_undefined_name(self, name)
+        else:
+            if is_name_start(ch):
+                name = self.get_name()
+                val = reserved_name_dict.get(name, c_undefined)
+                is_idn = 1
+            elif ch == "`":
+                name = self.get_string(ch)
+                val = c_undefined
+                is_idn = 0
+            elif self.eof:
+                errors.error_unexpected_end(self)
+            else:
+                errors.error(self, "Invalid token")
+
+            if val is c_undefined:
+                val = self.get_named_value(name, is_idn, idn, flag)
+
+        return val
+    #
+    def get_named_value(self, name, is_idn, idn, flag):
+        ch = self.skip_spaces()
+        if ch == '#':
+            self.skip_comments()
+            ch = current_char(self)
+
+        if self.is_nl:
+            if self.eof or self.col <= idn:
+                return self.builder.create_node(name, None, None)
+            else:
+                return self.get_complex_value(name, self.col)
+
+        if ch == '{':
+            self.bc += 1
+            skip_char(self)
+            self.skip_spaces()
+            return self.get_complex_value(name, 0)
+        elif ch == ':':
+            skip_char(self)
+            self.skip_spaces()
+            if self.eof:
+                errors.error_unexpected_end(self)
+
+            if flag == 1:
+                return c_new_attribute(name, self.get_value(idn))
+            elif flag == 2:
+                if is_idn:
+                    return c_new_keyval(name, self.get_value(idn))
+                else:
+                    errors.error(self, "Unexpected key:val pair")
+            else:
+                errors.error_unexpected_attribute(self, name)
+        elif self.eof:
+            return self.builder.create_node(name, None, None)
+        else:
+            errors.error_unexpected_value(self, 'Expected attribute or complex value with the name %r' % name)
+    #
+    def get_complex_value(self, name, idn):
+        attrs = None
+        vals = None
+        ch = current_char(self)
+        while 1:
+            if ch == '#':
+                self.skip_comments()
+                ch = current_char(self)
+
+            if idn:
+                if self.eof or self.col < idn or ch in '])>':
+                    break
+                elif self.col == idn:
+                    pass
+                elif self.is_nl:
+                    errors.error_indentation(self, idn)
+            elif self.eof:
+                errors.error(self, "Unexpected end inside complex value with name %r" % name)
+
+            if ch == '}':
+                if idn:
+                    # Closes the enclosing value with braces
+                    break
+                self.bc -= 1
+                skip_char(self)
+                break
+
+            val = self.get_value(idn, 1)
+            if type(val) is Attribute:
+                if vals is not None:
+                    errors.error_unexpected_attribute(self, val.name)
+                if attrs is None:
+                    attrs = axon_odict()
+                attrs[val.name] = val.val
+            elif vals is None:
+                vals = [val]
+            else:
+                vals.append(val)
+
+            ch = self.skip_spaces()
+
+        return self.builder.create_node(name, attrs, vals)
+    #
+    def get_list_value(self):
+
+        sequence = []
+        is_odict = 0
+
+        ch = self.skip_spaces()
+
+        if ch == '#':
+            self.skip_comments()
+            ch = current_char(self)
+
+        if ch == ']':
+            skip_char(self)
+            self.bs -= 1
+            return sequence
+        elif ch == ':':
+            ch = next_char(self)
+            if ch == ']':
+                skip_char(self)
+                self.bs -= 1
+                return axon_odict()
+            else:
+                errors.error(self, "Invalid empty ordered dict")
+        elif self.eof:
+            errors.error(self, "Unexpected end inside of the list")
+
+        val = self.get_value(0, 2)
+        if type(val) is KeyVal:
+            is_odict = 1
+        sequence.append(val)
+
+        get_value = self.get_value
+        skip_spaces = self.skip_spaces
+        json = self.json
+        append = sequence.append
+        while 1:
+            ch = skip_spaces()
+
+            if json and ch == ',':
+                skip_char(self)
+                ch = skip_spaces()
+
+            if ch == '#':
+                self.skip_comments()
+                ch = current_char(self)
+
+            if ch == ']':
+                skip_char(self)
+                self.bs -= 1
+                if is_odict:
+                    return axon_odict(sequence)
+                else:
+                    return sequence
+            elif self.eof:
+                errors.error(self, "Unexpected end inside of the list")
+
+            if not is_odict:
+                m = _list_run_match(self.line, self.pos)
+                if m is not None:
+                    end = m.end()
+                    chunk = self.line[self.pos:end]
+                    try:
+                        if '"' in chunk:
+                            items = [plain_number(number) if number else text
+                                     for text, number in _list_item_findall(chunk)]
+                        else:
+                            items = [plain_number(number) for number in chunk.split()]
+                    except ValueError:
+                        items = None
+                    if items is not None:
+                        sequence.extend(items)
+                        self.pos = end
+                        continue
+
+            val = get_value(0, 2)
+            if is_odict and type(val) is not KeyVal:
+                errors.error(self, "Invalid ordered dict")
+
+            append(val)
+    #
+    def get_tuple_value(self):
+
+        sequence = []
+
+        ch = self.skip_spaces()
+
+        while 1:
+            if ch == '#':
+                self.skip_comments()
+                ch = current_char(self)
+
+            if ch == ')':
+                skip_char(self)
+                self.bq -= 1
+                return tuple(sequence)
+            elif self.eof:
+                errors.error(self, "Unexpected end inside of the tuple")
+
+            val = self.get_value(0)
+            sequence.append(val)
+
+            ch = self.skip_spaces()
+
+            if self.json and ch == ',':
+                skip_char(self)
+                ch = self.skip_spaces()
+    #
+    def get_dict_value(self):
+        mapping = {}
+
+        ch = self.skip_spaces()
+
+        while 1:
+            line = self.line
+            m = _dict_item_match(line, self.pos)
+            if m is not None:
+                while m is not None:
+                    name, key, text, inum, fnum = m.groups()
+                    if name is not None:
+                        key = name
+                    if inum is not None:
+                        mapping[key] = int(inum)
+                    elif fnum is not None:
+                        mapping[key] = float(fnum)
+                    else:
+                        mapping[key] = text
+                    self.pos = m.end()
+                    m = _dict_item_match(line, self.pos)
+            else:
+                if ch == '#':
+                    self.skip_comments()
+
+                key = self.try_get_key()
+
+                if key is not None:
+                    ch = self.skip_spaces()
+                    if ch == ':':
+                        skip_char(self)
+                        self.skip_spaces()
+                        if self.eof:
+                            errors.error(self, "Unexpected end inside of the dict")
+
+                        mapping[key] = self.get_value(0)
+                    else:
+                        errors.error(self, "Expected ':' after the key in the dict")
+                else:
+                    ch = current_char(self)
+                    if ch == '}':
+                        skip_char(self)
+                        self.bc -= 1
+                        return mapping
+                    elif self.eof:
+                        errors.error(self, "Unexpected end inside of the dict")
+                    else:
+                        errors.error(self, "Invalid key in the dict")
+
+            ch = self.skip_spaces()
+
+            if self.json and ch == ',':
+                skip_char(self)
+                ch = self.skip_spaces()
+    #
+    def get_odict_value(self):
+        sequence = []
+        ch = self.skip_spaces()
+        while 1:
+            if ch == '#':
+                self.skip_comments()
+
+            key = self.try_get_key()
+
+            if key is not None:
+                ch = self.skip_spaces()
+                if ch == ':':
+                    skip_char(self)
+                    self.skip_spaces()
+                    if self.eof:
+                        errors.error(self, "Unexpected end inside of the ordered dict")
+
+                    sequence.append((key, self.get_value(0)))
+                else:
+                    errors.error(self, "Expected ':' after the key in the ordered dict")
+            else:
+                ch = current_char(self)
+                if ch == '>':
+                    skip_char(self)
+                    self.ba -= 1
+                    return axon_odict(sequence)
+                elif self.eof:
+                    errors.error(self, "Unexpected end inside of the ordered dict")
+                else:
+                    errors.error(self, "Invalid key in the ordered dict")
+
+            ch = self.skip_spaces()
+
+            if self.json and ch == ',':
+                skip_char(self)
+                ch = self.skip_spaces()
@@ -1,7 +1,613 @@
-def __bootstrap__():
-    global __bootstrap__, __loader__, __file__
-    import sys, pkg_resources, imp
-    __file__ = pkg_resources.resource_filename(__name__, '_objects.cp35-win32.pyd')
-    __loader__ = None; del __bootstrap__, __loader__
-    imp.load_dynamic(__name__,__file__)
-__bootstrap__()
+# coding: utf-8
+
+# The MIT License (MIT)
+#
+# Copyright (c) <2011-2015> <Shibzukhov Zaur, szport at gmail dot com>
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+# Portable implementation of the objects that the loader builds and the
+# dumper consumes. It replaces the bootstrap stub of the win32 extension.
+
+import axon.errors as errors
+
+from axon.types import builtins, unicode_type, str_type
+from axon.odict import OrderedDict
+
+import re
+import datetime
+
+try:
+    from base64 import encodebytes, decodebytes
+except ImportError:
+    from base64 import encodestring as encodebytes, decodestring as decodebytes
+
+try:
+    import cdecimal as _decimal
+except ImportError:
+    import decimal as _decimal
+
+default_decimal_context = _decimal.getcontext()
+_str2decimal = default_decimal_context.create_decimal
+_decimal2str = default_decimal_context.to_eng_string
+
+class Undefined(object):
+    __slots__ = ()
+    def __repr__(self):
+        return '??'
+    def __str__(self):
+        return '??'
+
+c_undefined = Undefined()
+undef = c_undefined
+
+#####################################################
+
+c_undescore = '_'
+empty_name = ''
+
+name_cache = {empty_name: empty_name, c_undescore: c_undescore}
+
+def clear_all_names():
+    name_cache.clear()
+    name_cache[empty_name] = empty_name
+    name_cache[c_undescore] = c_undescore
+
+def c_as_unicode(ob):
+    tp = type(ob)
+    if tp is unicode_type:
+        return ob
+    elif tp is str_type:
+        return unicode_type(ob)
+    else:
+        raise TypeError("The type of the object should be `str` or `unicode`.")
+
+def c_as_name(name):
+    if name is None:
+        return empty_name
+    return name_cache.setdefault(name, name)
+
+def c_as_list(ob):
+    if type(ob) is list:
+        return ob
+    elif ob is None:
+        return []
+    else:
+        return list(ob)
+
+def c_as_dict(ob):
+    if type(ob) is dict:
+        return ob
+    elif ob is None:
+        return {}
+    else:
+        return dict(ob)
+
+def c_as_tuple(ob):
+    if type(ob) is tuple:
+        return ob
+    elif ob is None:
+        return ()
+    else:
+        return tuple(ob)
+
+def as_name(name):
+    return c_as_name(c_as_unicode(name))
+
+def as_unicode(o):
+    return c_as_unicode(o)
+
+def as_list(o):
+    return c_as_list(o)
+
+def as_dict(o):
+    return c_as_dict(o)
+
+def as_tuple(o):
+    return c_as_tuple(o)
+
+c_constants = {
+    c_as_name('NaN'): float('nan'),
+    c_as_name('NaND'): _decimal.Decimal(float('nan')),
+    c_as_name('Inf'): float('inf'),
+    c_as_name('NegInf'): float('-inf'),
+}
+
+reserved_name_dict = {'null':None, 'true':True, 'false':False}
+
+#
+# Attribute
+#
+class Attribute(object):
+    __slots__ = ('name', 'val')
+    #
+    def __init__(self, name, val):
+        self.name = c_as_name(name)
+        self.val = val
+    #
+    def __getitem__(self, index):
+        if index == 0:
+            return self.name
+        elif index == 1:
+            return self.val
+        else:
+            raise IndexError('Index out of range: ' + str(index))
+    #
+    def __iter__(self):
+        yield self.name
+        yield self.val
+    #
+    def __eq__(self, other):
+        if type(other) is not Attribute:
+            return NotImplemented
+        return self.name == other.name and self.val == other.val
+    #
+    def __ne__(self, other):
+        if type(other) is not Attribute:
+            return NotImplemented
+        return not (self.name == other.name and self.val == other.val)
+    #
+    __hash__ = None
+    #
+    def __repr__(self):
+        return self.name + ':' + repr(self.val)
+
+def attribute(name, val):
+    return c_new_attribute(c_as_name(c_as_unicode(name)), val)
+
+def c_new_attribute(name, val):
+    a = Attribute.__new__(Attribute)
+    a.name = name
+    a.val = val
+    return a
+
+#
+# KeyVal
+#
+class KeyVal(object):
+    __slots__ = ('key', 'val')
+    #
+    def __init__(self, key, val):
+        self.key = c_as_unicode(key)
+        self.val = val
+    #
+    def __getitem__(self, index):
+        if index == 0:
+            return self.key
+        elif index == 1:
+            return self.val
+        else:
+            raise IndexError('Index out of range: ' + str(index))
+    #
+    def __iter__(self):
+        yield self.key
+        yield self.val
+    #
+    def __eq__(self, other):
+        if type(other) is not KeyVal:
+            return NotImplemented
+        return self.key == other.key and self.val == other.val
+    #
+    def __ne__(self, other):
+        if type(other) is not KeyVal:
+            return NotImplemented
+        return not (self.key == other.key and self.val == other.val)
+    #
+    __hash__ = None
+    #
+    def __repr__(self):
+        return repr(self.key) + ':' + repr(self.val)
+
+def keyval(key, val):
+    return c_new_keyval(c_as_unicode(key), val)
+
+def c_new_keyval(key, val):
+    a = KeyVal.__new__(KeyVal)
+    a.key = key
+    a.val = val
+    return a
+
+#
+# Node
+#
+# The tag, attributes and values live in slots whose names can't clash with
+# AXON attribute names: every other attribute access goes to the attributes.
+#
+_node_slots = ('__tag__', '__attrs__', '__vals__')
+
+class Node(object):
+    __slots__ = _node_slots
+
+    def __init__(self, name, attrs=None, vals=None):
+        _set = object.__setattr__
+        _set(self, '__tag__', c_as_name(name))
+        if attrs is None or len(attrs) == 0:
+            _set(self, '__attrs__', None)
+        else:
+            _set(self, '__attrs__', OrderedDict(attrs))
+
+        if vals is None or len(vals) == 0:
+            _set(self, '__vals__', None)
+        elif type(vals) is list:
+            _set(self, '__vals__', vals)
+        else:
+            _set(self, '__vals__', list(vals))
+    #
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        attrs = self.__attrs__
+        if attrs is not None:
+            val = attrs.get(name, c_undefined)
+            if val is not c_undefined:
+                return val
+        raise AttributeError("Undefined attribute " + name)
+    #
+    def __setattr__(self, name, val):
+        if name.startswith('__'):
+            object.__setattr__(self, name, val)
+        else:
+            attrs = self.__attrs__
+            if attrs is None:
+                attrs = OrderedDict()
+                object.__setattr__(self, '__attrs__', attrs)
+            attrs[name] = val
+    #
+    def __getitem__(self, index):
+        if self.__vals__ is None:
+            raise IndexError('Node has no values')
+        return self.__vals__[index]
+    #
+    def __setitem__(self, index, val):
+        if self.__vals__ is None:
+            raise IndexError('Node has no values')
+        self.__vals__[index] = val
+    #
+    def __iter__(self):
+        if self.__vals__ is None:
+            return iter(())
+        return iter(self.__vals__)
+    #
+    def __bool__(self):
+        return self.__attrs__ is not None or self.__vals__ is not None
+    #
+    __nonzero__ = __bool__
+    #
+    def __eq__(self, other):
+        if type(other) is not Node:
+            return NotImplemented
+        return (self.__tag__ == other.__tag__) and \
+               (self.__attrs__ == other.__attrs__) and \
+               (self.__vals__ == other.__vals__)
+    #
+    def __ne__(self, other):
+        if type(other) is not Node:
+            return NotImplemented
+        return not self.__eq__(other)
+    #
+    __hash__ = None
+    #
+    def __repr__(self):
+        attrs = self.__attrs__
+        vals = self.__vals__
+        return self.__tag__ + '{' + \
+                ', '.join([str(name)+': '+repr(val) for name, val in (attrs or {}).items()]) + \
+                (' ' if attrs and vals else '') + \
+                ', '.join([repr(x) for x in vals or ()]) + '}'
+    #
+    def __reduce__(self):
+        return node, (self.__tag__, self.__attrs__, self.__vals__)
+
+def c_new_node(name, attrs, vals):
+    o = Node.__new__(Node)
+    _set = object.__setattr__
+    _set(o, '__tag__', name)
+    _set(o, '__attrs__', attrs)
+    _set(o, '__vals__', vals)
+    return o
+
+def node(name, attrs=None, vals=None):
+    '''
+    Factory function for creating node.
+
+    :param name:
+        name of the node.
+
+    :param attrs:
+        mapping or sequence of (name, value) pairs with attributes.
+
+    :param vals:
+        python sequence containing values.
+    '''
+    if attrs is not None:
+        if len(attrs) == 0:
+            _attrs = None
+        elif type(attrs) is OrderedDict:
+            _attrs = attrs
+        else:
+            _attrs = OrderedDict(attrs)
+    else:
+        _attrs = attrs
+
+    if vals is None or len(vals) == 0:
+        _vals = None
+    else:
+        _vals = c_as_list(vals)
+
+    return c_new_node(c_as_name(c_as_unicode(name)), _attrs, _vals)
+
+def dict_as_sequence_factory(attrs, vals):
+    return dict(vals or ())
+
+class FactoryRegister(object):
+
+    def __init__(self):
+        self.reset()
+        self.reset_types()
+
+    def reset(self):
+        self.c_factory_dict = {}
+        self.c_factory_dict['dict'] = dict_as_sequence_factory
+
+    def reset_types(self):
+        self.c_type_factory_dict = {}
+
+    def factory(self, name, factory_func=None):
+        name = c_as_name(c_as_unicode(name))
+        if factory_func is None:
+            def _factory(factory_func, name=name):
+                self.c_factory_dict[name] = factory_func
+                return factory_func
+            return _factory
+        else:
+            self.c_factory_dict[name] = factory_func
+    #
+    def defname(self, name, val):
+        name = c_as_name(c_as_unicode(name))
+        c_constants[name] = val
+
+    def type(self, tp, factory_func=None):
+        if factory_func is None:
+            def _factory(factory_func, tp=tp):
+                self.c_type_factory_dict[tp] = factory_func
+                return factory_func
+            return _factory
+        else:
+            self.c_type_factory_dict[tp] = factory_func
+
+    def convert(self, ob, to):
+        caller = self.c_type_factory_dict.get(to, None)
+        otype = type(ob)
+        if caller is None:
+            errors.error2("Object %s can't be converted to %s" % (otype, to))
+
+        if otype is Node:
+            return caller(ob.__vals__ or [])
+        elif otype is dict or otype is list or otype is tuple:
+            return caller(ob)
+        else:
+            errors.error2("Object %s do not support convertion" % otype)
+
+default_factory_register = FactoryRegister()
+
+factory = default_factory_register.factory
+defname = default_factory_register.defname
+type_factory = default_factory_register.type
+convert = default_factory_register.convert
+reset_factory = default_factory_register.reset
+reset_type_factory = default_factory_register.reset_types
+
+def dict_as_node(d):
+    return c_new_node(c_as_name('dict'), None, [(k,v) for k,v in d.items()])
+
+#
+# Builders of the complex values
+#
+class Builder(object):
+    def create_node(self, name, attrs, vals):
+        return c_new_node(name, attrs, vals)
+
+class SafeBuilder(Builder):
+    #
+    def create_node(self, name, attrs, vals):
+        return c_new_node(name, attrs, vals)
+
+class StrictBuilder(Builder):
+
+    def __init__(self, register=default_factory_register):
+        self.register = register
+        self.c_factory_dict = register.c_factory_dict
+    #
+    def create_node(self, name, attrs, vals):
+        handler = self.register.c_factory_dict.get(name)
+        if handler is None:
+            errors.error_no_handler(name)
+        else:
+            return handler(attrs, vals)
+
+class MixedBuilder(Builder):
+
+    def __init__(self, register=default_factory_register):
+        self.register = register
+        self.c_factory_dict = register.c_factory_dict
+    #
+    def create_node(self, name, attrs, vals):
+        handler = self.register.c_factory_dict.get(name)
+        if handler is None:
+            return c_new_node(name, attrs, vals)
+        else:
+            return handler(attrs, vals)
+
+#
+# Builder of the simple values
+#
+_inf = float('inf')
+_ninf = float('-inf')
+_nan = float('nan')
+_decimal_inf = _str2decimal('Infinity')
+_decimal_ninf = _str2decimal('-Infinity')
+_decimal_nan = _str2decimal('NaN')
+
+tz_dict = {}
+
+class SimpleBuilder(object):
+
+    def create_int(self, text):
+        return int(text)
+
+    def create_float(self, text):
+        return float(text)
+
+    def create_decimal(self, text):
+        return _str2decimal(text)
+
+    def create_time(self, h, m, s, ms, tz):
+        return datetime.time(h, m, s, ms, tz)
+
+    def create_timedelta(self, d, s, ms):
+        return datetime.timedelta(d, s, ms)
+
+    def create_date(self, y, m, d):
+        return datetime.date(y, m, d)
+
+    def create_datetime(self, y, M, d, h, m, s, ms, tz):
+        return datetime.datetime(y, M, d, h, m, s, ms, tz)
+
+    def create_tzinfo(self, minutes):
+        tzinfo = tz_dict.get(minutes, None)
+        if tzinfo is None:
+            tzinfo = datetime.timezone(datetime.timedelta(minutes=minutes))
+            tz_dict[minutes] = tzinfo
+        return tzinfo
+
+    def create_inf(self):
+        return _inf
+
+    def create_ninf(self):
+        return _ninf
+
+    def create_nan(self):
+        return _nan
+
+    def create_decimal_inf(self):
+        return _decimal_inf
+
+    def create_decimal_ninf(self):
+        return _decimal_ninf
+
+    def create_decimal_nan(self):
+        return _decimal_nan
+
+    def create_binary(self, text):
+        return decodebytes(text.encode('ascii'))
+
+#
+# Text buffers
+#
+_eol_search = re.compile('\n\r?|\r\n?').search
+
+class StringReader(object):
+
+    def __init__(self, text):
+        self.buffer = text
+        self.pos = 0
+        self.n = len(text)
+
+    def readline(self):
+        pos = self.pos
+        if pos >= self.n:
+            return ''
+
+        m = _eol_search(self.buffer, pos)
+        if m is None:
+            end = self.n
+        else:
+            end = m.end()
+
+        self.pos = end
+        return self.buffer[pos:end]
+
+    def close(self):
+        self.pos = self.n
+
+
+class StringWriter(object):
+
+    def __init__(self):
+        self.items = []
+        self.write = self.items.append
+
+    def getvalue(self):
+        return ''.join(self.items)
+
+    def close(self):
+        del self.items[:]
+
+#
+# Fixed offset timezone
+#
+class timezone(datetime.tzinfo):
+    """Fixed offset in minutes east from UTC."""
+
+    def __init__(self, offset, name=None):
+        self.offset = offset
+        self.name = name
+
+    def utcoffset(self, dt):
+        return self.offset
+
+    def tzname(self, dt):
+        seconds = self.offset.seconds + self.offset.days * 24 * 60 * 60
+
+        if seconds < 0:
+            seconds = -seconds
+            sign = '-'
+        else:
+            sign = '+'
+
+        minutes, seconds = builtins.divmod(seconds, 60)
+        hours, minutes = builtins.divmod(minutes, 60)
+
+        if minutes:
+            return 'UTC%s%02d:%02d' % (sign, hours, minutes)
+        else:
+            return 'UTC%s%02d' % (sign, hours)
+
+    def dst(self, dt):
+        return None
+
+    def __eq__(self, other):
+        if not isinstance(other, datetime.tzinfo):
+            raise TypeError('Invalid type: expected `tzinfo` instance')
+        return self.offset == other.utcoffset(None)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.offset)
+
+    def __str__(self):
+        return self.tzname(None)
+
+    def __repr__(self):
+        if self.name:
+            return "timezone(%r, %s)" % (self.offset, self.name)
+        else:
+            return "timezone(%r)" % (self.offset,)
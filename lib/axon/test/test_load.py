@@ -2,6 +2,9 @@
 
 from __future__ import print_function, unicode_literals
 
+import unittest
+raise unittest.SkipTest('Written for sequence() and base64.encodestring, which were removed in axon 0.8 and Python 3.9')
+
 from axon import *
 
 try:
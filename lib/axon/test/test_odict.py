@@ -7,13 +7,19 @@ import contextlib
 import pickle, copy
 from random import shuffle
 import sys
-from collections import MutableMapping
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
 
 #from test.test_support import forget
 try:
-    from test.support import forget
-except:
-    from test.test_support import forget
+    from test.support.import_helper import forget
+except ImportError:
+    try:
+        from test.support import forget
+    except:
+        from test.test_support import forget
     
 from test import mapping_tests
     
@@ -6,6 +6,7 @@ from axon import *
 
 pretty = False
 
+@unittest.skip('Empty and attributes inside the braces of a node were removed in axon 0.8')
 class SafeLoadsTestCase(unittest.TestCase):
 
     def setUp(self):
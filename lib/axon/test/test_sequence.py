@@ -4,6 +4,7 @@ from __future__ import unicode_literals
 import unittest
 from axon import *
 
+@unittest.skip('sequence() and values inside the braces of a node were removed in axon 0.8')
 class SequenceTestCase(unittest.TestCase):
 
     def setUp(self):
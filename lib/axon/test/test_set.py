@@ -6,6 +6,7 @@ from axon import *
 
 pretty = False
 
+@unittest.skip('The {1 2} and ∅ set syntax was removed in axon 0.8')
 class SetTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -3,6 +3,8 @@
 from __future__ import unicode_literals
 import unittest
 
+raise unittest.SkipTest('Python 2 suite of modules removed in axon 0.8, see axon.test')
+
 import test_int
 import test_float
 import test_decimal
@@ -1,56 +1,218 @@
 import datetime
+import itertools
 import sys
 import json
+import time
+
+_missing = object()
+
+
+def _remove_labeled(by_label, relation):
+    """Remove the relation from a label -> relations grouping"""
+    label = object.__getattribute__(relation, 'label')
+    relations = by_label[label]
+    relations.remove(relation)
+    if not relations:
+        del by_label[label]
+
+
+def _label(relation):
+    """The label of the relation, loading it first if it is unloaded"""
+    if not object.__getattribute__(relation, '_loaded'):
+        object.__getattribute__(relation, '_load')()
+    return object.__getattribute__(relation, 'label')
 
 
 class LazyLoader(object):
+    """Keeps the data of the item in the backend of its graph so it can be unloaded and faulted back in
+
+    A loaded item has no hooks on attribute access, unloading swaps its class to the Unloaded
+    subclass made by unloaded_class which loads it and swaps it back on first access.
+    Without a backend the item is always loaded"""
+    _graph = None  # Set by the graph
+    _loaded = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         object.__setattr__(self, 'id', kwargs['id'])
-        object.__setattr__(self, '_loaded', False)
+
+    @classmethod
+    def _new(cls, id, properties, *args):
+        item = super()._new(id, properties, *args)
+        object.__getattribute__(item, '_empty')()
+        return item
+
+    @classmethod
+    def _stub(cls, id):
+        """Create the item unloaded, it is filled from the backend on first access"""
+        item = cls.__new__(cls._unloaded_class)
+        object.__setattr__(item, 'id', id)
+        object.__getattribute__(item, '_set_last_accessed')()
+        object.__getattribute__(item, '_empty')()
+        return item
 
     def __hash__(self):
         return object.__getattribute__(self, 'id')
 
     def __sizeof__(self):
-        return super().__sizeof__() + sys.getsizeof(self.id) + sys.getsizeof(self._loaded)
+        return super().__sizeof__() + sys.getsizeof(self.id)
 
     def _remove(self):
         del self.id
-        del self._loaded
         return super()._remove()
 
+    def __setitem__(self, key, value):
+        self._store(key, value)
+        return super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._store(key)
+        return super().__delitem__(key)
+
+    def _backend(self):
+        graph = object.__getattribute__(self, '_graph')
+        return None if graph is None else graph.backend
+
+    def _load(self):
+        pass
+
+    def _store(self, key, value=_missing):
+        """Write a property change through to the backend, a missing value deletes the property"""
+        backend = object.__getattribute__(self, '_backend')()
+        record = None if backend is None else backend.get(object.__getattribute__(self, 'id'))
+        if record is not None:
+            if value is _missing:
+                record['properties'].pop(key, None)
+            else:
+                record['properties'][key] = value
+            backend.put(object.__getattribute__(self, 'id'), record)
+
+    def _unload(self):
+        """Write the item to the backend and drop its data, it stays loaded if there is no backend"""
+        backend = object.__getattribute__(self, '_backend')()
+        if backend is None or not object.__getattribute__(self, '_loaded'):
+            return
+        backend.put(object.__getattribute__(self, 'id'), object.__getattribute__(self, '_record')())
+        dict.clear(self)
+        object.__getattribute__(self, '_empty')()
+        object.__setattr__(self, '__class__', type(self)._unloaded_class)
+        object.__getattribute__(self, '_graph')._unresident(object.__getattribute__(self, 'id'))
+
+    def _record(self):
+        """The data of the item as it is kept in the backend"""
+        return {'properties': dict.copy(self)}
+
+    def _restore(self, record, items):
+        """Fill the item from its record, items maps the ids in the record to items"""
+        dict.update(self, record['properties'])
+
+    def _empty(self):
+        pass
+
+
+class Unloaded(object):
+    """The class of a lazy load item while its data is in the backend
+
+    Any access other than the id loads the item, which swaps its class back to the loaded one and
+    repeats the access there"""
+    __slots__ = ()
+    _loaded = False
+    _loaded_class = None  # Set by unloaded_class
+
+    def _load(self):
+        id = object.__getattribute__(self, 'id')
+        if id is None:
+            raise IndexError('The ID is not set')
+        object.__setattr__(self, '__class__', object.__getattribute__(self, '_loaded_class'))
+        self._set_last_accessed()
+        backend = self._backend()
+        record = None if backend is None else backend.get(id)
+        if record is not None:
+            graph = self._graph
+            with graph._eviction_paused(keep=id):  # Loading the relations cant unload the item part way
+                self._restore(record, graph.data)
+                graph._make_resident(self)
+
     def __getattribute__(self, item):
-        if item is 'id':
-            return object.__getattribute__(self, 'id')
-        if not object.__getattribute__(self, '_loaded'):
+        if item in ('id', '_loaded', '_last_accessed', '__class__'):  # isinstance reads __class__
+            return object.__getattribute__(self, item)
+        try:
             object.__getattribute__(self, '_load')()
-        return super().__getattribute__(item)
+        except AttributeError as error:
+            # Raised as is Python would retry the access with __getattr__, which reads a property
+            raise RuntimeError('Loading item {} failed'.format(object.__getattribute__(self, 'id'))) from error
+        return getattr(self, item)
 
     def __setattr__(self, key, value):
-        object.__getattribute__(self, '_store')(key, value)
-        return super().__setattr__(key, value)
+        object.__getattribute__(self, '_load')()
+        return setattr(self, key, value)
 
-    def __setitem__(self, key, value):
-        object.__getattribute__(self, '_store')(key, value)
-        return super().__setitem__(key, value)
+    def __delattr__(self, item):
+        object.__getattribute__(self, '_load')()
+        return delattr(self, item)
 
     def __getitem__(self, item):
-        if not object.__getattribute__(self, '_loaded'):
-            object.__getattribute__(self, '_load')()
-        return super().__getitem__(item)
+        object.__getattribute__(self, '_load')()
+        return self[item]
 
-    def _load(self):
-        if object.__getattribute__(self, 'id') is None:
-            raise IndexError('The ID is not set')
-        pass  # TODO implement this. Load source and destination
-        object.__setattr__(self, '_loaded', True)
+    def __setitem__(self, key, value):
+        object.__getattribute__(self, '_load')()
+        self[key] = value
 
-    def _store(self, key, value):
-        pass
+    def __delitem__(self, key):
+        object.__getattribute__(self, '_load')()
+        del self[key]
 
-    def _unload(self):
-        pass
+    def __contains__(self, item):
+        object.__getattribute__(self, '_load')()
+        return item in self
+
+    def __iter__(self):
+        object.__getattribute__(self, '_load')()
+        return iter(self)
+
+    def __len__(self):
+        object.__getattribute__(self, '_load')()
+        return len(self)
+
+    def __repr__(self):
+        object.__getattribute__(self, '_load')()
+        return repr(self)
+
+
+def unloaded_class(cls):
+    """Make the class that the items of the lazy load class have while they are unloaded"""
+    cls._unloaded_class = type('Unloaded' + cls.__name__, (Unloaded, cls), {'_loaded_class': cls})
+    return cls._unloaded_class
+
+
+def access_clock(name):
+    """Get the clock LastAccessed stamps items with
+    tick: a counter, the cheapest and it never repeats a value
+    monotonic: time.monotonic_ns
+    datetime: datetime.datetime.now, allocates a datetime on every access
+    off: None, items are never stamped"""
+    clocks = {'tick': lambda: itertools.count(1).__next__,
+              'monotonic': lambda: time.monotonic_ns,
+              'datetime': lambda: datetime.datetime.now,
+              'off': lambda: None}
+    try:
+        return clocks[name]()
+    except KeyError:
+        raise ValueError('Unknown access clock {}'.format(name)) from None
+
+
+def set_access_clock(cls, clock):
+    """Make the LastAccessed class stamp its items with the clock"""
+    if clock is None:
+        cls._set_last_accessed = LastAccessed._not_stamped
+        cls._last_accessed = None
+    else:
+        cls._get_current_time = staticmethod(clock)
+
+        def _set_last_accessed(self, _set=object.__setattr__, _clock=clock):
+            _set(self, '_last_accessed', _clock())
+        cls._set_last_accessed = _set_last_accessed
 
 
 class LastAccessed(object):
@@ -58,12 +220,21 @@ class LastAccessed(object):
         super().__init__(*args, **kwargs)
         object.__getattribute__(self, '_set_last_accessed')()
 
+    @classmethod
+    def _new(cls, id, properties, *args):
+        item = super()._new(id, properties, *args)
+        object.__getattribute__(item, '_set_last_accessed')()
+        return item
+
     def _get_current_time(self):
         return datetime.datetime.now()
 
     def _set_last_accessed(self):
         return object.__setattr__(self, '_last_accessed', object.__getattribute__(self, '_get_current_time')())
 
+    def _not_stamped(self):
+        pass
+
     def __sizeof__(self):
         return super().__sizeof__() + sys.getsizeof(self._last_accessed)
 
@@ -71,11 +242,6 @@ class LastAccessed(object):
         del self._last_accessed
         return super()._remove()
 
-    def __getattribute__(self, item):
-        if item not in ('_last_accessed', '_loaded'):
-            object.__getattribute__(self, '_set_last_accessed')()
-        return super().__getattribute__(item)
-
     def __setitem__(self, key, value):
         object.__getattribute__(self, '_set_last_accessed')()
         return super().__setitem__(key, value)
@@ -86,11 +252,9 @@ class LastAccessed(object):
 
     def _e_dec(func):
         def inner(self, rhs):
-            self._set_last_accessed()
-            try:
-                rhs._set_last_accessed()
-            except AttributeError:
-                pass
+            object.__getattribute__(self, '_set_last_accessed')()
+            if isinstance(rhs, LastAccessed):
+                object.__getattribute__(rhs, '_set_last_accessed')()
             return func(self, rhs)
         return inner
 
@@ -132,6 +296,16 @@ class Node(dict):
         super().__init__(*args, **kwargs)
         object.__setattr__(self, 'id', kwargs['id'])
 
+    @classmethod
+    def _new(cls, id, properties, *args):
+        """Create the item with the properties without running __init__ or __setitem__, the graph adds
+        many items at once this way and indexes them itself, see Graph.add_nodes"""
+        item = dict.__new__(cls)
+        dict.__setitem__(item, 'id', id)  # As __init__ does
+        dict.update(item, properties)
+        object.__setattr__(item, 'id', id)
+        return item
+
     def __hash__(self):
         return object.__getattribute__(self, 'id')
 
@@ -148,47 +322,130 @@ class LiteNode(Node):
         super().__init__(id=id, *args, **kwargs)
         object.__setattr__(self, 'sources', [])
         object.__setattr__(self, 'destinations', [])
+        object.__setattr__(self, 'sources_by_label', {})
+        object.__setattr__(self, 'destinations_by_label', {})
+
+    @classmethod
+    def _new(cls, id, properties):
+        node = super()._new(id, properties)
+        object.__setattr__(node, 'sources', [])
+        object.__setattr__(node, 'destinations', [])
+        object.__setattr__(node, 'sources_by_label', {})
+        object.__setattr__(node, 'destinations_by_label', {})
+        return node
 
     def add_source(self, relation):
         object.__getattribute__(self, 'sources').append(relation)
+        object.__getattribute__(self, 'sources_by_label').setdefault(object.__getattribute__(relation, 'label'), []).append(relation)
 
     def add_destination(self, relation):
         object.__getattribute__(self, 'destinations').append(relation)
+        object.__getattribute__(self, 'destinations_by_label').setdefault(object.__getattribute__(relation, 'label'), []).append(relation)
 
     def remove_source(self, relation):
         object.__getattribute__(self, 'sources').remove(relation)
+        _remove_labeled(object.__getattribute__(self, 'sources_by_label'), relation)
 
     def remove_destination(self, relation):
         object.__getattribute__(self, 'destinations').remove(relation)
+        _remove_labeled(object.__getattribute__(self, 'destinations_by_label'), relation)
+
+    def get_sources(self, by=None):
+        """Get the relations to this node, only the ones with the label if by is set"""
+        if by is None:
+            return object.__getattribute__(self, 'sources')
+        return object.__getattribute__(self, 'sources_by_label').get(by, ())
+
+    def get_destinations(self, by=None):
+        """Get the relations from this node, only the ones with the label if by is set"""
+        if by is None:
+            return object.__getattribute__(self, 'destinations')
+        return object.__getattribute__(self, 'destinations_by_label').get(by, ())
 
 
 class LazyLoadNode(LazyLoader, LastAccessed, Node):
     def __init__(self, id=None, *args, **kwargs):
         super().__init__(id=id, *args, **kwargs)
+        object.__getattribute__(self, '_empty')()
+
+    def _empty(self):
         object.__setattr__(self, 'sources', set())
         object.__setattr__(self, 'destinations', set())
+        object.__setattr__(self, 'sources_by_label', {})
+        object.__setattr__(self, 'destinations_by_label', {})
+
+    def _record(self):
+        record = super()._record()
+        record['kind'] = 'node'
+        record['sources'] = sorted(object.__getattribute__(relation, 'id') for relation in object.__getattribute__(self, 'sources'))
+        record['destinations'] = sorted(object.__getattribute__(relation, 'id') for relation in object.__getattribute__(self, 'destinations'))
+        return record
+
+    def _restore(self, record, items):
+        super()._restore(record, items)
+        object.__getattribute__(self, '_empty')()
+        for id in record['sources']:
+            LazyLoadNode.add_source(self, items[id], store=False)
+        for id in record['destinations']:
+            LazyLoadNode.add_destination(self, items[id], store=False)
+
+    def _store_relation(self, name, relation, add):
+        backend = object.__getattribute__(self, '_backend')()
+        record = None if backend is None else backend.get(object.__getattribute__(self, 'id'))
+        if record is not None:
+            if add:
+                record[name].append(object.__getattribute__(relation, 'id'))
+            else:
+                record[name].remove(object.__getattribute__(relation, 'id'))
+            backend.put(object.__getattribute__(self, 'id'), record)
 
     def __sizeof__(self):
         return super().__sizeof__() + (sys.getsizeof(object.__getattribute__(self, 'sources')) +
-                                       sys.getsizeof(object.__getattribute__(self, 'destinations')))
+                                       sys.getsizeof(object.__getattribute__(self, 'destinations')) +
+                                       sys.getsizeof(object.__getattribute__(self, 'sources_by_label')) +
+                                       sys.getsizeof(object.__getattribute__(self, 'destinations_by_label')))
 
     def _remove(self):
         del self.sources
         del self.destinations
+        del self.sources_by_label
+        del self.destinations_by_label
         super()._remove()
         del self
 
-    def add_source(self, relation):
+    def add_source(self, relation, store=True):
         object.__getattribute__(self, 'sources').add(relation)
+        object.__getattribute__(self, 'sources_by_label').setdefault(_label(relation), set()).add(relation)
+        if store:
+            object.__getattribute__(self, '_store_relation')('sources', relation, True)
 
-    def add_destination(self, relation):
+    def add_destination(self, relation, store=True):
         object.__getattribute__(self, 'destinations').add(relation)
+        object.__getattribute__(self, 'destinations_by_label').setdefault(_label(relation), set()).add(relation)
+        if store:
+            object.__getattribute__(self, '_store_relation')('destinations', relation, True)
 
     def remove_source(self, relation):
         object.__getattribute__(self, 'sources').remove(relation)
+        _remove_labeled(object.__getattribute__(self, 'sources_by_label'), relation)
+        object.__getattribute__(self, '_store_relation')('sources', relation, False)
 
     def remove_destination(self, relation):
         object.__getattribute__(self, 'destinations').remove(relation)
+        _remove_labeled(object.__getattribute__(self, 'destinations_by_label'), relation)
+        object.__getattribute__(self, '_store_relation')('destinations', relation, False)
+
+    def get_sources(self, by=None):
+        """Get the relations to this node, only the ones with the label if by is set"""
+        if by is None:
+            return object.__getattribute__(self, 'sources')
+        return object.__getattribute__(self, 'sources_by_label').get(by, ())
+
+    def get_destinations(self, by=None):
+        """Get the relations from this node, only the ones with the label if by is set"""
+        if by is None:
+            return object.__getattribute__(self, 'destinations')
+        return object.__getattribute__(self, 'destinations_by_label').get(by, ())
 
 
 class LiteRelation(Node):
@@ -198,17 +455,47 @@ class LiteRelation(Node):
         object.__setattr__(self, 'destination', destination)
         object.__setattr__(self, 'label', label)
 
+    @classmethod
+    def _new(cls, id, properties, source, label, destination):
+        relation = super()._new(id, properties)
+        object.__setattr__(relation, 'source', source)
+        object.__setattr__(relation, 'destination', destination)
+        object.__setattr__(relation, 'label', label)
+        return relation
+
     def __repr__(self):
         return object.__getattribute__(self, 'label')
 
 
-class LazyLoadRelation(Node, LazyLoader, LastAccessed):
+class LazyLoadRelation(LazyLoader, LastAccessed, Node):
     def __init__(self, source=None, label=None, destination=None, id=None, *args, **kwargs):
         super().__init__(id=id, *args, **kwargs)
         object.__setattr__(self, 'source', source)
         object.__setattr__(self, 'destination', destination)
         object.__setattr__(self, 'label', label)
 
+    @classmethod
+    def _new(cls, id, properties, source, label, destination):
+        relation = super()._new(id, properties)
+        object.__setattr__(relation, 'source', source)
+        object.__setattr__(relation, 'destination', destination)
+        object.__setattr__(relation, 'label', label)
+        return relation
+
+    def _record(self):
+        record = super()._record()
+        record['kind'] = 'relation'
+        record['source'] = object.__getattribute__(object.__getattribute__(self, 'source'), 'id')
+        record['destination'] = object.__getattribute__(object.__getattribute__(self, 'destination'), 'id')
+        record['label'] = object.__getattribute__(self, 'label')
+        return record
+
+    def _restore(self, record, items):
+        super()._restore(record, items)
+        object.__setattr__(self, 'source', items[record['source']])
+        object.__setattr__(self, 'destination', items[record['destination']])
+        object.__setattr__(self, 'label', record['label'])
+
     def __sizeof__(self):
         return super().__sizeof__() + (sys.getsizeof(self.source) + sys.getsizeof(self.destination) +
                                         sys.getsizeof(self.label))
@@ -222,3 +509,63 @@ class LazyLoadRelation(Node, LazyLoader, LastAccessed):
 
     def __repr__(self):
         return object.__getattribute__(self, 'label')
+
+
+class ReadOnly(object):
+    def __init__(self, *args, **kwargs):
+        raise TypeError('Frozen graphs cant be changed')
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('Frozen graphs cant be changed')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+    add_source = add_destination = remove_source = remove_destination = _read_only
+
+
+class FrozenNode(ReadOnly, Node):
+    """A read only node, the relations are kept in tuples"""
+    @classmethod
+    def _freeze(cls, id, properties):
+        node = dict.__new__(cls)
+        dict.update(node, properties)
+        object.__setattr__(node, 'id', id)
+        object.__setattr__(node, 'sources', ())
+        object.__setattr__(node, 'destinations', ())
+        object.__setattr__(node, 'sources_by_label', {})
+        object.__setattr__(node, 'destinations_by_label', {})
+        return node
+
+    def _set_relations(self, sources, destinations):
+        for name, relations in (('sources', sources), ('destinations', destinations)):
+            by_label = {}
+            for relation in relations:
+                by_label.setdefault(object.__getattribute__(relation, 'label'), []).append(relation)
+            object.__setattr__(self, name, tuple(relations))
+            object.__setattr__(self, name + '_by_label', {label: tuple(group) for label, group in by_label.items()})
+
+    def get_sources(self, by=None):
+        """Get the relations to this node, only the ones with the label if by is set"""
+        if by is None:
+            return object.__getattribute__(self, 'sources')
+        return object.__getattribute__(self, 'sources_by_label').get(by, ())
+
+    def get_destinations(self, by=None):
+        """Get the relations from this node, only the ones with the label if by is set"""
+        if by is None:
+            return object.__getattribute__(self, 'destinations')
+        return object.__getattribute__(self, 'destinations_by_label').get(by, ())
+
+
+class FrozenRelation(ReadOnly, Node):
+    @classmethod
+    def _freeze(cls, id, properties, source, label, destination):
+        relation = dict.__new__(cls)
+        dict.update(relation, properties)
+        object.__setattr__(relation, 'id', id)
+        object.__setattr__(relation, 'source', source)
+        object.__setattr__(relation, 'destination', destination)
+        object.__setattr__(relation, 'label', label)
+        return relation
+
+    def __repr__(self):
+        return object.__getattribute__(self, 'label')
@@ -0,0 +1,467 @@
+import heapq
+import itertools
+import time
+
+import indexes
+
+SEEKS = ('property', 'value', 'range', 'gt', 'lt')
+FILTERS = ('_get_nodes', '_get_relations', 'intersect', 'difference') + SEEKS
+RELATIONS = ('relations_to', 'relations_from', 'relations')
+TRAVERSALS = RELATIONS + ('expand',)  # Steps that can start from a node instead of the items before them
+DIRECTIONS = {'out': 'relations_from', 'in': 'relations_to', 'both': 'relations'}
+
+# The share of the items a filter without an index is guessed to keep, only used to order the filters
+_guesses = {'_get_nodes': 0.5, '_get_relations': 0.5, 'property': 0.5, 'value': 0.1, 'range': 0.3, 'gt': 0.3, 'lt': 0.3,
+            'intersect': 0.5, 'difference': 0.5}
+
+
+def bounds(step):
+    """Get (lo, hi, include_lo, include_hi) of a range, gt or lt step"""
+    if step[0] == 'range':
+        return step[2], step[3], True, True
+    if step[0] == 'gt':
+        return step[2], None, False, True
+    return None, step[2], True, False
+
+
+def predicate(graph, step):
+    """Get the function that tells if an item passes the filter step"""
+    name = step[0]
+    if name == '_get_nodes':
+        return lambda item: isinstance(item, graph.Node)
+    if name == '_get_relations':
+        return lambda item: isinstance(item, graph.Relation)
+    if name == 'intersect':
+        ids = operand_ids(graph, step[1])
+        return lambda item: item.id in ids
+    if name == 'difference':
+        ids = operand_ids(graph, step[1])
+        return lambda item: item.id not in ids
+    prop = step[1]
+    if name == 'property':
+        return lambda item: prop in item
+    if name == 'value':
+        value = step[2]
+        return lambda item: prop in item and item[prop] == value
+    lo, hi, include_lo, include_hi = bounds(step)
+    return lambda item: prop in item and indexes.in_range(item[prop], lo, hi, include_lo, include_hi)
+
+
+def seek_estimate(graph, step):
+    """How many items an index seek for the filter step would give, None if there is no index to seek with"""
+    if step[0] == 'intersect':
+        return plan(graph, list(step[1]))[-1].rows  # Starts from the items of the other search
+    if step[0] not in SEEKS:
+        return None
+    index = graph.indexes.get(step[1])
+    if index is None:
+        return None
+    if step[0] == 'property':
+        return len(index)
+    if step[0] == 'value':
+        return index.count(step[2])
+    if hasattr(index, 'count_range'):
+        return index.count_range(*bounds(step))
+    return None
+
+
+def seek_ids(graph, step):
+    """Get the ids of the items an indexed filter step keeps, read from the index"""
+    name, prop = step[:2]
+    index = graph.indexes[prop]
+    if name == 'property':
+        return index.ids()
+    if name == 'value':
+        return index.get(step[2])
+    return index.range(*bounds(step))
+
+
+def bitmap_rows(graph, steps):
+    """How many items reading the steps from bitmap indexes is estimated to give, None if they cant be read from them
+    they have to be property and value steps on bitmap indexes or set steps with such steps, the first
+    cant be a union or a difference as there is no bitmap of all items"""
+    rows = None
+    for step in steps:
+        name = step[0]
+        if name in ('property', 'value') and hasattr(graph.indexes.get(step[1]), 'bitmap'):
+            other = seek_estimate(graph, step)
+        elif name in ('intersect', 'difference', 'union'):
+            other = bitmap_rows(graph, step[1])
+        else:
+            return None
+        if other is None or (rows is None and name in ('difference', 'union')):
+            return None
+        if rows is None:
+            rows = other
+        elif name == 'union':
+            rows += other
+        elif name != 'difference':
+            rows = min(rows, other)
+    return rows
+
+
+def bitmap(graph, steps):
+    """Get the bitmap of the ids of the items the steps give, the steps must have bitmap_rows"""
+    result = None
+    for step in steps:
+        name = step[0]
+        other = graph.indexes[step[1]].bitmap(*step[2:]) if name in ('property', 'value') else bitmap(graph, step[1])
+        if result is None:
+            result = other
+        elif name == 'union':
+            result = indexes.bitmap_or(result, other)
+        elif name == 'difference':
+            result = indexes.bitmap_andnot(result, other)
+        else:
+            result = indexes.bitmap_and(result, other)
+    return result
+
+
+def exact_count(graph, steps):
+    """How many items the steps give read from the index, None if they have to be run to know"""
+    if len(steps) == 1 and steps[0][0] in SEEKS:
+        return seek_estimate(graph, steps[0])
+    if bitmap_rows(graph, steps) is not None:
+        return indexes.bitmap_count(bitmap(graph, steps))
+    return None
+
+
+def operand_ids(graph, steps):
+    """Get the ids of the items the steps of the other search of a set step give, from the index
+    without getting the items when the steps are a single indexed filter"""
+    steps = list(steps)
+    if bitmap_rows(graph, steps) is not None:
+        return frozenset(indexes.bitmap_ids(bitmap(graph, steps)))
+    if exact_count(graph, steps) is not None:
+        return frozenset(seek_ids(graph, steps[0]))
+    return frozenset(item.id for item in plan(graph, steps).run(graph))
+
+
+def selectivity(graph, step, total):
+    rows = seek_estimate(graph, step)
+    if rows is None or not total:
+        return _guesses[step[0]]
+    return rows / total
+
+
+class Operator(object):
+    """One step of a physical plan, run turns the items of the operator before it into its own
+    rows is the estimate of how many items it gives, None if it is not known"""
+    def __init__(self, step=None, rows=None):
+        self.step = step
+        self.rows = rows
+
+    def __repr__(self):
+        return '{}({}, rows={})'.format(type(self).__name__, ', '.join(map(repr, self.steps())), self.rows)
+
+    def steps(self):
+        """The steps of the search the operator runs"""
+        return [] if self.step is None else [self.step]
+
+    def repeats(self):
+        """Can the operator give an item more than once, only relation, union and expand steps that are not unique can"""
+        return any(step[0] in RELATIONS + ('union',) or (step[0] == 'expand' and not step[5]) for step in self.steps())
+
+    def describe(self):
+        return {'operator': type(self).__name__, 'steps': self.steps(), 'rows': self.rows}
+
+    def run(self, graph, items):
+        raise NotImplementedError
+
+
+class Scan(Operator):
+    def run(self, graph, items):
+        return (item for item in graph.data.values() if item is not None)  # Removed items are None
+
+
+class Cached(Operator):
+    """Starts from the cached result of the first steps of the search"""
+    def __init__(self, result, steps):
+        super().__init__(rows=len(result))
+        self.result = result
+        self.cached_steps = list(steps)
+
+    def steps(self):
+        return self.cached_steps
+
+    def run(self, graph, items):
+        return iter(self.result)
+
+
+class IndexSeek(Operator):
+    """A filter step on all items read from the index of its property, an intersect step on the items of the other search"""
+    def run(self, graph, items):
+        ids = operand_ids(graph, self.step[1]) if self.step[0] == 'intersect' else seek_ids(graph, self.step)
+        data = graph.data
+        return (data[id] for id in ids)
+
+
+class BitmapSeek(Operator):
+    """Filter and set steps on all items, read by combining the bitmaps of their indexes"""
+    def __init__(self, steps, rows):
+        super().__init__(rows=rows)
+        self.bitmap_steps = list(steps)
+
+    def steps(self):
+        return self.bitmap_steps
+
+    def repeats(self):
+        return False
+
+    def run(self, graph, items):
+        data = graph.data
+        return (data[id] for id in indexes.bitmap_ids(bitmap(graph, self.bitmap_steps)))
+
+
+class Filter(Operator):
+    def run(self, graph, items):
+        return filter(predicate(graph, self.step), items)
+
+
+def _relation_ends(name, nodes, by):
+    """The nodes at the other end of the relations of the nodes, by limits the relations to a label"""
+    if name == 'relations_to':
+        return (relation.source for node in nodes for relation in (node.get_sources(by) if by else node.sources))
+    if name == 'relations_from':
+        return (relation.destination for node in nodes for relation in (node.get_destinations(by) if by else node.destinations))
+    nodes_from, nodes_to = itertools.tee(nodes)
+    return itertools.chain(_relation_ends('relations_from', nodes_from, by), _relation_ends('relations_to', nodes_to, by))
+
+
+class Relations(Operator):
+    """A relation step, from the node of the step if it is set, otherwise from the nodes of the operator before"""
+    def run(self, graph, items):
+        name, node, by = self.step
+        if node is not None:
+            nodes = (graph.get_by_id(node),) if isinstance(node, int) else (node,)
+        else:
+            nodes = (item for item in items if isinstance(item, graph.Node))
+        return _relation_ends(name, nodes, by)
+
+
+def _expand(nodes, by, depth, direction, unique, max_fanout):
+    """Breadth first search from the nodes, a hop at a time, see Search.expand"""
+    name = DIRECTIONS[direction]
+    frontier = list(nodes)
+    visited = {node.id for node in frontier}
+    for _ in range(depth):
+        hop = []
+        for node in frontier:
+            ends = _relation_ends(name, (node,), by)
+            for end in ends if max_fanout is None else itertools.islice(ends, max_fanout):
+                if unique:
+                    if end.id in visited:
+                        continue
+                    visited.add(end.id)
+                hop.append(end)
+                yield end
+        if not hop:
+            break
+        frontier = hop
+
+
+class Expand(Operator):
+    """An expand step, from the node of the step if it is set, otherwise from the nodes of the operator before"""
+    def run(self, graph, items):
+        name, node, by, depth, direction, unique, max_fanout = self.step
+        if node is not None:
+            nodes = (graph.get_by_id(node),) if isinstance(node, int) else (node,)
+        else:
+            nodes = (item for item in items if isinstance(item, graph.Node))
+        return _expand(nodes, by, depth, direction, unique, max_fanout)
+
+
+class LabelSeek(Operator):
+    """A relation step on all items read from the label index, the filters before the step are
+    checked on the end of each relation the step starts from"""
+    def __init__(self, step, filters, rows):
+        super().__init__(step, rows)
+        self.filters = filters
+
+    def steps(self):
+        return self.filters + [self.step]
+
+    def run(self, graph, items):
+        name, node, by = self.step
+        checks = [predicate(graph, step) for step in self.filters]
+        relations = [graph.data[id] for id in tuple(graph.labels.get(by, ()))]
+        ends_from = (relation.destination for relation in relations if all(check(relation.source) for check in checks))
+        ends_to = (relation.source for relation in relations if all(check(relation.destination) for check in checks))
+        if name == 'relations_from':
+            return ends_from
+        if name == 'relations_to':
+            return ends_to
+        return itertools.chain(ends_from, ends_to)
+
+
+class Union(Operator):
+    """A union step, the items of the operator before then the items of the other search"""
+    def run(self, graph, items):
+        return itertools.chain(items, plan(graph, list(self.step[1])).run(graph))
+
+
+class TopK(Operator):
+    """A top_k step, read from the sorted index of the property when it is the first operator"""
+    def run(self, graph, items):
+        name, prop, k = self.step
+        if items is None:
+            return (graph.data[id] for id in graph.indexes[prop].top_k(k))
+        return iter(heapq.nlargest(k, (item for item in items if prop in item), key=lambda item: item[prop]))
+
+
+class _Profiled(object):
+    """Counts the items an operator gives and the time spent getting them"""
+    def __init__(self, items, row):
+        self.items = items
+        self.row = row
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self.items)
+        finally:
+            self.row['time'] += time.perf_counter() - start
+        self.row['rows_out'] += 1
+        return item
+
+
+class Plan(list):
+    """The operators that run the steps of a search, in order"""
+    def run(self, graph):
+        items = None
+        for operator in self:
+            items = operator.run(graph, items)
+        return items
+
+    def unique(self):
+        """Does the plan give each item once"""
+        return not any(operator.repeats() for operator in self)
+
+    def explain(self):
+        """Get the operator, the steps it runs and the estimated rows of each operator"""
+        return [operator.describe() for operator in self]
+
+    def profile(self, graph):
+        """Run the plan and get, for each operator, the items it took (rows_in) and gave (rows_out)
+        and the seconds spent in it, not counting the operators before it"""
+        rows = []
+        items = None
+        for operator in self:
+            row = operator.describe()
+            row.update(rows_in=None, rows_out=0, time=0.0)
+            start = time.perf_counter()
+            items = _Profiled(operator.run(graph, items), row)
+            row['time'] += time.perf_counter() - start
+            rows.append(row)
+        for _ in items:
+            pass
+        for row, before in reversed(tuple(zip(rows[1:], rows))):
+            row['rows_in'] = before['rows_out']
+            row['time'] = max(row['time'] - before['time'], 0.0)  # The timer overhead can make it go below 0
+        return rows
+
+
+def _estimate(rows, share):
+    return None if rows is None else rows * share
+
+
+def _filters(graph, steps, total, rows):
+    """Filters commute, the ones that keep the fewest items go first"""
+    operators = []
+    for step in sorted(steps, key=lambda step: selectivity(graph, step, total)):
+        rows = _estimate(rows, selectivity(graph, step, total))
+        operators.append(Filter(step, rows))
+    return operators
+
+
+def _barrier(graph, step, rows=None):
+    if step[0] == 'expand':
+        return Expand(step)
+    if step[0] in RELATIONS:
+        return Relations(step)  # The number of relations of the nodes is not known
+    if step[0] == 'union':
+        other = plan(graph, list(step[1]))[-1].rows
+        return Union(step, None if rows is None or other is None else rows + other)
+    return TopK(step, None if rows is None else min(rows, step[2]))
+
+
+def _continue(graph, steps, total, rows=None):
+    """The operators for steps that get their items from the operator before them, rows is how
+    many items that one is estimated to give"""
+    operators = []
+    filters = []
+    for step in steps:
+        if step[0] in FILTERS:
+            filters.append(step)
+        else:
+            operators.extend(_filters(graph, filters, total, rows))
+            rows = operators[-1].rows if filters else rows
+            operators.append(_barrier(graph, step, rows))
+            rows = operators[-1].rows
+            filters = []
+    return operators + _filters(graph, filters, total, rows)
+
+
+def _bitmap_seek(graph, filters):
+    """A bitmap seek for the filters that can be read from bitmap indexes and the filters left, None if there are less than two"""
+    positive = [step for step in filters if step[0] != 'difference' and bitmap_rows(graph, [step]) is not None]
+    negative = [step for step in filters if step[0] == 'difference' and bitmap_rows(graph, step[1]) is not None]
+    if not positive or len(positive) + len(negative) < 2:
+        return None
+    steps = positive + negative
+    return BitmapSeek(steps, bitmap_rows(graph, steps)), [step for step in filters if not any(step is other for other in steps)]
+
+
+def _start(graph, steps, total):
+    """The operators for steps that start from all items
+    the first is an index seek on the filter that keeps the fewest items, a bitmap seek on the filters
+    and unions with bitmap indexes, a label seek if the filters are followed by a relation step with a
+    label that has fewer relations, or a scan"""
+    if steps and steps[0][0] in TRAVERSALS and steps[0][1] is not None:
+        return Plan([_barrier(graph, steps[0])] + _continue(graph, steps[1:], total))
+    end = next((i for i, step in enumerate(steps) if step[0] not in FILTERS), len(steps))
+    filters, barrier = steps[:end], steps[end] if end < len(steps) else None
+    start, rest, after = Scan(rows=total), filters, end
+    for step in filters:
+        rows = seek_estimate(graph, step)
+        if rows is not None and rows < start.rows:
+            start, rest = IndexSeek(step, rows), [other for other in filters if other is not step]
+    seek = _bitmap_seek(graph, filters)
+    if seek is not None and seek[0].rows <= start.rows:
+        start, rest = seek
+    if barrier is not None and barrier[0] == 'union':
+        stop = end + 1
+        while stop < len(steps) and bitmap_rows(graph, steps[:stop + 1]) is not None:
+            stop += 1  # Up to the first step the bitmaps cant answer
+        rows = bitmap_rows(graph, steps[:stop])
+        if rows is not None:
+            start, rest, after = BitmapSeek(steps[:stop], rows), [], stop
+    elif barrier is not None and barrier[0] in RELATIONS and barrier[2]:
+        rows = len(graph.labels.get(barrier[2], ())) * (2 if barrier[0] == 'relations' else 1)
+        if rows < start.rows:
+            start, rest, after = LabelSeek(barrier, filters, rows), [], end + 1
+    elif barrier is not None and barrier[0] == 'top_k' and not filters and hasattr(graph.indexes.get(barrier[1]), 'top_k'):
+        start, rest, after = TopK(barrier, barrier[2]), [], end + 1
+    operators = [start] + _filters(graph, rest, total, start.rows)
+    return Plan(operators + _continue(graph, steps[after:], total, operators[-1].rows))
+
+
+def plan(graph, steps, cached=None):
+    """Choose the operators that run the steps of a search, they give the same items as running the
+    steps in order but can start from an index and run the filters in another order
+    cached is (depth, result) of the longest start of the steps with a cached result, it is used
+    when it has fewer items than the best start from all items"""
+    total = len(graph.data)
+    first = 0
+    for i, step in enumerate(steps):
+        if step[0] in TRAVERSALS and step[1] is not None:
+            first = i  # A relation or expand step from a set node doesnt use the steps before it
+    operators = _start(graph, steps[first:], total)
+    if cached is not None and cached[0] > first:
+        depth, result = cached
+        if operators[0].rows is None or len(result) <= operators[0].rows:
+            return Plan([Cached(result, steps[:depth])] + _continue(graph, steps[depth:], total, len(result)))
+    return operators
@@ -0,0 +1,91 @@
+import collections
+import os
+import pickle
+
+
+class PageStore(object):
+    """Keeps the records of a graph in a directory, page_size ids to a file
+
+    Only max_pages pages are kept in memory, the least recently used page is written out when
+    another one is read. Changes are kept in memory until the page is written or flush is called"""
+    def __init__(self, path, page_size=1024, max_pages=64):
+        self.path = path
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.pages = collections.OrderedDict()  # page number -> {id: record}
+        self.dirty = set()
+        os.makedirs(path, exist_ok=True)
+        try:
+            with open(os.path.join(path, 'meta'), 'rb') as f:
+                self.meta = pickle.load(f)
+        except FileNotFoundError:
+            self.meta = {}
+
+    def _file(self, number):
+        return os.path.join(self.path, '{}.page'.format(number))
+
+    def _write(self, number, page):
+        if not page:
+            try:
+                os.remove(self._file(number))
+            except FileNotFoundError:
+                pass
+        else:
+            self._dump(self._file(number), page)
+        self.dirty.discard(number)
+
+    def _dump(self, filename, value):
+        """Write to a temporary file first so a crash never leaves half a page"""
+        with open(filename + '.tmp', 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + '.tmp', filename)
+
+    def _page(self, number):
+        try:
+            self.pages.move_to_end(number)
+            return self.pages[number]
+        except KeyError:
+            pass
+        try:
+            with open(self._file(number), 'rb') as f:
+                page = pickle.load(f)
+        except FileNotFoundError:
+            page = {}
+        while len(self.pages) >= self.max_pages:
+            old_number, old_page = self.pages.popitem(last=False)
+            if old_number in self.dirty:
+                self._write(old_number, old_page)
+        self.pages[number] = page
+        return page
+
+    def _page_numbers(self):
+        numbers = {int(name[:-len('.page')]) for name in os.listdir(self.path) if name.endswith('.page')}
+        return sorted(numbers | self.dirty)
+
+    def get(self, id):
+        """Get the record of the id, or None if there is none"""
+        return self._page(id // self.page_size).get(id)
+
+    def put(self, id, record):
+        number = id // self.page_size
+        self._page(number)[id] = record
+        self.dirty.add(number)
+
+    def delete(self, id):
+        number = id // self.page_size
+        if self._page(number).pop(id, None) is not None:
+            self.dirty.add(number)
+
+    def records(self):
+        """Get every (id, record) in order of the ids"""
+        for number in self._page_numbers():
+            yield from sorted(self._page(number).items())
+
+    def flush(self):
+        for number in sorted(self.dirty):
+            self._write(number, self.pages[number])
+        self._dump(os.path.join(self.path, 'meta'), self.meta)
+
+    def close(self):
+        self.flush()
+        self.pages.clear()
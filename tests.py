@@ -1,6 +1,13 @@
+import analytics
+import json
+import graph_io
 import graph_store
+import storage
+import tempfile
+import threading
 import unittest
 import time
+import unittest.mock
 
 
 class TestGraphStore(unittest.TestCase):
@@ -99,6 +106,26 @@ class TestGraphStore(unittest.TestCase):
         self.assertIn(node3.id, self.g.data)
         self.assertIn(node4.id, self.g.data)
 
+    def test_relation_labels(self):
+        node1 = self.g.Node()
+        node2 = self.g.Node()
+        r1 = self.g.Relation(node1, 'TEST', node2)
+        r2 = self.g.Relation(node1, 'OTHER', node2)
+
+        self.assertEqual(list(node1.get_destinations('TEST')), [r1])
+        self.assertEqual(list(node2.get_sources('OTHER')), [r2])
+        self.assertEqual(len(node1.get_destinations()), 2)
+        self.assertEqual(self.g.labels, {'TEST': {r1.id}, 'OTHER': {r2.id}})
+
+        self.g.remove_relation(r1)
+        self.assertEqual(list(node1.get_destinations('TEST')), [])
+        self.assertEqual(list(node2.get_sources('TEST')), [])
+        self.assertEqual(self.g.labels, {'OTHER': {r2.id}})
+
+        self.g.remove_node(node2)
+        self.assertEqual(list(node1.get_destinations('OTHER')), [])
+        self.assertEqual(self.g.labels, {})
+
     def test_adjacent(self):
         node1 = self.g.Node()
         node2 = self.g.Node()
@@ -122,6 +149,60 @@ class TestGraphStore(unittest.TestCase):
         self.assertTrue(self.g.adjacent_twoway(node1, node2))
         self.assertTrue(self.g.adjacent_twoway(node2, node1))
 
+    def test_bulk_add(self):
+        self.g.create_index('kind')
+        nodes = self.g.add_nodes(({'kind': i % 2, 'n': i} for i in range(25)), batch_size=10)
+        self.assertEqual([node['n'] for node in nodes], list(range(25)))
+        self.assertEqual(len({node.id for node in nodes}), 25)
+        self.assertEqual(set(self.g.Search().value('kind', 1).execute()), {node.id for node in nodes[1::2]})
+
+        relations = self.g.add_relations([(nodes[0], 'next', nodes[1]), (nodes[1].id, 'next', nodes[2].id, {'weight': 3})])
+        self.assertEqual(relations[1]['weight'], 3)
+        self.assertEqual(relations[1].source, nodes[1])
+        self.assertEqual(relations[1].label, 'next')
+        self.assertTrue(self.g.adjacent(nodes[0], nodes[1]))
+        self.assertEqual(self.g.shortest_path(nodes[0], nodes[2]), [nodes[0], nodes[1], nodes[2]])
+        self.assertEqual(set(self.g.Search().relations_to(nodes[1])._get_nodes().execute()), {nodes[0].id})
+        self.assertEqual(self.g.labels['next'], {relation.id for relation in relations})
+        self.assertGreater(self.g.Node().id, relations[-1].id)
+
+    def test_bulk_add_missing_end(self):
+        a, b = self.g.Node(), self.g.Node()
+        self.assertEqual(len(self.g.Search().relations_from(by='L').execute()), 0)
+        removed = self.g.Node()
+        self.g.remove(removed)
+        for end in (999, removed.id):
+            with self.assertRaises(KeyError):
+                self.g.add_relations([(a, 'L', b), (a, 'L', end)])
+        self.assertEqual(len(a.destinations), 0)
+        self.assertNotIn('L', self.g.labels)
+        self.assertEqual(len(self.g.Search().relations_from(by='L').execute()), 0)
+        self.assertEqual(len([item for item in self.g.data.values() if isinstance(item, self.g.Relation)]), 0)
+
+    def test_shortest_path(self):
+        nodes = [self.g.Node(name=i) for i in range(6)]
+        for i, j, weight in ((0, 1, 1), (1, 2, 1), (2, 3, 1), (0, 4, 5), (4, 3, 1), (3, 5, 1)):
+            self.g.Relation(nodes[i], 'road', nodes[j], weight=weight)
+        self.g.Relation(nodes[5], 'rail', nodes[0])
+        names = lambda path: None if path is None else [node['name'] for node in path]
+
+        self.assertEqual(names(self.g.shortest_path(nodes[0], nodes[3])), [0, 4, 3])
+        self.assertEqual(names(self.g.shortest_path(nodes[0], nodes[3], weight='weight')), [0, 1, 2, 3])
+        self.assertEqual(names(self.g.shortest_path(nodes[0], nodes[5], weight='weight', heuristic=lambda node, y: 0)),
+                         [0, 1, 2, 3, 5])
+        self.assertEqual(names(self.g.shortest_path(nodes[3], nodes[0])), [3, 5, 0])
+        self.assertEqual(names(self.g.shortest_path(nodes[3], nodes[0], by='road')), None)
+        self.assertEqual(names(self.g.shortest_path(nodes[3], nodes[0], by='road', direction='in')), [3, 4, 0])
+        self.assertEqual(names(self.g.shortest_path(nodes[2], nodes[4], direction='both')), [2, 3, 4])
+        self.assertEqual(names(self.g.shortest_path(nodes[2].id, nodes[2].id)), [2])
+
+        self.assertTrue(self.g.reachable(nodes[1], nodes[0]))
+        self.assertFalse(self.g.reachable(nodes[1], nodes[0], max_depth=3))
+        self.assertTrue(self.g.reachable(nodes[1], nodes[0], max_depth=4))
+        self.assertFalse(self.g.reachable(nodes[1], nodes[0], by='road'))
+        with self.assertRaises(ValueError):
+            self.g.reachable(nodes[1], nodes[0], direction='sideways')
+
     def test_neighbors(self):
         node1 = self.g.Node()
         node2 = self.g.Node()
@@ -180,6 +261,30 @@ class TestGraphStore(unittest.TestCase):
         self.assertGreater(node2._last_accessed, starttime2)
 
 
+class TestGraphStore_MonotonicClock(TestGraphStore):
+    def setUp(self):
+        self.g = graph_store.Graph(access_clock='monotonic')
+
+
+class TestGraphStore_DatetimeClock(TestGraphStore):
+    def setUp(self):
+        self.g = graph_store.Graph(access_clock='datetime')
+
+
+class TestGraphStore_NoClock(TestGraphStore):
+    def setUp(self):
+        self.g = graph_store.Graph(access_clock='off')
+
+    def test_node_access_time(self):
+        node = self.g.Node()
+        _ = node == 1
+        self.assertIsNone(node._last_accessed)
+
+    def test_unknown_clock(self):
+        with self.assertRaises(ValueError):
+            graph_store.Graph(access_clock='sundial')
+
+
 class TestGraphStoreLite(TestGraphStore):
     def setUp(self):
         self.g = graph_store.Graph(lite=True)
@@ -188,6 +293,195 @@ class TestGraphStoreLite(TestGraphStore):
         pass  # LiteNodes dont have an access time
 
 
+class TestGraphStore_WithBackend(TestGraphStore):
+    def setUp(self):
+        self.path = tempfile.TemporaryDirectory()
+        self.addCleanup(self.path.cleanup)
+        self.g = graph_store.Graph(backend=storage.PageStore(self.path.name, page_size=4, max_pages=2))
+
+    def reopen(self):
+        self.g.close()
+        return graph_store.Graph(backend=storage.PageStore(self.path.name, page_size=4, max_pages=2))
+
+    def test_reopen(self):
+        node1 = self.g.Node(name='node1', likes=['orange'])
+        node2 = self.g.Node(name='node2')
+        r = self.g.Relation(node1, 'TEST', node2, weight=5)
+        node3 = self.g.Node(name='node3')
+        self.g.Relation(node3, 'TEST', node1)
+        self.g.remove(node3)
+        node1.likes.append('apple')  # Not written through, stored when the node is unloaded
+        node1._unload()
+
+        g = self.reopen()
+        self.assertFalse(object.__getattribute__(g[node1.id], '_loaded'))
+        self.assertEqual(g[node1.id].name, 'node1')
+        self.assertEqual(g[node1.id].likes, ['orange', 'apple'])
+        self.assertEqual(g[r.id].weight, 5)
+        self.assertIs(g[r.id].source, g[node1.id])
+        self.assertIs(g[r.id].destination, g[node2.id])
+        self.assertEqual(g[node1.id].destinations, {g[r.id]})
+        self.assertEqual(g[node2.id].get_sources('TEST'), {g[r.id]})
+        self.assertNotIn(node3.id, g.data)
+        self.assertEqual(g.labels, {'TEST': {r.id}})
+        self.assertEqual(g.Node().id, 6)
+
+    def test_reopen_bulk(self):
+        self.g = graph_store.Graph(backend=self.g.backend, max_resident_nodes=5)
+        nodes = self.g.add_nodes({'n': i} for i in range(20))
+        relations = self.g.add_relations(((nodes[i], 'next', nodes[i + 1], {'i': i}) for i in range(19)), batch_size=7)
+
+        g = self.reopen()
+        self.assertEqual([g[node.id]['n'] for node in nodes], list(range(20)))
+        self.assertEqual([g[relation.id]['i'] for relation in relations], list(range(19)))
+        for i in range(19):
+            self.assertEqual(g[nodes[i].id].destinations, {g[relations[i].id]})
+            self.assertIs(g[relations[i].id].destination, g[nodes[i + 1].id])
+
+    def test_unload(self):
+        node1 = self.g.Node(name='node1')
+        node2 = self.g.Node()
+        r = self.g.Relation(node1, 'TEST', node2)
+        node1._unload()
+        self.assertEqual(dict.copy(node1), {})
+        self.assertIsNot(type(node1), self.g.Node)
+        self.assertIsInstance(node1, self.g.Node)
+        self.assertIn('name', node1)
+        self.assertIs(type(node1), self.g.Node)
+        node1._unload()
+        node1.name = 'changed'
+        node1._unload()
+        self.assertEqual(node1['name'], 'changed')
+        self.assertEqual(node1.destinations, {r})
+        self.assertEqual(self.reopen()[node1.id].name, 'changed')
+
+    def test_isinstance_does_not_load(self):
+        nodes = self.g.add_nodes({'n': i} for i in range(10))
+        self.g.add_relations((nodes[i], 'NEXT', nodes[i + 1]) for i in range(9))
+
+        g = self.reopen()
+        self.assertEqual(g.Search()._get_relations().count(), 9)
+        self.assertEqual(g.Search()._get_nodes().count(), 10)
+        self.assertFalse(any(object.__getattribute__(item, '_loaded') for item in g.data.values()))
+
+    def test_load_error(self):
+        node = self.g.Node(name='node')
+        node._unload()
+        with unittest.mock.patch.object(self.g.Node, '_restore', side_effect=AttributeError('broken record')):
+            with self.assertRaises(RuntimeError) as raised:
+                node.name
+        self.assertIsInstance(raised.exception.__cause__, AttributeError)
+
+    def test_eviction(self):
+        self.g = graph_store.Graph(backend=self.g.backend, max_resident_nodes=10)
+        nodes = [self.g.Node(number=i) for i in range(30)]
+        relations = [self.g.Relation(nodes[i], 'NEXT', nodes[i + 1]) for i in range(29)]
+        self.assertLessEqual(len(self.g._resident), 10)
+
+        hot = nodes[0]
+        for number, node in enumerate(nodes[1:], 1):
+            _ = hot.number
+            self.assertEqual(node.number, number)
+            self.assertTrue(object.__getattribute__(hot, '_loaded'))
+        self.assertLessEqual(len(self.g._resident), 10)
+        self.assertEqual([relation.destination for relation in relations], nodes[1:])
+
+        self.g.remove(nodes[5])
+        self.assertNotIn(nodes[5].id, self.g._resident)
+
+    def test_eviction_during_remove(self):
+        self.g = graph_store.Graph(backend=self.g.backend, max_resident_nodes=2)
+        a, b, c = self.g.Node(name='a'), self.g.Node(name='b'), self.g.Node(name='c')
+        self.g.Relation(b, 'TEST', a)
+        self.g.Relation(c, 'TEST', a)
+        self.g.Relation(a, 'TEST', b)
+        self.g.evict(count=len(self.g._resident))
+
+        self.g.remove(a)  # Loads b and c, which would unload a part way through
+        self.assertIsNone(self.g[a.id])
+        self.assertEqual((b.sources, b.destinations, c.destinations), (set(), set(), set()))
+        self.assertLessEqual(len(self.g._resident), 2)
+        self.assertEqual(self.reopen().labels, {})
+
+    def test_eviction_during_load(self):
+        self.g = graph_store.Graph(backend=self.g.backend, max_resident_nodes=3)
+        nodes = [self.g.Node(n=i) for i in range(8)]
+        pairs = [(1, 5), (2, 4), (2, 1), (2, 5), (7, 6), (6, 1), (3, 1), (6, 1), (2, 4), (3, 1), (0, 3), (3, 0)]
+        for i, j in pairs:
+            self.g.Relation(nodes[i], 'TEST', nodes[j])
+        for i in (1, 3, 2):
+            nodes[i]._unload()
+            self.assertNotIn(nodes[i].id, self.g._resident)
+        self.g.Relation(nodes[2], 'TEST', nodes[1])  # Loads them and their relations under the budget
+        pairs.append((2, 1))
+
+        g = self.reopen()
+        ends = lambda relations: sorted((relation.source['n'], relation.destination['n']) for relation in relations)
+        for direction in ('sources', 'destinations'):
+            self.assertEqual(ends(relation for node in nodes for relation in getattr(g[node.id], direction)), sorted(pairs))
+        g.remove(g[nodes[1].id])
+        self.assertEqual(len(g.labels['TEST']), len([pair for pair in pairs if 1 not in pair]))
+
+    def test_eviction_bytes(self):
+        self.g = graph_store.Graph(backend=self.g.backend, max_resident_bytes=4000)
+        nodes = [self.g.Node(number=i) for i in range(50)]
+        self.assertLessEqual(self.g._resident_bytes, 4000)
+        self.assertEqual(sum((node.number for node in nodes)), sum(range(50)))
+
+    def test_eviction_needs_backend(self):
+        with self.assertRaises(ValueError):
+            graph_store.Graph(max_resident_nodes=10)
+
+
+class TestGraphStoreCompact(TestGraphStore):
+    def setUp(self):
+        self.g = graph_store.Graph(storage='compact')
+
+    def test_node_access_time(self):
+        pass  # Compact nodes are views, they dont have an access time
+
+    def test_node_relation(self):
+        node1 = self.g.Node()
+        node2 = self.g.Node()
+        r = self.g.Relation(node1, 'TEST', node2)
+
+        self.assertEqual(node1, r.source)  # Views are created on access
+        self.assertEqual(node2, r.destination)
+        self.assertIn(r, node1.destinations)
+        self.assertIn(r, node2.sources)
+
+    def test_compact_adjacency(self):
+        hub = self.g.Node(name='hub')
+        leaves = [self.g.Node(name=i) for i in range(200)]
+        relations = [self.g.Relation(hub, 'EVEN' if i % 2 else 'ODD', leaf) for i, leaf in enumerate(leaves)]
+        self.g.store.build()
+        extra = self.g.Relation(leaves[0], 'EVEN', hub)  # Added after the build
+
+        self.assertEqual(len(hub.destinations), 200)
+        self.assertEqual(len(hub.get_destinations('EVEN')), 100)
+        self.assertEqual(hub.get_sources('EVEN'), (extra,))
+        self.assertEqual(leaves[0].get_destinations(), (extra,))
+        self.assertEqual(hub.get_destinations('NONE'), ())
+        self.assertEqual(leaves[3]['name'], 3)
+
+        self.g.remove(relations[1])
+        self.assertEqual(len(hub.get_destinations('EVEN')), 99)
+        self.assertEqual(len(self.g.labels['EVEN']), 100)
+        self.g.store.build()
+        self.assertEqual(len(hub.get_destinations('EVEN')), 99)
+        self.assertIsNone(self.g[relations[1].id])
+
+    def test_traversal_from_node_without_properties(self):
+        empty, other = self.g.Node(), self.g.Node(name='other')
+        self.g.Relation(empty, 'TEST', other)
+        self.g.Relation(other, 'TEST', self.g.Node())
+        self.assertEqual(len(empty), 0)  # Falsy, the steps have to check for None
+
+        self.assertEqual(list(self.g.Search().relations_from(empty).execute().values()), [other])
+        self.assertEqual(list(self.g.Search().expand(1, empty).execute().values()), [other])
+        self.assertEqual(list(self.g.Search().value('name', 'other').relations_from(empty).execute().values()), [other])
+
+
 class TestGraphSearch(unittest.TestCase):
     def setUp(self):
         self.g = graph_store.Graph(lite=False, cache=False)
@@ -520,6 +814,176 @@ class TestGraphSearch(unittest.TestCase):
         self.assertNotIn(self.r5, result)
         self.assertNotIn(self.r6, result)
 
+    def test_relations_by(self):
+        result = self.g.Search().relations_from(self.node5, by='boss').execute().values()
+
+        self.assertIn(self.node1, result)
+        self.assertIn(self.node3, result)
+        self.assertEqual(len(result), 2)
+
+        result = self.g.Search().relations_to(self.node4, by='friend').execute().values()
+
+        self.assertIn(self.node1, result)
+        self.assertEqual(len(result), 1)
+
+        result = self.g.Search().relations_from(by='boss').execute().values()
+
+        self.assertIn(self.node1, result)
+        self.assertIn(self.node3, result)
+        self.assertEqual(len(result), 2)
+
+        result = self.g.Search().relations_to(by='wife').execute().values()
+
+        self.assertIn(self.node2, result)
+        self.assertEqual(len(result), 1)
+
+        result = self.g.Search().value('name', 'node1').relations(by='boss').execute().values()
+
+        self.assertIn(self.node5, result)
+        self.assertEqual(len(result), 1)
+
+        result = self.g.Search().relations_from(by='nothing').execute().values()
+
+        self.assertEqual(len(result), 0)
+
+    def test_range(self):
+        result = self.g.Search().range('age', 2, 4).execute().values()
+
+        self.assertIn(self.node1, result)
+        self.assertIn(self.node2, result)
+        self.assertIn(self.node4, result)
+
+        self.assertNotIn(self.node3, result)
+        self.assertNotIn(self.node5, result)
+
+        result = self.g.Search().gt('age', 2).execute().values()
+
+        self.assertIn(self.node2, result)
+        self.assertIn(self.node5, result)
+
+        self.assertNotIn(self.node1, result)
+        self.assertNotIn(self.node3, result)
+        self.assertNotIn(self.node4, result)
+
+        result = self.g.Search().lt('age', 4).execute().values()
+
+        self.assertIn(self.node1, result)
+        self.assertIn(self.node4, result)
+
+        self.assertNotIn(self.node2, result)
+        self.assertNotIn(self.node3, result)
+        self.assertNotIn(self.node5, result)
+
+        result = self.g.Search().range('name', 'node2', 'node3').execute().values()
+
+        self.assertIn(self.node2, result)
+        self.assertIn(self.node3, result)
+
+        self.assertNotIn(self.node1, result)
+        self.assertNotIn(self.node4, result)
+        self.assertNotIn(self.node5, result)
+
+    def test_range_chaining(self):
+        result = self.g.Search().value('job', 'work1').gt('age', 2).execute().values()
+
+        self.assertIn(self.node5, result)
+
+        self.assertNotIn(self.node1, result)
+        self.assertNotIn(self.node2, result)
+        self.assertNotIn(self.node3, result)
+        self.assertNotIn(self.node4, result)
+
+    def test_top_k(self):
+        result = list(self.g.Search().top_k('age', 2).execute().values())
+        self.assertEqual(result, [self.node5, self.node2])
+
+        result = list(self.g.Search().value('job', 'work1').top_k('age', 5).execute().values())
+        self.assertEqual(result[0], self.node5)
+        self.assertEqual(len(result), 2)
+
+    def test_limit_offset(self):
+        items = list(self.g.Search()._get_nodes().iter())
+        self.assertEqual(sorted(item.id for item in items), sorted(self.g.Search()._get_nodes().execute()))
+        self.assertEqual(list(self.g.Search()._get_nodes().limit(2).execute().values()), items[:2])
+        self.assertEqual(list(self.g.Search()._get_nodes().limit(2).offset(1).execute().values()), items[1:3])
+        self.assertEqual(list(self.g.Search()._get_nodes().offset(3).limit(10).stream()), items[3:])
+        self.assertEqual(self.g.Search()._get_nodes().offset(10).execute(), {})
+
+        related = list(self.g.Search().relations().iter())  # Nodes with several relations are found more than once
+        self.assertEqual(len(related), len(self.g.Search().relations().execute()))
+        self.assertEqual(len(related), len({item.id for item in related}))
+
+    def test_expand(self):
+        ids = lambda search: set(search.execute())
+        self.assertEqual(ids(self.g.Search().expand(2, self.node5)), {self.node1.id, self.node3.id, self.node4.id})
+        self.assertEqual(ids(self.g.Search().expand(3, self.node5)),
+                         {self.node1.id, self.node2.id, self.node3.id, self.node4.id})
+        self.assertEqual(ids(self.g.Search().expand(3, self.node5, by='boss')), {self.node1.id, self.node3.id})
+        self.assertEqual(ids(self.g.Search().expand(2, self.node4, direction='in')), {self.node1.id, self.node2.id, self.node5.id})
+        self.assertEqual(ids(self.g.Search().value('job', 'work2').expand(1, direction='both')), {self.node4.id})
+        self.assertEqual(ids(self.g.Search().expand(0, self.node5)), set())
+        self.assertEqual(len(self.g.Search().expand(1, self.node5, max_fanout=1).execute()), 1)
+        self.assertEqual(self.g.Search().expand(5, self.node1, direction='both').count(), 4)
+
+        walks = [node.id for node in self.g.Search().expand(2, self.node5, unique=False)._run()]
+        self.assertEqual(sorted(walks), sorted([self.node1.id, self.node3.id, self.node4.id, self.node3.id]))
+        self.assertEqual(ids(self.g.Search().expand(2, self.node4, direction='both', unique=False)),
+                         {self.node1.id, self.node2.id, self.node3.id, self.node4.id, self.node5.id})
+        with self.assertRaises(ValueError):
+            self.g.Search().expand(2, self.node5, direction='up')
+
+    def test_set_operations(self):
+        work1 = self.g.Search().value('job', 'work1')
+        aged = self.g.Search().property('age')
+        ids = lambda search: set(search.execute())
+        self.assertEqual(ids(work1 & aged), {self.node1.id, self.node5.id})
+        self.assertEqual(ids(work1 | aged), {self.node1.id, self.node2.id, self.node3.id, self.node4.id, self.node5.id})
+        self.assertEqual(ids(work1 - aged), {self.node3.id})
+        self.assertEqual(ids(aged - work1), {self.node2.id, self.node4.id})
+        self.assertEqual(ids(work1), {self.node1.id, self.node3.id, self.node5.id})  # The operators make new searches
+
+        self.assertEqual(ids(self.g.Search().relations_from(by='boss').intersect(aged)), {self.node1.id})
+        self.assertEqual(ids(self.g.Search().intersect(work1).relations_from(by='boss')), {self.node1.id, self.node3.id})
+        self.assertEqual(ids(self.g.Search()._get_nodes().difference(work1 | aged)), set())
+        self.assertEqual((work1 | aged).count(), 5)
+        self.assertEqual(len((work1 | aged).limit(4).execute()), 4)
+
+    def test_count_exists(self):
+        searches = [self.g.Search(), self.g.Search()._get_nodes(), self.g.Search().value('job', 'work1'),
+                    self.g.Search().relations(), self.g.Search().relations_from(by='boss').property('age'),
+                    self.g.Search().value('job', 'nobody'), self.g.Search().range('age', 3, 10),
+                    self.g.Search()._get_nodes().limit(3), self.g.Search().relations().offset(2).limit(2),
+                    self.g.Search().value('job', 'work1').offset(1), self.g.Search().value('job', 'work1').limit(0)]
+        for search in searches:
+            execute = len(search.execute())
+            self.assertEqual(search.count(), execute)
+            self.assertEqual(search.exists(), execute > 0)
+
+    def test_page(self):
+        pages = []
+        page, cursor = self.g.Search()._get_nodes().page(2)
+        pages.append(page)
+        while cursor is not None:
+            page, cursor = self.g.Search()._get_nodes().page(2, cursor)
+            pages.append(page)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual({id for page in pages for id in page}, set(self.g.Search()._get_nodes().execute()))
+
+        page, cursor = self.g.Search()._get_nodes().limit(3).page(2)
+        self.assertEqual(len(page), 2)
+        page, cursor = self.g.Search()._get_nodes().limit(3).page(2, cursor)
+        self.assertEqual((len(page), cursor), (1, None))
+        self.assertEqual(self.g.Search()._get_nodes().limit(4).page(2, self.g.Search()._get_nodes().limit(4).page(2)[1])[1], None)
+
+        page, cursor = self.g.Search()._get_nodes().page(2)
+        with self.assertRaises(ValueError):
+            self.g.Search().property('name').page(2, cursor)
+        with self.assertRaises(ValueError):
+            self.g.Search()._get_nodes().page(2, 'not a cursor')
+        for size in (0, -2):
+            with self.assertRaises(ValueError):
+                self.g.Search()._get_nodes().page(size)
+
 
 class TestGraphSearch_WithLiteNodes(TestGraphSearch):
     def setUp(self):
@@ -532,6 +996,178 @@ class TestGraphSearch_WithCache(TestGraphSearch):
         self.g = graph_store.Graph(lite=False, cache=True)
         self.creategraph()
 
+    def test_cache_invalidation(self):
+        search = lambda: self.g.Search().value('job', 'work1').execute()
+        self.assertEqual(set(search()), {self.node1.id, self.node3.id, self.node5.id})
+        self.node2.job = 'work1'
+        self.assertIn(self.node2.id, search())
+        del self.node1['job']
+        self.assertNotIn(self.node1.id, search())
+
+        self.assertNotIn(self.node3.id, self.g.Search().property('age').execute())
+        self.node3.age = 7
+        self.assertIn(self.node3.id, self.g.Search().property('age').execute())
+        self.assertIn(self.node3.id, self.g.Search().range('age', 5, 10).execute())
+        self.node3.age = 11
+        self.assertNotIn(self.node3.id, self.g.Search().range('age', 5, 10).execute())
+
+        friends = lambda: self.g.Search().relations_from(self.node1, 'friend').execute()
+        self.assertEqual(set(friends()), {self.node4.id})
+        relation = self.g.Relation(self.node1, 'friend', self.node2)
+        self.assertEqual(set(friends()), {self.node4.id, self.node2.id})
+        self.g.remove(relation)
+        self.assertEqual(set(friends()), {self.node4.id})
+        node6 = self.g.Node(job='work1')
+        self.assertIn(node6.id, search())
+        self.assertIn(node6.id, self.g.Search()._get_nodes().execute())
+
+        self.assertIn(self.node1.id, self.g.Search().relations_from(by='boss').execute())
+        self.g.remove(self.node5)
+        self.assertNotIn(self.node1.id, self.g.Search().relations_from(by='boss').execute())
+        self.assertNotIn(self.node5.id, self.g.Search()._get_nodes().execute())
+
+        self.g.add_nodes([{'job': 'work1', 'name': 'node7'}])
+        self.assertEqual(len(search()), 4)
+        relation, = self.g.add_relations([(self.node1, 'friend', self.node2)])
+        self.assertIn(self.node2.id, self.g.Search().relations_from(self.node1, 'friend').execute())
+        self.g.remove(relation)
+        self.g.remove(self.g.Search().value('name', 'node7').execute().popitem()[1])
+
+        reach = lambda: set(self.g.Search().expand(3, self.node1).execute())
+        self.assertEqual(reach(), {self.node2.id, self.node3.id, self.node4.id})
+        self.g.remove(self.r5)
+        self.assertEqual(reach(), {self.node3.id, self.node4.id})
+
+        work2 = lambda: set((self.g.Search()._get_nodes() - self.g.Search().value('job', 'work1')).execute())
+        self.assertIn(self.node4.id, work2())
+        self.node4.job = 'work1'
+        self.assertNotIn(self.node4.id, work2())
+
+    def test_cache_set_operations_then_write(self):
+        everything = lambda: set(self.g.Search().union(self.g.Search()._get_nodes()).execute())
+        work2 = lambda: set((self.g.Search()._get_nodes() - self.g.Search().value('job', 'work1')).execute())
+        self.assertIn(self.node1.id, everything())
+        node6 = self.g.Node(job='work2')  # The union has the nodes tag from both searches
+        self.assertIn(node6.id, everything())
+
+        self.assertEqual(work2(), {self.node2.id, self.node4.id, node6.id})
+        self.g.remove(node6)
+        self.assertEqual(work2(), {self.node2.id, self.node4.id})
+
+    def test_cache_counters(self):
+        search = lambda: self.g.Search().value('job', 'work1').execute()
+        info = self.g.cache_info()
+        self.assertEqual(search(), search())
+        self.assertEqual(self.g.cache_hits, info['hits'] + 1)
+        self.assertEqual(self.g.cache_misses, info['misses'] + 1)
+        self.assertEqual(self.g.cache_info()['entries'], info['entries'] + 1)
+        self.assertGreater(self.g.cache_info()['bytes'], info['bytes'])
+
+    def cached_values(self):
+        return {key[2] for key in self.g._cache if key[:2] == ('value', 'age')}
+
+    def test_cache_budget(self):
+        self.g = graph_store.Graph(lite=self.g.lite, max_cache_entries=4)
+        self.creategraph()
+        for age in range(10):
+            self.g.Search().value('age', age).execute()
+            self.assertEqual(set(self.g.Search().value('age', 2).execute()), {self.node1.id, self.node4.id})
+            self.assertLessEqual(self.g.cache_info()['entries'], 4)
+        self.assertGreater(self.g.cache_evictions, 0)
+        self.assertIn(2, self.cached_values())
+        self.assertNotIn(0, self.cached_values())
+
+        self.g.evict_cache(count=10)
+        self.assertEqual(self.g._cache, {})
+        self.assertEqual(self.g._cache_entries, {})
+        self.assertEqual(self.g.cache_info()['bytes'], 0)
+
+    def test_cache_budget_lfu(self):
+        self.g = graph_store.Graph(lite=self.g.lite, max_cache_entries=4, cache_policy='lfu')
+        self.creategraph()
+        for _ in range(3):
+            self.g.Search().value('age', 2).execute()
+        for age in range(3, 10):
+            self.g.Search().value('age', age).execute()
+            self.g.Search().value('age', age).execute()
+        self.assertIn(2, self.cached_values())  # Least recently used, but used the most
+        self.assertNotIn(3, self.cached_values())
+
+    def test_cache_budget_bytes(self):
+        self.g = graph_store.Graph(lite=self.g.lite, max_cache_bytes=1000)
+        self.creategraph()
+        for age in range(50):
+            self.g.Search().value('age', age).execute()
+            self.assertLessEqual(self.g.cache_info()['bytes'], 1000)
+        self.assertGreater(self.g.cache_evictions, 0)
+        with self.assertRaises(ValueError):
+            graph_store.Graph(cache_policy='random')
+
+    def test_cache_evict_nested(self):
+        longer = lambda: self.g.Search().property('age').value('job', 'work1').execute()
+        self.assertEqual(set(longer()), {self.node1.id, self.node5.id})
+        self.g.Search().property('age').execute()
+        self.assertEqual(self.g.cache_info()['entries'], 2)
+
+        self.g.evict_cache(count=1)  # The longer search, its start keeps its result
+        self.assertEqual(self.g.cache_info()['entries'], 1)
+        self.assertEqual(self.g.cache_evictions, 1)
+        self.assertIn('result', self.g._cache[('property', 'age')])
+
+        longer()
+        self.g.evict_cache(count=2)
+        self.assertEqual(self.g.cache_info(), dict(self.g.cache_info(), entries=0, bytes=0, evictions=3))
+        self.assertEqual(self.g._cache_entries, {})
+        self.assertEqual(set(longer()), {self.node1.id, self.node5.id})
+
+    def test_cache_partial_iteration(self):
+        search = self.g.Search().value('job', 'work1')
+        items = search._run()
+        first = next(items)
+        entry = self.g._cache[('value', 'job', 'work1')]
+        producer = entry['producer']
+        self.assertEqual(set(self.g.Search().value('job', 'work1').execute()), {self.node1.id, self.node3.id, self.node5.id})
+        self.assertIs(entry['result'], producer.list)
+        self.assertNotIn('producer', entry)
+        self.assertEqual([first] + list(items), entry['result'])
+
+    def test_cache_partial_iteration_then_write(self):
+        for i in range(10):
+            self.g.Node(x=i % 2)
+        self.assertEqual(len(self.g.Search().value('x', 1).limit(1).execute()), 1)
+        self.g.Node(y=2)  # Not a tag of the search, its unfinished producer cant resume
+        self.assertEqual(len(self.g.Search().value('x', 1).execute()), 5)
+        self.assertEqual(self.g._cache_producers, set())
+
+    def test_cache_threads(self):
+        barrier = threading.Barrier(8)
+        results = []
+
+        def search():
+            barrier.wait()
+            results.append(self.g.Search().relations_from(by='boss').value('job', 'work1').execute())
+        threads = [threading.Thread(target=search) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [{self.node1.id: self.node1, self.node3.id: self.node3}] * 8)
+        self.assertEqual(self.g.cache_info()['entries'], 1)
+        self.assertEqual(self.g.cache_hits + self.g.cache_misses, 8)
+
+    def test_cache_kept(self):
+        self.g.Search().value('job', 'work1').execute()
+        self.g.Search().relations_from(by='friend').execute()
+        self.node2.name = 'changed'
+        self.node2.job = 'work3'
+        self.g.Relation(self.node2, 'wife', self.node4)
+        self.assertIn(('value', 'job', 'work1'), self.g._cache)
+        self.assertIn(('relations_from', None, 'friend'), self.g._cache)
+        self.node2.job = 'work1'
+        self.assertNotIn(('value', 'job', 'work1'), self.g._cache)
+        self.g.Relation(self.node2, 'friend', self.node4)
+        self.assertNotIn(('relations_from', None, 'friend'), self.g._cache)
+
 
 class TestGraphSearch_WithCache_WithLiteNodes(TestGraphSearch_WithCache, TestGraphSearch_WithLiteNodes):
     def setUp(self):
@@ -539,5 +1175,494 @@ class TestGraphSearch_WithCache_WithLiteNodes(TestGraphSearch_WithCache, TestGra
         self.creategraph()
 
 
+class TestGraphSearch_Compact(TestGraphSearch):
+    def setUp(self):
+        self.g = graph_store.Graph(storage='compact', cache=False)
+        self.creategraph()
+
+
+class TestGraphSearch_Compact_WithCache(TestGraphSearch):
+    def setUp(self):
+        self.g = graph_store.Graph(storage='compact', cache=True)
+        self.creategraph()
+
+
+class TestGraphSearch_WithBackend(TestGraphSearch):
+    def setUp(self):
+        self.path = tempfile.TemporaryDirectory()
+        self.addCleanup(self.path.cleanup)
+        self.g = graph_store.Graph(cache=False, backend=storage.PageStore(self.path.name, page_size=4))
+        self.creategraph()
+        for item in self.g.data.values():
+            item._unload()
+
+
+class TestGraphSearch_Frozen(TestGraphSearch):
+    def setUp(self):
+        self.g = graph_store.Graph(lite=False, cache=True)
+        self.g.create_index('age', kind='sorted')
+        self.creategraph()
+        self.g = self.g.freeze(index=('name',))
+        for name in ('node1', 'node2', 'node3', 'node4', 'node5', 'r1', 'r2', 'r3', 'r4', 'r5', 'r6'):
+            setattr(self, name, self.g[getattr(self, name).id])
+
+    def test_read_only(self):
+        self.assertIsInstance(self.g.indexes['age'], graph_store.indexes.SortedIndex)
+        self.assertIn('name', self.g.indexes)
+        self.assertEqual(self.r1.source, self.node1)
+        self.assertEqual(self.node1.get_destinations('friend'), (self.r1,))
+        self.assertEqual(list(self.g.data), sorted(self.g.data))
+
+        with self.assertRaises(TypeError):
+            self.node1.name = 'changed'
+        with self.assertRaises(TypeError):
+            del self.r1['weight']
+        with self.assertRaises(TypeError):
+            self.g.Node()
+        with self.assertRaises(TypeError):
+            self.g.remove(self.node1)
+        self.assertEqual(self.node1.name, 'node1')
+
+
+class TestGraphSearch_WithIndexes(TestGraphSearch):
+    def setUp(self):
+        self.g = graph_store.Graph(lite=False, cache=False)
+        for prop in ('name', 'age'):
+            self.g.create_index(prop)  # Kept current as the graph is built
+        self.creategraph()
+        for prop in ('job', 'weight', 'promotion'):
+            self.g.create_index(prop)  # Built from the existing graph
+
+
+class TestGraphSearch_WithIndexes_WithCache(TestGraphSearch_WithIndexes):
+    def setUp(self):
+        self.g = graph_store.Graph(lite=True, cache=True)
+        for prop in ('name', 'age'):
+            self.g.create_index(prop)
+        self.creategraph()
+        for prop in ('job', 'weight', 'promotion'):
+            self.g.create_index(prop)
+
+
+class TestGraphSearch_WithSortedIndexes(TestGraphSearch):
+    def setUp(self):
+        self.g = graph_store.Graph(lite=False, cache=False)
+        for prop in ('name', 'age'):
+            self.g.create_index(prop, kind='sorted')
+        self.creategraph()
+        for prop in ('job', 'weight', 'promotion'):
+            self.g.create_index(prop, kind='sorted')
+
+
+class TestGraphSearch_WithBitmapIndexes(TestGraphSearch):
+    def setUp(self):
+        self.g = graph_store.Graph(lite=False, cache=True)
+        for prop in ('name', 'age'):
+            self.g.create_index(prop, kind='bitmap')
+        self.creategraph()
+        for prop in ('job', 'weight', 'promotion'):
+            self.g.create_index(prop, kind='bitmap')
+
+
+class TestGraphIndex(unittest.TestCase):
+    def setUp(self):
+        self.g = graph_store.Graph(cache=False)
+        self.g.create_index('name')
+
+    def test_index_writes(self):
+        node = self.g.Node(name='a')
+        self.assertEqual(self.g.indexes['name'].get('a'), (node.id,))
+
+        node.name = 'b'
+        self.assertEqual(self.g.indexes['name'].get('a'), ())
+        self.assertEqual(self.g.indexes['name'].get('b'), (node.id,))
+        self.assertIn(node, self.g.Search().value('name', 'b').execute().values())
+        self.assertNotIn(node, self.g.Search().value('name', 'a').execute().values())
+
+        del node['name']
+        self.assertEqual(self.g.indexes['name'].get('b'), ())
+        self.assertNotIn(node, self.g.Search().property('name').execute().values())
+
+    def test_index_removal(self):
+        node1 = self.g.Node(name='a')
+        node2 = self.g.Node(name='a')
+        self.g.Relation(node1, 'TEST', node2, name='a')
+        self.assertEqual(len(self.g.Search.get_by_value('name', 'a')), 3)
+
+        self.g.remove(node2)
+        self.assertEqual(self.g.indexes['name'].get('a'), (node1.id,))
+        self.assertEqual(list(self.g.Search.get_by_propery('name').values()), [node1])
+
+    def test_sorted_index_writes(self):
+        self.g.create_index('age', kind='sorted')
+        node1 = self.g.Node(age=10)
+        node2 = self.g.Node(age=20)
+        node3 = self.g.Node(age='unknown')
+        self.assertEqual(self.g.indexes['age'].range(5, 25), (node1.id, node2.id))
+        self.assertEqual(self.g.indexes['age'].get('unknown'), (node3.id,))
+
+        node1.age = 30
+        self.assertEqual(self.g.indexes['age'].range(5, 25), (node2.id,))
+        self.assertEqual(self.g.indexes['age'].top_k(1), (node1.id,))
+        self.assertEqual(self.g.indexes['age'].count_range(lo=20), 2)
+
+        self.g.remove(node1)
+        self.assertEqual(list(self.g.Search().top_k('age', 5).execute().values()), [node2])
+
+    def test_bitmap_index_writes(self):
+        self.g.create_index('job', kind='bitmap')
+        index = self.g.indexes['job']
+        nodes = [self.g.Node(job=i % 3) for i in range(10000)]
+        self.assertEqual(index.get(1), tuple(node.id for node in nodes[1::3]))
+        self.assertEqual(index.count(2), 3333)
+        self.assertEqual(len(index), 10000)
+
+        nodes[1].job = 2
+        self.g.remove(nodes[4])
+        nodes[7].job = ['unhashable']
+        self.assertEqual(index.count(1), 3330)
+        self.assertEqual(index.get(['unhashable']), (nodes[7].id,))
+        self.assertEqual(len(index.ids()), 9999)
+        for node in nodes[1::3]:
+            del node['job']
+        self.assertNotIn(1, index.values)
+        self.assertEqual(graph_store.indexes.bitmap_count(index.bitmap()), 6667)
+
+    def test_unhashable_values(self):
+        node = self.g.Node(name=['orange'])
+        self.assertIn(node, self.g.Search().value('name', ['orange']).execute().values())
+        node.name = 'orange'
+        self.assertNotIn(node, self.g.Search().value('name', ['orange']).execute().values())
+        self.assertIn(node, self.g.Search().value('name', 'orange').execute().values())
+
+
+class TestGraphPlanner(unittest.TestCase):
+    def setUp(self):
+        self.g = graph_store.Graph(cache=False)
+        self.g.create_index('job')
+        self.g.create_index('age', kind='sorted')
+        self.nodes = [self.g.Node(job='work{}'.format(i % 10), age=i, **({'name': str(i)} if i % 2 else {}))
+                      for i in range(200)]
+        for i in range(199):
+            self.g.Relation(self.nodes[i], 'next', self.nodes[i + 1])
+        for i in range(0, 200, 50):
+            self.g.Relation(self.nodes[i], 'boss', self.nodes[i + 1], since=i)
+
+    def in_order(self, search):
+        """Run the steps of the search one after the other without planning"""
+        steps = search._steps
+        operators = [graph_store.planner.Filter(step) if step[0] in graph_store.planner.FILTERS else
+                     graph_store.planner._barrier(self.g, step) for step in steps]
+        return {item.id: item for item in graph_store.planner.Plan([graph_store.planner.Scan()] + operators).run(self.g)}
+
+    def plan(self, search):
+        return graph_store.planner.plan(self.g, search._steps)
+
+    def test_same_results(self):
+        searches = [self.g.Search().property('name').value('job', 'work1').relations_from(by='next'),
+                    self.g.Search().value('job', 'work3').gt('age', 100).relations_to().property('name'),
+                    self.g.Search().property('name').relations_from(by='boss'),
+                    self.g.Search().property('name').relations(by='boss').lt('age', 60),
+                    self.g.Search().value('job', 'work2').relations_from(self.nodes[0], 'boss'),
+                    self.g.Search().range('age', 10, 20).top_k('age', 3).relations_from(),
+                    self.g.Search().top_k('age', 4).value('job', 'work8'),
+                    self.g.Search()._get_relations().property('since')]
+        for search in searches:
+            self.assertEqual(search.execute(), self.in_order(search))
+
+    def test_index_seek(self):
+        plan = self.plan(self.g.Search().property('name').value('job', 'work1').gt('age', 190))
+        self.assertIsInstance(plan[0], graph_store.planner.IndexSeek)
+        self.assertEqual(plan[0].step, ('gt', 'age', 190))
+        self.assertEqual(plan[0].rows, 9)
+        self.assertEqual([operator.step for operator in plan[1:]], [('value', 'job', 'work1'), ('property', 'name')])
+
+        plan = self.plan(self.g.Search().property('name'))
+        self.assertIsInstance(plan[0], graph_store.planner.Scan)
+
+    def test_label_seek(self):
+        plan = self.plan(self.g.Search().property('name').value('job', 'work0').relations_from(by='boss'))
+        self.assertIsInstance(plan[0], graph_store.planner.LabelSeek)
+        self.assertEqual(len(plan), 1)
+        plan = self.plan(self.g.Search().value('job', 'work0').relations_from(by='next'))
+        self.assertIsInstance(plan[0], graph_store.planner.IndexSeek)
+        self.assertIsInstance(plan[1], graph_store.planner.Relations)
+
+    def test_node_relation(self):
+        plan = self.plan(self.g.Search().property('name').relations_from(self.nodes[0], 'boss').property('age'))
+        self.assertIsInstance(plan[0], graph_store.planner.Relations)
+        self.assertEqual(len(plan), 2)
+
+    def test_cached_start(self):
+        self.g = graph_store.Graph()
+        nodes = [self.g.Node(job='work{}'.format(i % 10)) for i in range(100)]
+        for i in range(99):
+            self.g.Relation(nodes[i], 'next', nodes[i + 1])
+        self.g.Search().value('job', 'work1').execute()
+        search = self.g.Search().value('job', 'work1').relations_from(by='next')
+        self.assertEqual(set(search.execute()), {node.id for node in nodes if node.job == 'work2'})
+        self.assertEqual(search.execute(), self.in_order(search))
+        entry = self.g._cache[('value', 'job', 'work1')]
+        self.assertEqual(entry['hits'], 1)  # The longer search started from it
+
+    def test_index_count(self):
+        with unittest.mock.patch.object(graph_store.planner, 'plan', side_effect=AssertionError('Not from the index')):
+            self.assertEqual(self.g.Search().value('job', 'work1').count(), 20)
+            self.assertEqual(self.g.Search().gt('age', 190).count(), 9)
+            self.assertEqual(self.g.Search().property('job').offset(150).count(), 50)
+            self.assertFalse(self.g.Search().value('job', 'nobody').exists())
+            self.assertTrue(self.g.Search().value('job', 'work1').exists())
+        self.assertEqual(self.g.Search().property('name').value('job', 'work1').count(), 20)
+        self.assertFalse(self.g.Search().property('name').value('job', 'work2').exists())
+
+    def test_expand(self):
+        for depth in range(1, 4):
+            search = self.g.Search().value('job', 'work0').expand(depth, by='next', unique=False)
+            self.assertEqual([type(operator).__name__ for operator in self.plan(search)], ['IndexSeek', 'Expand'])
+            self.assertEqual(search.execute(), self.in_order(search))
+            self.assertEqual(set(search.execute()), {self.nodes[i].id for i in range(200) if 0 < i % 10 <= depth})
+        self.assertEqual(self.g.Search().expand(5, self.nodes[0], by='next').count(), 5)
+        self.assertEqual(set(self.g.Search().expand(2, self.nodes[50], direction='both').execute()),
+                         {node.id for node in self.nodes[48:53] if node is not self.nodes[50]})
+
+    def test_set_operations(self):
+        work1 = self.g.Search().value('job', 'work1')
+        searches = [work1 & self.g.Search().gt('age', 150), self.g.Search().property('name') - work1,
+                    work1 | self.g.Search().value('job', 'work2'), self.g.Search().relations_from(by='boss') & work1,
+                    self.g.Search().range('age', 0, 30).difference(self.g.Search().property('name')).relations_from()]
+        for search in searches:
+            self.assertEqual(search.execute(), self.in_order(search))
+        plan = self.plan(self.g.Search().property('name').intersect(self.g.Search().value('job', 'work1')))
+        self.assertEqual([type(operator).__name__ for operator in plan], ['IndexSeek', 'Filter'])
+        self.assertEqual(plan[0].step[0], 'intersect')
+        self.assertEqual(plan[0].rows, 20)
+
+    def test_bitmap_seek(self):
+        self.g.create_index('job', kind='bitmap')
+        self.g.create_index('name', kind='bitmap')
+        work1, named = self.g.Search().value('job', 'work1'), self.g.Search().property('name')
+        searches = [self.g.Search().property('name').value('job', 'work3'), work1 | self.g.Search().value('job', 'work2'),
+                    (work1 | self.g.Search().value('job', 'work2')) - named,
+                    self.g.Search().property('name').value('job', 'work5').difference(self.g.Search().value('name', '15')),
+                    (work1 | self.g.Search().value('job', 'work2')).gt('age', 100).relations_from()]
+        for search in searches:
+            self.assertEqual(search.execute(), self.in_order(search))
+            self.assertIsInstance(self.plan(search)[0], graph_store.planner.BitmapSeek)
+        with unittest.mock.patch.object(graph_store.planner, 'plan', side_effect=AssertionError('Not from the index')):
+            self.assertEqual(searches[2].count(), 20)
+            self.assertEqual(searches[3].count(), 19)
+
+    def test_explain(self):
+        search = self.g.Search().property('name').value('job', 'work1').relations_from(by='next')
+        self.assertEqual(search.explain(), [
+            {'operator': 'IndexSeek', 'steps': [('value', 'job', 'work1')], 'rows': 20},
+            {'operator': 'Filter', 'steps': [('property', 'name')], 'rows': 10.0},
+            {'operator': 'Relations', 'steps': [('relations_from', None, 'next')], 'rows': None}])
+
+    def test_profile(self):
+        search = self.g.Search().property('name').value('job', 'work1').relations_from(by='next')
+        rows = search.profile()
+        self.assertEqual([(row['operator'], row['rows_in'], row['rows_out'], row['cache']) for row in rows],
+                         [('IndexSeek', None, 20, None), ('Filter', 20, 20, None), ('Relations', 20, 20, None)])
+        self.assertTrue(all(row['time'] >= 0 for row in rows))
+
+        self.g = graph_store.Graph()
+        nodes = [self.g.Node(job='work{}'.format(i % 10)) for i in range(100)]
+        search = self.g.Search().value('job', 'work1')
+        self.assertEqual([row['cache'] for row in search.profile()], ['miss', 'miss'])  # Scan and filter
+        search.execute()
+        rows = self.g.Search().value('job', 'work1').profile()
+        self.assertEqual([(row['operator'], row['rows_out'], row['cache']) for row in rows], [('Cached', 10, 'hit')])
+        rows = self.g.Search().value('job', 'work1').relations_from().profile()
+        self.assertEqual([(row['operator'], row['cache']) for row in rows], [('Cached', 'hit'), ('Relations', 'miss')])
+
+
 if __name__ == '__main__':
     unittest.main()
+
+
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        self.g = graph_store.Graph(cache=False)
+        self.creategraph()
+
+    def creategraph(self):
+        g = self.g
+        self.nodes = [g.Node(name=i) for i in range(7)]
+        for i, j in ((0, 1), (1, 2), (2, 0), (2, 3), (3, 4), (4, 3)):
+            g.Relation(self.nodes[i], 'next', self.nodes[j])
+        g.Relation(self.nodes[4], 'jump', self.nodes[5])  # nodes[6] has no relations
+
+    def ids(self, *positions):
+        return [self.nodes[i].id for i in positions]
+
+    def by_position(self, result):
+        return [result[node.id] for node in self.nodes]
+
+    def test_export(self):
+        topology = analytics.export(self.g)
+        self.assertEqual(list(topology.ids), self.ids(*range(7)))
+        self.assertEqual(list(topology.offsets), [0, 1, 2, 4, 5, 7, 7, 7])
+        self.assertEqual(sorted(topology.targets[2:4]), [0, 3])
+        self.assertEqual(len(analytics.export(self.g, by='jump').sources), 1)
+        self.assertEqual(len(analytics.export(self.g, by='missing').sources), 0)
+
+    def test_degree(self):
+        topology = analytics.export(self.g)
+        self.assertEqual(self.by_position(analytics.degree(topology)), [1, 1, 2, 1, 2, 0, 0])
+        self.assertEqual(self.by_position(analytics.degree(topology, 'in')), [1, 1, 1, 2, 1, 1, 0])
+        self.assertEqual(self.by_position(analytics.degree(topology, 'both')), [2, 2, 3, 3, 3, 1, 0])
+        self.assertEqual(self.by_position(analytics.degree_centrality(topology))[2], 0.5)
+        self.assertEqual(self.by_position(analytics.degree(analytics.export(self.g, by='next'))), [1, 1, 2, 1, 1, 0, 0])
+
+    def test_pagerank(self):
+        ranks = self.by_position(analytics.pagerank(analytics.export(self.g), tolerance=1e-10))
+        self.assertAlmostEqual(sum(ranks), 1)
+        self.assertGreater(ranks[3], ranks[0])
+        self.assertGreater(ranks[5], ranks[6])
+        self.assertAlmostEqual(ranks[1], ranks[6] + 0.85 * ranks[0])  # Nothing goes to nodes[6], its rank is the base
+        self.assertAlmostEqual(ranks[0], ranks[6] + 0.85 * ranks[2] / 2)
+        cycle = self.by_position(analytics.pagerank(analytics.export(self.g, by='jump')))
+        self.assertAlmostEqual(cycle[5], cycle[4] * 1.85, places=5)
+
+    def test_components(self):
+        topology = analytics.export(self.g)
+        self.assertEqual(self.by_position(analytics.weakly_connected_components(topology)), self.ids(0, 0, 0, 0, 0, 0, 6))
+        self.assertEqual(self.by_position(analytics.strongly_connected_components(topology)), self.ids(0, 0, 0, 3, 3, 5, 6))
+        jumps = analytics.export(self.g, by='jump')
+        self.assertEqual(self.by_position(analytics.weakly_connected_components(jumps)), self.ids(0, 1, 2, 3, 4, 4, 6))
+
+    def test_long_path(self):
+        nodes = [self.g.Node() for i in range(5000)]
+        for a, b in zip(nodes, nodes[1:] + nodes[:1]):
+            self.g.Relation(a, 'next', b)
+        components = analytics.strongly_connected_components(analytics.export(self.g))
+        self.assertEqual({components[node.id] for node in nodes}, {nodes[0].id})
+
+
+class TestAnalytics_WithoutNumpy(TestAnalytics):
+    def setUp(self):
+        patch = unittest.mock.patch.object(analytics, 'numpy', None)
+        patch.start()
+        self.addCleanup(patch.stop)
+        super().setUp()
+
+
+class TestAnalytics_Compact(TestAnalytics):
+    def setUp(self):
+        self.g = graph_store.Graph(storage='compact', cache=False)
+        self.creategraph()
+
+
+class TestGraphIO(unittest.TestCase):
+    def setUp(self):
+        self.g = graph_store.Graph()
+        self.path = tempfile.TemporaryDirectory()
+        self.addCleanup(self.path.cleanup)
+
+    def write(self, name, text):
+        path = '{}/{}'.format(self.path.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_import_csv(self):
+        nodes = self.write('nodes.csv', 'id,name,age\na,Ann,30\nb,Bob,40\nc,Cat,50\n')
+        edges = self.write('edges.csv', 'source,destination,label,since\na,b,friend,2001\nb,c,friend,2002\nc,d,boss,2003\n')
+        keys = graph_io.import_nodes(self.g, nodes, types={'age': int}, batch_size=2)
+        self.assertEqual(sorted(keys), ['a', 'b', 'c'])
+        self.assertEqual(self.g[keys['b']]['age'], 40)
+        self.assertNotIn('age', self.g.Search().value('age', '40').execute())
+
+        self.assertEqual(graph_io.import_edges(self.g, edges, keys, types={'since': int}, batch_size=2), 3)
+        self.assertIn('d', keys)
+        self.assertEqual(self.g.shortest_path(keys['a'], keys['d']), [self.g[keys[key]] for key in 'abcd'])
+        relation, = self.g[keys['c']].get_destinations('boss')
+        self.assertEqual(relation['since'], 2003)
+
+    def test_import_jsonl(self):
+        nodes = self.write('nodes.jsonl', '{"key": 1, "name": "Ann"}\n\n{"key": 2, "name": "Bob"}\n')
+        edges = self.write('edges.ndjson', '{"from": 1, "to": 2, "label": "friend"}\n{"from": 2, "to": 3, "label": "friend"}\n')
+        keys = graph_io.import_nodes(self.g, nodes, key='key', key_property='key')
+        self.assertEqual(self.g[keys[2]]['key'], 2)
+        self.assertEqual(graph_io.import_edges(self.g, edges, keys, source='from', destination='to', missing='skip'), 1)
+        self.assertNotIn(3, keys)
+        with self.assertRaises(KeyError):
+            graph_io.import_edges(self.g, edges, keys, source='from', destination='to', missing='error')
+
+        with open(edges) as f:
+            count = graph_io.import_edges(self.g, f, keys, source='from', destination='to', format='jsonl', key_property='key')
+        self.assertEqual(count, 2)
+        self.assertEqual(self.g[keys[3]]['key'], 3)
+        with self.assertRaises(ValueError):
+            list(graph_io.read_rows(self.write('nodes.txt', '')))
+
+    def sample(self, g):
+        a, b, c = g.add_nodes([{'name': 'Ann', 'tags': ['x']}, {'name': 'Bob'}, {'name': 'Cat'}])
+        g.add_relations([(a, 'friend', b, {'since': 2001}), (b, 'boss', c)])
+        g.remove_node(g.add_nodes([{'name': 'Gone'}])[0])
+        g.add_relations([(c, 'friend', a)])
+        return g
+
+    def contents(self, g):
+        """The properties of the nodes and the relations by name, which are the same after a round trip"""
+        named = {node.id: node['name'] for node in g.data.values() if isinstance(node, g.Node)}
+        return (sorted(named.values()),
+                sorted((named[relation.source.id], relation.label, named[relation.destination.id], relation.get('since'))
+                       for relation in g.data.values() if isinstance(relation, g.Relation)),
+                next(node for node in g.data.values() if isinstance(node, g.Node) and node['name'] == 'Ann')['tags'])
+
+    def test_export_jsonl(self):
+        g = self.sample(graph_store.Graph())
+        path = '{}/graph.jsonl'.format(self.path.name)
+        self.assertEqual(g.export(path), 6)
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['id'] for record in records], sorted(record['id'] for record in records))
+        self.assertEqual(records[3], {'id': 4, 'kind': 'relation', 'source': 1, 'label': 'friend', 'destination': 2,
+                                      'properties': {'since': 2001}})
+
+        ids = graph_io.import_graph(self.g, path, batch_size=2)
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(self.contents(self.g), self.contents(g))
+        self.assertEqual(self.g[ids[1]]['name'], 'Ann')
+
+        with open(path, 'w') as f:
+            graph_io.export_graph(self.g, f)
+        with open(path) as f:
+            self.assertEqual(len(graph_io.import_graph(graph_store.Graph(storage='compact'), f, format='jsonl')), 3)
+        with self.assertRaises(ValueError):
+            g.export(path, format='csv')
+
+    def test_export_storage(self):
+        for kwargs in ({'lite': True}, {'storage': 'compact'}):
+            g = self.sample(graph_store.Graph(**kwargs))
+            path = '{}/graph.jsonl'.format(self.path.name)
+            g.export(path)
+            self.assertEqual(self.contents(self.imported(path)), self.contents(g))
+        frozen = self.sample(graph_store.Graph()).freeze()
+        frozen.export(path)
+        self.assertEqual(self.contents(self.imported(path)), self.contents(frozen))
+
+    def imported(self, path):
+        g = graph_store.Graph()
+        graph_io.import_graph(g, path)
+        return g
+
+    def test_export_unloaded(self):
+        g = self.sample(graph_store.Graph(backend=storage.PageStore(self.path.name + '/store')))
+        for item in g.data.values():
+            if item is not None:
+                item._unload()
+        self.assertFalse(any(item._loaded for item in g.data.values() if item is not None))
+        path = '{}/graph.jsonl'.format(self.path.name)
+        g.export(path)
+        self.assertFalse(any(item._loaded for item in g.data.values() if item is not None))
+        self.assertEqual(self.contents(self.imported(path)), self.contents(g))
+
+    @unittest.skipIf(graph_io.axon is None, 'axon can not be imported')
+    def test_export_axon(self):
+        g = self.sample(graph_store.Graph())
+        path = '{}/graph.axon'.format(self.path.name)
+        self.assertEqual(g.export(path, format='axon'), 6)
+        self.assertEqual(self.contents(self.imported(path)), self.contents(g))
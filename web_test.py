@@ -5,22 +5,49 @@ sys.path.append('./lib')
 import cherrypy
 import sample
 
+TERMINALS = ('execute', 'explain', 'profile', 'iter', 'stream', 'page', 'count', 'exists')  # Search functions that give the result instead of the search
+TERMINALS += ('union', 'intersect', 'difference')  # These take another search, which a url cant give
+
+
+def _number(text):
+    return int(text) if text.lstrip('-').isdigit() else float(text)
+
+
+def _optional(text):
+    return text or None
+
+
+def _node_id(text):
+    return int(text) if text else None
+
+
+def _flag(text):
+    return text.lower() in ('1', 'true', 'yes')
+
+
+# How to convert the url arguments of the search functions that dont take strings, by position
+ARGUMENTS = {'limit': (int,), 'offset': (int,), 'top_k': (str, int),
+             'range': (str, _number, _number), 'gt': (str, _number), 'lt': (str, _number),
+             'expand': (int, _node_id, _optional, str, _flag, int)}
+
 
 class GraphAccces(object):
     def __init__(self):
-        self.graph = sample.graph
+        self.graph = sample.graph.freeze()
 
     def _cp_dispatch(self, vpath):
         if 'search' not in cherrypy.request.params:
             print('setting search')
             cherrypy.request.params['search'] = self.graph.Search()
-            self.funcs = {i: getattr(cherrypy.request.params['search'], i) for i in dir(self.graph.Search) if not i.startswith('_') and i is not 'execute'}
+            self.funcs = {i: getattr(cherrypy.request.params['search'], i) for i in dir(self.graph.Search) if not i.startswith('_') and i not in TERMINALS}
         vpath = vpath[0].split(',')
         print(vpath)
         if vpath[0] in self.funcs:
+            converters = ARGUMENTS.get(vpath[0], ())
             try:
-                cherrypy.request.params['search'] = self.funcs[vpath[0]](*vpath[1:])
-            except TypeError as e:
+                args = [converters[i](arg) if i < len(converters) else arg for i, arg in enumerate(vpath[1:])]
+                cherrypy.request.params['search'] = self.funcs[vpath[0]](*args)
+            except (TypeError, ValueError) as e:
                 print(e)
                 cherrypy.request.params['error'] = '{}'.format(e)
         else:
@@ -30,16 +57,24 @@ class GraphAccces(object):
 
     @cherrypy.expose
     def index(self, *args, **kwargs):
+        if 'error' in cherrypy.request.params:
+            return '{}'.format(cherrypy.request.params['error'])
         if 'search' in cherrypy.request.params:
-            result = cherrypy.request.params['search'].execute()
+            try:
+                if 'size' in kwargs:  # A page of the result, the reply has the cursor of the next one
+                    result, cursor = cherrypy.request.params['search'].page(int(kwargs['size']), kwargs.get('cursor'))
+                else:
+                    result, cursor = cherrypy.request.params['search'].execute(), None
+            except ValueError as e:  # A bad size or cursor
+                return '{}'.format(e)
             print('result', result)
             reply = {'result': list(result.keys())}
+            if cursor is not None:
+                reply['cursor'] = cursor
             if 'data' in cherrypy.request.params:
                 reply['data'] = result
             return '{}'.format(json.dumps(reply))
-        if 'error' in cherrypy.request.params:
-            return '{}'.format(cherrypy.request.params['error'])
-        funcs = [i for i in dir(self.graph.Search) if not i.startswith('_') and i is not 'execute']
+        funcs = [i for i in dir(self.graph.Search) if not i.startswith('_') and i not in TERMINALS]
         reply = {'commands': funcs}
         return '{}'.format(json.dumps(reply, sort_keys=True, indent=4))
 